@@ -42,6 +42,7 @@ class SimulationHistory:
         self._sortedTimes = []
         self._deadlineMissMap = DeadlineMissMap()
         self._preemptionMap = PreemptionMap()
+        self._cycle = None
 
     def addState(self, state):
         time = state.time
@@ -56,7 +57,22 @@ class SimulationHistory:
         self._preemptionMap.addState(state)
 
     def frozen(self):
-        return FrozenHistory(self._stateMap.values())
+        return FrozenHistory(self._stateMap.values(), self._cycle)
+
+    def cycle(self):
+        """
+        The repetition of the schedule that ended the simulation, if any.
+
+        When this is not None, the schedule after the end of the cycle repeats
+        the cycle forever, so the deadline misses of the history are a
+        definitive verdict.
+
+        :return:    A ScheduleCycle instance or None.
+        """
+        return self._cycle
+
+    def setCycle(self, cycle):
+        self._cycle = cycle
 
     def __contains__(self, time):
         index = bisect_left(self._sortedTimes, time)
@@ -65,6 +81,9 @@ class SimulationHistory:
     def __getitem__(self, time):
         return self._stateAtTime(time)
 
+    def firstState(self):
+        return self._stateAtTime(self._sortedTimes[0])
+
     def getLastState(self, time):
         index = bisect(self._sortedTimes, time) - 1
         lastTime = self._sortedTimes[index]
@@ -72,6 +91,39 @@ class SimulationHistory:
         assert state.time <= time
         return state
 
+    def prefix(self, time):
+        """
+        A new history with the states of this one until @p time.
+
+        The states are immutable, so they are shared rather than copied.
+        The deadline misses and preemptions are taken from the maps rather
+        than from the states, since a state can replace an earlier one at
+        the same time.
+        """
+        history = SimulationHistory()
+        end = bisect(self._sortedTimes, time)
+        history._sortedTimes = self._sortedTimes[:end]
+        for stateTime in history._sortedTimes:
+            history._stateMap[stateTime] = self._stateAtTime(stateTime)
+        history._deadlineMissMap = self._deadlineMissMap.prefix(time)
+        history._preemptionMap = self._preemptionMap.prefix(time)
+        return history
+
+    def merge(self, history):
+        """
+        Add the states, deadline misses and preemptions of @p history to this
+        one.
+
+        A state of @p history replaces the state of this one at the same
+        time, if any.
+        """
+        for stateTime in history._sortedTimes:
+            self._stateMap[stateTime] = history._stateAtTime(stateTime)
+            if stateTime not in self._sortedTimes:
+                insort(self._sortedTimes, stateTime)
+        self._deadlineMissMap.merge(history._deadlineMissMap)
+        self._preemptionMap.merge(history._preemptionMap)
+
     def firstDeadlineMiss(self, dmFilter=True):
         if dmFilter is True:
             dmFilter = DeadlineMissFilter(True)
@@ -126,11 +178,12 @@ class SimulationHistory:
 
 class FrozenHistory(SimulationHistory, ValueEqual):
 
-    def __init__(self, states):
+    def __init__(self, states, cycle=None):
         super().__init__()
         for state in states:
             super().addState(state)
         self._stateMap = frozenset(self._stateMap.items())
+        self._cycle = cycle
 
     def hasDeadlineMiss(self):
         return self.firstDeadlineMiss() is not None
@@ -148,6 +201,10 @@ class FrozenHistory(SimulationHistory, ValueEqual):
         del state
         raise NotImplementedError
 
+    def merge(self, history):
+        del history
+        raise NotImplementedError
+
     def frozen(self):
         return self
 
@@ -259,6 +316,34 @@ class DeadlineMiss(ValueEqual):
         return 'DeadlineMiss({}, {})'.format(self._task, self._releaseIndex)
 
 
+class ScheduleCycle(ValueEqual):
+    """
+    A repetition in a periodic schedule: the state at time @p end is the state
+    at time @p start shifted by the length of the cycle.
+    """
+
+    def __init__(self, start, end):
+        super().__init__()
+        assert start < end
+        self._start = start
+        self._end = end
+
+    @property
+    def start(self):
+        return self._start
+
+    @property
+    def end(self):
+        return self._end
+
+    @property
+    def length(self):
+        return self._end - self._start
+
+    def __repr__(self):
+        return 'ScheduleCycle({}, {})'.format(self._start, self._end)
+
+
 class Preemption(ValueEqual):
 
     def __init__(self,
@@ -355,13 +440,33 @@ class SchedulerState(ABC, ValueEqual):
 
 
 class EDFSchedulerState(SchedulerState):
+    """
+    The entries are (deadline, collision, task, releaseIndex), where the
+    collision breaks the ties between the jobs with the same deadline.
+
+    The basic entries hold the priority of the job packed in a single integer
+    (see packPriority()), as used by EDFScheduler.
+    """
+
+    TIE_BREAKS = 1 << 32
 
     def __init__(self, runningEntry=None, *readyEntries):
         super().__init__(runningEntry, *readyEntries)
 
+    @staticmethod
+    def packPriority(deadline, collision):
+        return deadline * EDFSchedulerState.TIE_BREAKS + collision
+
+    @staticmethod
+    def unpackPriority(priority):
+        """
+        :return:    The deadline and the collision of the packed @p priority.
+        """
+        return divmod(priority, EDFSchedulerState.TIE_BREAKS)
+
     def _basicEntry(self, entry):
         deadline, collision, task, index = entry
-        return (deadline, collision), task, index
+        return self.packPriority(deadline, collision), task, index
 
     def _makeEntry(self, *args):
         if len(args) == 3:
@@ -388,7 +493,8 @@ class RMSchedulerState(SchedulerState):
 
     def _basicEntry(self, entry):
         task, index = entry
-        return (task.minimalInterArrivalTime, task.uniqueId), task, index
+        priority = task.minimalInterArrivalTime, task.uniqueId, index
+        return priority, task, index
 
     def _makeEntry(self, *args):
         if len(args) == 2:
@@ -405,6 +511,37 @@ class RMSchedulerState(SchedulerState):
                                                         readyStr)
 
 
+class FixedPrioritySchedulerState(SchedulerState):
+
+    def __init__(self, policy, runningEntry=None, *readyEntries):
+        super().__init__(runningEntry, *readyEntries)
+        self._policy = policy
+
+    def _basicEntry(self, entry):
+        task, index = entry
+        return (self._policy.priority(task), index), task, index
+
+    def _makeEntry(self, *args):
+        if len(args) == 2:
+            task, index = args
+        else:
+            logger.error('FixedPrioritySchedulerState created with an '
+                         'incorrect number of entry parameters: %s',
+                         len(args))
+            raise ValueError
+        return task, index
+
+    def policy(self):
+        return self._policy
+
+    def __repr__(self):
+        fmtStr = 'FixedPrioritySchedulerState({}, {}, ready[{}])'
+        readyStr = ', '.join([str(e) for e in self._readyEntries])
+        return fmtStr.format(self._policy,
+                             self._runningEntry,
+                             readyStr)
+
+
 class DualPrioritySchedulerState(SchedulerState):
 
     def __init__(self, policy, runningEntry=None, *readyEntries):
@@ -428,6 +565,11 @@ class DualPrioritySchedulerState(SchedulerState):
     def policy(self):
         return self._policy
 
+    def withPolicy(self, policy):
+        return DualPrioritySchedulerState(policy,
+                                          self._runningEntry,
+                                          *self._readyEntries)
+
     def __repr__(self):
         fmtStr = 'DualPrioritySchedulerState({}, {}, ready[{}])'
         readyStr = ', '.join([str(e) for e in self._readyEntries])
@@ -562,6 +704,27 @@ class StateDeadline(StateEvent):
                                              self._releaseIndex)
 
 
+class StatePromotion(StateEvent):
+
+    def __init__(self, time, task, releaseIndex):
+        super().__init__(time)
+        self._task = task
+        self._releaseIndex = releaseIndex
+
+    @property
+    def task(self):
+        return self._task
+
+    @property
+    def releaseIndex(self):
+        return self._releaseIndex
+
+    def __repr__(self):
+        return 'Promotion({}, {}, {})'.format(self.time,
+                                              self._task,
+                                              self._releaseIndex)
+
+
 class StateScheduleTick(StateEvent):
 
     def __init__(self, time):
@@ -0,0 +1,413 @@
+import logging
+
+import numpy as np
+
+from ..hist import (DeadlineMiss,
+                    DeadlineMissFilter,
+                    DualPrioritySchedulerState)
+from .fastsim import FastSimulator, _EDF, _DP
+from .lockstep import LockstepSimulator
+
+logger = logging.getLogger(__name__)
+
+_NEVER = np.iinfo(np.int64).max // 4
+
+# Below this number of systems, an iteration on the arrays costs more than
+# simulating the systems one by one.
+_SCALAR_THRESHOLD = 8
+
+# Approximate costs per release of a system: one iteration on the arrays (for
+# any number of systems), each system in these iterations, and a system
+# simulated by FastSimulator.
+_ITERATION_COST = 300
+_BATCH_SYSTEM_COST = 1
+_SINGLE_SYSTEM_COST = 7
+
+
+class BatchSimulator:
+    """
+    Vectorised simulation of a batch of synchronous periodic tasksets with
+    fixed preemption costs, each with its own scheduling policy, looking for
+    the first deadline miss of each system.
+
+    The state of the batch is kept in NumPy arrays of shape
+    (systems, tasks), padded with tasks that are never released.
+    Every iteration advances each system to its own next event (release,
+    completion or promotion), with the same scheduling decisions and
+    preemption costs as FastSimulator.
+    The systems leave the batch at their first deadline miss or at their
+    time limit; the last few systems are finished one by one by a
+    LockstepSimulator.
+    """
+
+    def __init__(self, tasksets, states):
+        assert len(tasksets) == len(states)
+        self._tasksets = list(tasksets)
+        self._states = list(states)
+        self._tasks = [list(taskset) for taskset in tasksets]
+        nbSystems = len(self._tasks)
+        nbTasks = max((len(tasks) for tasks in self._tasks), default=0)
+        shape = (nbSystems, nbTasks)
+
+        self._valid = np.zeros(shape, dtype=bool)
+        self._wcets = np.zeros(shape, dtype=np.int64)
+        self._periods = np.ones(shape, dtype=np.int64)
+        self._deadlines = np.zeros(shape, dtype=np.int64)
+        self._costs = np.zeros(shape, dtype=np.int64)
+        self._kinds = np.zeros(nbSystems, dtype=np.int64)
+        # Rank of each task in the tie-breaking order of EDF, and in the low
+        # and high priorities of dual priority (RM is a dual priority policy
+        # without promotions).
+        self._idRanks = np.zeros(shape, dtype=np.int64)
+        self._lowRanks = np.zeros(shape, dtype=np.int64)
+        self._highRanks = np.zeros(shape, dtype=np.int64)
+        self._promotions = np.zeros(shape, dtype=np.int64)
+        self._hasPromotion = np.zeros(shape, dtype=bool)
+
+        for s, (taskset, state) in enumerate(zip(tasksets, states)):
+            self._loadSystem(s, FastSimulator(taskset, state))
+
+    @staticmethod
+    def supports(taskset, state):
+        """
+        Whether @p taskset can be simulated from @p state, its initial state.
+
+        Besides the requirements of FastSimulator, the promotions of dual
+        priority policies must be integers.
+        """
+        if not (FastSimulator.supports(taskset, state) and
+                state.time == 0 and
+                not state.jobs):
+            return False
+        if type(state.scheduler) is DualPrioritySchedulerState:
+            policy = state.scheduler.policy()
+            return all(type(policy.promotion(task)) is int
+                       for task in taskset
+                       if policy.hasPromotion(task))
+        return True
+
+    @staticmethod
+    def workload(taskset, timeLimit):
+        """
+        The number of releases of @p taskset before @p timeLimit.
+        """
+        return sum(timeLimit // task.minimalInterArrivalTime
+                   for task in taskset)
+
+    @staticmethod
+    def batchSize(workloads):
+        """
+        The number of systems, among the ones with the smallest
+        @p workloads, that are worth simulating in a batch rather than one by
+        one.
+
+        The iterations of a batch last until its longest system is
+        simulated, so the systems with a much longer simulation than the
+        others are left out.
+        """
+        workloads = sorted(workloads)
+        total = sum(workloads)
+        result = 0
+        bestCost = _SINGLE_SYSTEM_COST * total
+        batchTotal = 0
+        for size, workload in enumerate(workloads, start=1):
+            batchTotal += workload
+            cost = (_ITERATION_COST * workload +
+                    _BATCH_SYSTEM_COST * batchTotal +
+                    _SINGLE_SYSTEM_COST * (total - batchTotal))
+            if cost < bestCost:
+                result = size
+                bestCost = cost
+        return result
+
+    def firstDeadlineMisses(self, timeLimits):
+        """
+        The first deadline miss of each system before its time limit in
+        @p timeLimits (or before @p timeLimits itself if it is a single
+        value), None for the systems without any.
+
+        When several jobs miss their deadline at the same instant, the miss of
+        the first task of the taskset is returned.
+        """
+        nbSystems, nbTasks = self._valid.shape
+        results = [None] * nbSystems
+        if nbSystems == 0:
+            return results
+        limits = np.broadcast_to(np.asarray(timeLimits, dtype=np.int64),
+                                 (nbSystems,)).copy()
+
+        systems = np.arange(nbSystems)
+        valid = self._valid
+        wcets = self._wcets
+        periods = self._periods
+        deadlines = self._deadlines
+        costs = self._costs
+        isEdf = (self._kinds == _EDF)[:, None]
+        idRanks = self._idRanks
+        lowRanks = self._lowRanks
+        highRanks = self._highRanks
+        promotions = self._promotions
+        hasPromotion = self._hasPromotion
+
+        time = np.zeros(nbSystems, dtype=np.int64)
+        nextReleases = np.where(valid, 0, _NEVER)
+        released = np.zeros(shape=valid.shape, dtype=np.int64)
+        heads = np.zeros(shape=valid.shape, dtype=np.int64)
+        progress = np.zeros(shape=valid.shape, dtype=np.int64)
+        debts = np.zeros(shape=valid.shape, dtype=np.int64)
+        running = np.full(nbSystems, -1, dtype=np.int64)
+        runStart = np.zeros(nbSystems, dtype=np.int64)
+
+        iterations = 0
+        while len(systems) > 0:
+            if len(systems) <= _SCALAR_THRESHOLD:
+                for row, s in enumerate(systems):
+                    results[s] = self._finishSystem(int(s),
+                                                    int(time[row]),
+                                                    int(limits[row]),
+                                                    nextReleases[row],
+                                                    released[row],
+                                                    heads[row],
+                                                    progress[row],
+                                                    debts[row],
+                                                    int(running[row]),
+                                                    int(runStart[row]))
+                break
+            iterations += 1
+            rows = np.arange(len(systems))
+            isRunning = running >= 0
+            runningTask = np.where(isRunning, running, 0)
+
+            # Completions
+            completions = (runStart +
+                           debts[rows, runningTask] +
+                           wcets[rows, runningTask] -
+                           progress[rows, runningTask])
+            completed = isRunning & (completions == time)
+            completedRows = rows[completed]
+            completedTasks = runningTask[completed]
+            heads[completedRows, completedTasks] += 1
+            progress[completedRows, completedTasks] = 0
+            debts[completedRows, completedTasks] = 0
+            running[completed] = -1
+            isRunning &= ~completed
+
+            # Releases
+            releasing = nextReleases == time[:, None]
+            released += releasing
+            nextReleases += np.where(releasing, periods, 0)
+
+            # Deadline misses (see LockstepSchedule._checkDeadlines())
+            pending = heads < released
+            headReleases = heads * periods
+            headDeadlines = headReleases + deadlines
+            missDeadlines = np.where(pending &
+                                     (headDeadlines <= time[:, None]),
+                                     headDeadlines,
+                                     _NEVER)
+            missIndices = heads.copy()
+            completedDeadlines = ((heads[completedRows, completedTasks] - 1) *
+                                  periods[completedRows, completedTasks] +
+                                  deadlines[completedRows, completedTasks])
+            late = completedDeadlines < time[completed]
+            lateRows = completedRows[late]
+            lateTasks = completedTasks[late]
+            missDeadlines[lateRows, lateTasks] = completedDeadlines[late]
+            missIndices[lateRows, lateTasks] -= 1
+            missed = self._recordMisses(results,
+                                        systems,
+                                        missDeadlines,
+                                        missIndices)
+
+            # Scheduling decision
+            promoted = (hasPromotion &
+                        (time[:, None] - headReleases >= promotions))
+            dpRanks = np.where(promoted, highRanks, lowRanks)
+            firstKeys = np.where(isEdf, headDeadlines, dpRanks)
+            firstKeys = np.where(pending, firstKeys, _NEVER)
+            candidates = (pending &
+                          (firstKeys == firstKeys.min(axis=1)[:, None]))
+            secondKeys = np.where(isEdf,
+                                  headReleases * nbTasks + idRanks,
+                                  0)
+            secondKeys = np.where(candidates, secondKeys, _NEVER)
+            best = np.argmin(secondKeys, axis=1)
+            hasBest = pending.any(axis=1)
+
+            starting = hasBest & ~isRunning
+            preempting = hasBest & isRunning & (best != running)
+            preemptedRows = rows[preempting]
+            preemptedTasks = running[preempting]
+            executed = time[preempting] - runStart[preempting]
+            previousDebts = debts[preemptedRows, preemptedTasks]
+            progress[preemptedRows, preemptedTasks] += np.maximum(
+                executed - previousDebts, 0)
+            debts[preemptedRows, preemptedTasks] = costs[preemptedRows,
+                                                         preemptedTasks]
+            switching = starting | preempting
+            running[switching] = best[switching]
+            runStart[switching] = time[switching]
+            isRunning |= starting
+
+            # Next event
+            nextTimes = nextReleases.min(axis=1)
+            runningTask = np.where(isRunning, running, 0)
+            completions = (runStart +
+                           debts[rows, runningTask] +
+                           wcets[rows, runningTask] -
+                           progress[rows, runningTask])
+            nextTimes = np.where(isRunning,
+                                 np.minimum(nextTimes, completions),
+                                 nextTimes)
+            nextTimes = np.minimum(nextTimes,
+                                   self._nextPromotions(time,
+                                                        heads,
+                                                        released,
+                                                        running,
+                                                        periods,
+                                                        promotions,
+                                                        hasPromotion))
+
+            finishing = ~missed & (nextTimes >= limits)
+            if finishing.any():
+                # The jobs still pending at the time limit
+                missDeadlines = np.where(pending[finishing] &
+                                         (headDeadlines[finishing] <
+                                          limits[finishing, None]),
+                                         headDeadlines[finishing],
+                                         _NEVER)
+                self._recordMisses(results,
+                                   systems[finishing],
+                                   missDeadlines,
+                                   heads[finishing])
+            staying = ~missed & ~finishing
+            if staying.all():
+                time = nextTimes
+            else:
+                systems = systems[staying]
+                limits = limits[staying]
+                time = nextTimes[staying]
+                wcets = wcets[staying]
+                periods = periods[staying]
+                deadlines = deadlines[staying]
+                costs = costs[staying]
+                isEdf = isEdf[staying]
+                idRanks = idRanks[staying]
+                lowRanks = lowRanks[staying]
+                highRanks = highRanks[staying]
+                promotions = promotions[staying]
+                hasPromotion = hasPromotion[staying]
+                nextReleases = nextReleases[staying]
+                released = released[staying]
+                heads = heads[staying]
+                progress = progress[staying]
+                debts = debts[staying]
+                running = running[staying]
+                runStart = runStart[staying]
+        logger.debug('Batch of %s systems simulated in %s iterations',
+                     nbSystems,
+                     iterations)
+        return results
+
+    @staticmethod
+    def _nextPromotions(time,
+                        heads,
+                        released,
+                        running,
+                        periods,
+                        promotions,
+                        hasPromotion):
+        """
+        The first promotion instant after @p time of a ready job that is not
+        running, for each system (see FastSimulator._nextPromotion()).
+        """
+        taskIndices = np.arange(heads.shape[1])
+        indices = heads + (taskIndices == running[:, None])
+        promotionTimes = indices * periods + promotions
+        late = promotionTimes <= time[:, None]
+        lateIndices = (time[:, None] - promotions) // periods + 1
+        indices = np.where(late, lateIndices, indices)
+        promotionTimes = indices * periods + promotions
+        upcoming = hasPromotion & (indices < released)
+        return np.where(upcoming, promotionTimes, _NEVER).min(axis=1)
+
+    def _recordMisses(self, results, systems, missDeadlines, missIndices):
+        """
+        Record in @p results the earliest deadline miss of each system whose
+        row of @p missDeadlines has one, and return the rows that do.
+        """
+        firstTasks = np.argmin(missDeadlines, axis=1)
+        rows = np.arange(len(systems))
+        missed = missDeadlines[rows, firstTasks] < _NEVER
+        for row in rows[missed]:
+            k = int(firstTasks[row])
+            s = int(systems[row])
+            results[s] = DeadlineMiss(self._tasks[s][k],
+                                      int(missIndices[row, k]))
+        return missed
+
+    def _finishSystem(self,
+                      s,
+                      time,
+                      timeLimit,
+                      nextReleases,
+                      released,
+                      heads,
+                      progress,
+                      debts,
+                      running,
+                      runStart):
+        """
+        The first deadline miss of system @p s, simulated by a
+        LockstepSimulator from the state of its row at @p time, before the
+        events of that instant.
+        """
+        nbTasks = len(self._tasks[s])
+        simulator = LockstepSimulator(self._tasksets[s],
+                                      [self._states[s]],
+                                      DeadlineMissFilter(True))
+        schedule = simulator._schedules[0]
+        schedule._heads = heads[:nbTasks].tolist()
+        schedule._progress = progress[:nbTasks].tolist()
+        schedule._debts = debts[:nbTasks].tolist()
+        schedule._running = running
+        schedule._runStart = runStart
+        schedule.nextEvent = time
+        return simulator._run(time,
+                              nextReleases[:nbTasks].tolist(),
+                              released[:nbTasks].tolist(),
+                              timeLimit)[0]
+
+    def _loadSystem(self, s, kernel):
+        nbTasks = len(kernel._tasks)
+        tasks = slice(0, nbTasks)
+        self._valid[s, tasks] = True
+        self._wcets[s, tasks] = kernel._wcets
+        self._periods[s, tasks] = kernel._periods
+        self._deadlines[s, tasks] = kernel._deadlines
+        self._costs[s, tasks] = kernel._costs
+        self._kinds[s] = kernel._kind
+        self._idRanks[s, tasks] = _ranks(kernel._uniqueIds)
+        for rank, k in enumerate(kernel._rmOrder):
+            self._lowRanks[s, k] = rank
+        if kernel._kind == _DP:
+            # The ranks of all the priority values keep their order.
+            values = sorted(set(kernel._lowPriorities) |
+                            {p for k, p in enumerate(kernel._highPriorities)
+                             if kernel._promotions[k] is not None})
+            ranks = {value: rank for rank, value in enumerate(values)}
+            for k, promotion in enumerate(kernel._promotions):
+                self._lowRanks[s, k] = ranks[kernel._lowPriorities[k]]
+                if promotion is not None:
+                    assert type(promotion) is int
+                    self._highRanks[s, k] = ranks[kernel._highPriorities[k]]
+                    self._promotions[s, k] = promotion
+                    self._hasPromotion[s, k] = True
+
+
+def _ranks(values):
+    order = sorted(range(len(values)), key=lambda k: values[k])
+    result = [0] * len(values)
+    for rank, k in enumerate(order):
+        result[k] = rank
+    return result
@@ -0,0 +1,56 @@
+import logging
+from time import perf_counter
+
+logger = logging.getLogger(__name__)
+
+
+class SimulationBudget:
+    """
+    Limits the work of the simulators of a simulation to @p seconds of wall
+    clock time (counted from the creation of the budget) and/or to
+    @p instants scheduling instants, i.e. instants at which events occur.
+
+    The simulators spend one instant of the budget after each instant they
+    simulate and stop once it is exhausted; the clock is only read every
+    CLOCK_PERIOD instants.
+    """
+
+    CLOCK_PERIOD = 64
+
+    def __init__(self, seconds=None, instants=None):
+        super().__init__()
+        if seconds is None:
+            self._deadline = None
+        else:
+            self._deadline = perf_counter() + seconds
+        self._maxInstants = instants
+        self._instants = 0
+        self._exhausted = False
+
+    @property
+    def instants(self):
+        """
+        The number of instants spent.
+        """
+        return self._instants
+
+    def exhausted(self):
+        return self._exhausted
+
+    def spend(self):
+        """
+        Spend one instant.
+
+        :return:    Whether the simulation can go on.
+        """
+        self._instants += 1
+        if (self._maxInstants is not None and
+                self._instants >= self._maxInstants):
+            self._exhausted = True
+        elif (self._deadline is not None and
+                self._instants % self.CLOCK_PERIOD == 0 and
+                perf_counter() >= self._deadline):
+            self._exhausted = True
+        if self._exhausted:
+            logger.debug('Budget exhausted after %s instants', self._instants)
+        return not self._exhausted
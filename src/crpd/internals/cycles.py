@@ -0,0 +1,52 @@
+import logging
+
+from ..hist import ScheduleCycle
+
+logger = logging.getLogger(__name__)
+
+
+class RepetitionFinder:
+    """
+    Finds a repetition in the fingerprints of the states that a simulator
+    records at successive instants.
+
+    The recorded state at an instant determines the next recorded one, so
+    the sequence of fingerprints is eventually periodic, and Brent's
+    algorithm finds its period while keeping a single fingerprint: the
+    saved fingerprint is replaced after 1, 2, 4... recordings, and the
+    repetition is found after at most about twice the recordings of the
+    prefix and the cycle.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._savedTime = None
+        self._savedFingerprint = None
+        self._power = 1
+        self._steps = 0
+
+    def record(self, time, fingerprint):
+        """
+        Record the state at @p time, whose @p fingerprint is relative to
+        @p time.
+
+        :return:    A ScheduleCycle if the state is the saved one, None
+                    otherwise.
+        """
+        savedTime = self._savedTime
+        if savedTime is not None:
+            if time <= savedTime:
+                # The instant of the saved state is recorded again when a
+                # simulation is resumed from it.
+                return None
+            if fingerprint == self._savedFingerprint:
+                logger.debug('State at %s repeated at %s', savedTime, time)
+                return ScheduleCycle(savedTime, time)
+            self._steps += 1
+            if self._steps < self._power:
+                return None
+            self._power *= 2
+            self._steps = 0
+        self._savedTime = time
+        self._savedFingerprint = fingerprint
+        return None
@@ -0,0 +1,111 @@
+import heapq
+import logging
+
+from ..model import FixedArrivalDistribution, FixedPreemptionCost
+from ..policy import DualPrioritySchedulingPolicy
+
+logger = logging.getLogger(__name__)
+
+
+class IdleInstantFinder:
+    """
+    Finds the release instants of a synchronous periodic taskset at which the
+    processor is idle and no job is pending, whatever the schedule.
+
+    The search only looks at the processor demand: every job is charged its
+    WCET plus the largest preemption cost of the taskset for each preemption
+    it can cause (one at its arrival, and one at its promotion for dual
+    priority tasks with a promotion).
+    An instant where the backlog of that pessimistic demand is zero is an
+    idle instant of the actual schedule.
+    """
+
+    def __init__(self, taskset, schedulingPolicy):
+        assert IdleInstantFinder.supports(taskset)
+        tasks = list(taskset)
+        maxCost = max(t.preemptionCost.cost(None) for t in tasks)
+        self._periods = [t.minimalInterArrivalTime for t in tasks]
+        self._demands = []
+        for task in tasks:
+            nbPreemptions = 1
+            if (isinstance(schedulingPolicy, DualPrioritySchedulingPolicy) and
+                    schedulingPolicy.hasPromotion(task)):
+                nbPreemptions = 2
+            self._demands.append(task.wcet + nbPreemptions * maxCost)
+        self._busyPeriod = self._synchronousBusyPeriod()
+
+    @staticmethod
+    def supports(taskset):
+        """
+        Whether every task of @p taskset is periodic with a
+        FixedArrivalDistribution and a FixedPreemptionCost, with integer
+        timing parameters.
+        """
+        tasks = list(taskset)
+        if not tasks:
+            return False
+        for task in tasks:
+            if type(task.arrivalDistribution) is not FixedArrivalDistribution:
+                return False
+            if type(task.preemptionCost) is not FixedPreemptionCost:
+                return False
+            values = (task.wcet,
+                      task.minimalInterArrivalTime,
+                      task.preemptionCost.cost(None))
+            if not all(type(v) is int for v in values):
+                return False
+            if task.minimalInterArrivalTime <= 0:
+                return False
+        return True
+
+    @property
+    def busyPeriod(self):
+        """
+        The length of the longest busy period of the pessimistic demand, None
+        if it is unbounded (the pessimistic utilization is at least 1).
+        """
+        return self._busyPeriod
+
+    def idleInstantAfter(self, time):
+        """
+        The first release instant at or after @p time where the processor is
+        idle and no job is pending, before the releases of that instant.
+
+        :return:    None if the busy periods are unbounded.
+        """
+        if self._busyPeriod is None:
+            return None
+        # Any busy period containing the start of the scan ends before
+        # @p time, so the backlog computed from an empty processor is an
+        # upper bound of the actual backlog from @p time on.
+        start = max(0, time - self._busyPeriod)
+        releases = [((start + period - 1) // period * period, k)
+                    for k, period in enumerate(self._periods)]
+        heapq.heapify(releases)
+        backlog = 0
+        previousTime = start
+        while True:
+            releaseTime = releases[0][0]
+            backlog = max(0, backlog - (releaseTime - previousTime))
+            if backlog == 0 and releaseTime >= time:
+                return releaseTime
+            while releases[0][0] == releaseTime:
+                _, k = releases[0]
+                backlog += self._demands[k]
+                heapq.heapreplace(releases,
+                                  (releaseTime + self._periods[k], k))
+            previousTime = releaseTime
+
+    def _synchronousBusyPeriod(self):
+        utilization = sum(d / p for d, p in zip(self._demands, self._periods))
+        if utilization >= 1:
+            logger.debug('Pessimistic utilization %s, no idle instant',
+                         utilization)
+            return None
+        length = sum(self._demands)
+        while True:
+            demand = sum((length + p - 1) // p * d
+                         for d, p in zip(self._demands, self._periods))
+            if demand == length:
+                return length
+            length = demand
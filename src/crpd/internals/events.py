@@ -1,10 +1,10 @@
 import logging
-from abc import ABCMeta, abstractproperty, abstractmethod
 
 from ..hist import (StateScheduleTick,
                     StateArrival,
                     StateCompletion,
-                    StateDeadline)
+                    StateDeadline,
+                    StatePromotion)
 
 logger = logging.getLogger(__name__)
 
@@ -14,41 +14,71 @@ def convertStateEvent(jobManager, stateEvent):
     return convFunc(jobManager, stateEvent)
 
 
-class _Event(metaclass=ABCMeta):
+class _Event:
+    """
+    The events are created and executed in the inner loop of the simulator,
+    so they have slots and no abstract base class machinery; subclasses must
+    redefine priority, execute() and stateConverted().
+    """
+
+    __slots__ = '_time', '_cancelled'
 
     def __init__(self, time):
         self._time = time
+        self._cancelled = False
 
     @property
     def time(self):
         return self._time
 
     @property
-    @abstractmethod
     def priority(self):
-        pass
+        raise NotImplementedError
 
-    @abstractmethod
     def execute(self, simulator):
-        pass
+        raise NotImplementedError
 
-    @abstractmethod
     def stateConverted(self):
-        pass
+        raise NotImplementedError
+
+    def reuse(self, time):
+        """
+        Make this event, which must not be in an event queue anymore, occur
+        again at @p time.
+        """
+        self._time = time
+        self._cancelled = False
 
     def ignore(self):
-        return False
+        return self._cancelled
+
+    def discarded(self):
+        """
+        Called when this cancelled event is dropped from the top of the event
+        queue, after which nothing refers to it.
+        """
+        pass
+
+    def cancel(self):
+        """
+        Invalidate this event, which stays in the event queue until it is
+        dropped or compacted away.
+        """
+        self._cancelled = True
 
 
 class Deadline(_Event):
 
+    __slots__ = '_job', '_priority'
+
     def __init__(self, time, job):
         super().__init__(time)
         self._job = job
+        self._priority = 3, job.taskId
 
     @property
     def priority(self):
-        return 3, self._job.taskId
+        return self._priority
 
     @property
     def job(self):
@@ -66,13 +96,16 @@ class Deadline(_Event):
 
 class Arrival(_Event):
 
+    __slots__ = '_job', '_priority'
+
     def __init__(self, time, job):
         super().__init__(time)
         self._job = job
+        self._priority = 2, job.taskId
 
     @property
     def priority(self):
-        return 2, self._job.taskId
+        return self._priority
 
     @property
     def job(self):
@@ -90,13 +123,16 @@ class Arrival(_Event):
 
 class Completion(_Event):
 
+    __slots__ = '_job', '_priority'
+
     def __init__(self, time, job):
         super().__init__(time)
         self._job = job
+        self._priority = 1, job.taskId
 
     @property
     def priority(self):
-        return 1, self._job.taskId
+        return self._priority
 
     @property
     def job(self):
@@ -110,40 +146,74 @@ class Completion(_Event):
                                self._job.task,
                                self._job.releaseIndex)
 
-    def ignore(self):
+    def isOutdated(self):
+        """
+        Whether this completion does not match the current progress of its
+        job (used to recognise stale completions in a saved state).
+        """
         remExec = self._job.remainingExecWithDebt()
         if remExec > 0:
             if self._job.hasBeenStarted():
                 completionTime = remExec + self._job.lastStart()
-                try:
-                    assert completionTime >= self._time
-                except AssertionError as e:
-                    logger.exception(
-                        'Remaining exec time: %s Last start: %s '
-                        'Current time: %s',
-                        remExec,
-                        self._job.lastStart(),
-                        self._time)
-                    raise e
-                ignored = not (self._time == completionTime)
-                return ignored
+                return self._time != completionTime
             else:
                 return True
         else:
             return False
 
+    def discarded(self):
+        self._job.setSpareCompletion(self)
+
     def __repr__(self):
         return 'Completion({}, {})'.format(self.time, self._job)
 
 
+class Promotion(_Event):
+    """
+    The instant at which the priority of a waiting job is raised.
+
+    The event only exists while its job is ready and not running.
+    """
+
+    __slots__ = '_job', '_priority'
+
+    def __init__(self, time, job):
+        super().__init__(time)
+        self._job = job
+        self._priority = 4, job.taskId
+
+    @property
+    def priority(self):
+        return self._priority
+
+    @property
+    def job(self):
+        return self._job
+
+    def execute(self, simulator):
+        simulator.promotion(self._job)
+
+    def stateConverted(self):
+        return StatePromotion(self.time,
+                              self._job.task,
+                              self._job.releaseIndex)
+
+    def __repr__(self):
+        return 'Promotion({}, {})'.format(self.time, self._job)
+
+
 class ScheduleTick(_Event):
 
+    __slots__ = ()
+
     def __init__(self, time):
         super().__init__(time)
 
+    _PRIORITY = 5, 0
+
     @property
     def priority(self):
-        return 4, 0
+        return ScheduleTick._PRIORITY
 
     def execute(self, simulator):
         simulator.addNextScheduleTicks()
@@ -157,8 +227,7 @@ class ScheduleTick(_Event):
 
 def _convertArrival(jobManager, stateArrival):
     job = jobManager.getJob(stateArrival.task, stateArrival.releaseIndex)
-    arrival = Arrival(stateArrival.time, job)
-    return arrival
+    return job.arrivalEvent()
 
 
 def _convertCompletion(jobManager, stateCompletion):
@@ -169,8 +238,13 @@ def _convertCompletion(jobManager, stateCompletion):
 
 def _convertDeadline(jobManager, stateDeadline):
     job = jobManager.getJob(stateDeadline.task, stateDeadline.releaseIndex)
-    deadline = Deadline(stateDeadline.time, job)
-    return deadline
+    return job.deadlineEvent()
+
+
+def _convertPromotion(jobManager, statePromotion):
+    job = jobManager.getJob(statePromotion.task, statePromotion.releaseIndex)
+    promotion = Promotion(statePromotion.time, job)
+    return promotion
 
 
 def _convertScheduleTick(jobManager, stateScheduleTick):
@@ -181,4 +255,5 @@ def _convertScheduleTick(jobManager, stateScheduleTick):
 _conversionFunctions = {StateArrival: _convertArrival,
                         StateCompletion: _convertCompletion,
                         StateDeadline: _convertDeadline,
+                        StatePromotion: _convertPromotion,
                         StateScheduleTick: _convertScheduleTick}
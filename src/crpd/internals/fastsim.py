@@ -0,0 +1,517 @@
+import logging
+from ..model import FixedArrivalDistribution, FixedPreemptionCost
+from ..hist import (SimulatorState,
+                    JobState,
+                    StateArrival,
+                    StateDeadline,
+                    EDFSchedulerState,
+                    RMSchedulerState,
+                    FixedPrioritySchedulerState,
+                    DualPrioritySchedulerState)
+from ..stats import (PreemptionCountAggregator,
+                     PreemptionTimeAggregator,
+                     ExecutionTimeAggregator,
+                     LongestResponseTimeAggregator)
+from .cycles import RepetitionFinder
+
+logger = logging.getLogger(__name__)
+
+_SUMMARY_AGGREGATORS = (PreemptionCountAggregator,
+                        PreemptionTimeAggregator,
+                        ExecutionTimeAggregator,
+                        LongestResponseTimeAggregator)
+
+_EDF = 0
+_RM = 1
+_DP = 2
+
+# Fixed priorities are simulated as dual priorities without promotions.
+_SCHEDULER_KINDS = {EDFSchedulerState: _EDF,
+                    RMSchedulerState: _RM,
+                    FixedPrioritySchedulerState: _DP,
+                    DualPrioritySchedulerState: _DP}
+
+
+class FastSimulator:
+    """
+    Array-backed simulation kernel for synchronous periodic tasksets with
+    fixed preemption costs.
+
+    Task parameters and the state of the oldest pending job of each task are
+    kept in flat lists indexed by the position of the task in the taskset.
+    Jobs of a task are always served in release order by the supported
+    schedulers, so no per-job object is ever created.
+
+    The kernel does not build any SimulatorState while running.
+    It starts from the initial state or from any other idle instant, and stops
+    at the last instant before the time limit (or before the first deadline
+    miss) where the processor is idle and no job is pending, and returns the
+    exact state of the simulation at that instant.
+    The reference Simulator then finishes the simulation from that state, so
+    that the histories produced with or without this kernel are identical.
+
+    With a @p budget (a SimulationBudget), the kernel also stops when the
+    budget is exhausted.
+    """
+
+    def __init__(self,
+                 taskset,
+                 state,
+                 statAggregators=None,
+                 detectCycles=False,
+                 budget=None):
+        assert FastSimulator.supports(taskset, state, statAggregators)
+        self._tasks = list(taskset)
+        self._initState = state
+        self._kind = _SCHEDULER_KINDS[type(state.scheduler)]
+        if statAggregators is None:
+            self._aggregators = tuple()
+        else:
+            self._aggregators = tuple(statAggregators)
+
+        tasks = self._tasks
+        self._wcets = [t.wcet for t in tasks]
+        self._periods = [t.minimalInterArrivalTime for t in tasks]
+        self._deadlines = [t.deadline for t in tasks]
+        self._costs = [t.preemptionCost.cost(None) for t in tasks]
+        self._uniqueIds = [t.uniqueId for t in tasks]
+        self._rmOrder = sorted(range(len(tasks)),
+                               key=lambda k: (self._periods[k],
+                                              self._uniqueIds[k]))
+        if type(state.scheduler) is FixedPrioritySchedulerState:
+            policy = state.scheduler.policy()
+            self._lowPriorities = [policy.priority(t) for t in tasks]
+            self._highPriorities = [None for t in tasks]
+            self._promotions = [None for t in tasks]
+            self._promotedTasks = []
+        elif self._kind == _DP:
+            policy = state.scheduler.policy()
+            self._lowPriorities = [policy.lowPriority(t) for t in tasks]
+            self._highPriorities = [policy.highPriority(t) for t in tasks]
+            self._promotions = [policy.promotion(t)
+                                if policy.hasPromotion(t) else None
+                                for t in tasks]
+            self._promotedTasks = [k for k, p in enumerate(self._promotions)
+                                   if p is not None]
+        self._start = FastSimulator._idleState(tasks, state)
+        self._checkpoint = None
+        self._hyperperiod = taskset.hyperperiod
+        if detectCycles:
+            self._repetitionFinder = RepetitionFinder()
+        else:
+            self._repetitionFinder = None
+        self._cycle = None
+        self._deadlineMissReached = False
+        self._budget = budget
+
+    @staticmethod
+    def supports(taskset, state, statAggregators=None):
+        """
+        Whether the kernel can simulate @p taskset from @p state.
+
+        Every task must be periodic with a FixedArrivalDistribution and a
+        FixedPreemptionCost, all timing parameters must be integers, @p state
+        must be an idle instant of the simulation (such as its initial state)
+        and every aggregator must be able to merge a summary of the simulated
+        states.
+        """
+        tasks = list(taskset)
+        if not tasks:
+            return False
+        for task in tasks:
+            if type(task.arrivalDistribution) is not FixedArrivalDistribution:
+                return False
+            if type(task.preemptionCost) is not FixedPreemptionCost:
+                return False
+            values = (task.wcet,
+                      task.deadline,
+                      task.minimalInterArrivalTime,
+                      task.preemptionCost.cost(None))
+            if not all(type(v) is int for v in values):
+                return False
+            if task.minimalInterArrivalTime <= 0:
+                return False
+        if statAggregators is not None:
+            if not all(type(a) in _SUMMARY_AGGREGATORS
+                       for a in statAggregators):
+                return False
+        return (FastSimulator._idleState(tasks, state) is not None and
+                FastSimulator._supportsScheduler(tasks, state.scheduler))
+
+    @staticmethod
+    def _idleState(tasks, state):
+        """
+        The next release index and the lingering jobs of every task if no job
+        is pending in @p state, None otherwise.
+
+        Besides the next job of each task (which may be absent), the only jobs
+        allowed are completed jobs whose deadline is not reached yet.
+        """
+        if state.deadlineMisses:
+            return None
+        arrivals = {}
+        for event in state.events:
+            if type(event) is StateArrival:
+                if event.task in arrivals:
+                    return None
+                arrivals[event.task] = event
+            elif type(event) is not StateDeadline:
+                return None
+        if len(arrivals) != len(tasks):
+            return None
+        released = []
+        for task in tasks:
+            arrival = arrivals.get(task)
+            if arrival is None or arrival.time < state.time:
+                return None
+            released.append(arrival.releaseIndex)
+
+        positions = {task: k for k, task in enumerate(tasks)}
+        lingering = [[] for _ in tasks]
+        for job in state.jobs:
+            k = positions.get(job.task)
+            if k is None or job.preemptionDebt != 0:
+                return None
+            task = job.task
+            if job.releaseIndex == released[k]:
+                if job.progress != 0:
+                    return None
+            elif (job.releaseIndex > released[k] or
+                    job.remainingWcet != 0 or
+                    task.arrivalTime(job.releaseIndex) +
+                    task.deadline <= state.time):
+                return None
+            else:
+                lingering[k].append((job.releaseIndex, job.lastStart))
+        for event in state.events:
+            if type(event) is StateDeadline:
+                k = positions.get(event.task)
+                if k is None:
+                    return None
+                if event.releaseIndex not in (i for i, _ in lingering[k]):
+                    return None
+        for jobs in lingering:
+            jobs.sort()
+        return released, lingering
+
+    @staticmethod
+    def _supportsScheduler(tasks, schedulerState):
+        if type(schedulerState) not in _SCHEDULER_KINDS:
+            return False
+        if schedulerState.runningEntry is not None:
+            return False
+        if schedulerState.readyEntries:
+            return False
+        if type(schedulerState) is DualPrioritySchedulerState:
+            policy = schedulerState.policy()
+            try:
+                priorityValues = []
+                for task in tasks:
+                    priorityValues.append(policy.lowPriority(task))
+                    if policy.hasPromotion(task):
+                        priorityValues.append(policy.highPriority(task))
+            except AssertionError:
+                return False
+            if len(priorityValues) != len(set(priorityValues)):
+                return False
+        if type(schedulerState) is FixedPrioritySchedulerState:
+            policy = schedulerState.policy()
+            try:
+                priorityValues = [policy.priority(task) for task in tasks]
+            except AssertionError:
+                return False
+            if len(priorityValues) != len(set(priorityValues)):
+                return False
+        return True
+
+    def simulateTo(self, timeLimit):
+        """
+        Simulate until @p timeLimit or until the first deadline miss.
+
+        The aggregators are updated with every state preceding the returned
+        one.
+        Successive calls continue the simulation from the state returned by the
+        previous one.
+
+        :param timeLimit:   Events at or after this time are not processed.
+        :return:            The state at the last idle instant reached, or the
+                            state it started from if there was none.
+        """
+        self._checkpoint = None
+        self._deadlineMissReached = False
+        self._run(timeLimit)
+        if (self._checkpoint is None or
+                self._checkpoint[0] == self._initState.time):
+            logger.debug('No idle instant found before %s', timeLimit)
+            return self._initState
+        summary = _FastSummary(self._tasks,
+                               self._wcets,
+                               self._initState,
+                               self._start[0],
+                               *self._checkpoint)
+        for aggregator in self._aggregators:
+            aggregator.mergeSummary(summary)
+        state = self._checkpointState()
+        logger.debug('Fast simulation stopped at idle instant %s', state.time)
+        self._initState = state
+        self._start = FastSimulator._idleState(self._tasks, state)
+        return state
+
+    def cycle(self):
+        """
+        The repetition of the schedule detected by the last call to
+        simulateTo(), None if there was none (or if cycles are not detected).
+
+        When there is one, the returned state is the state at the end of the
+        cycle.
+        """
+        return self._cycle
+
+    def deadlineMissReached(self):
+        """
+        Whether the last call to simulateTo() stopped before a deadline miss.
+        """
+        return self._deadlineMissReached
+
+    def _run(self, timeLimit):
+        nbTasks = len(self._tasks)
+        taskRange = range(nbTasks)
+        wcets = self._wcets
+        periods = self._periods
+        deadlines = self._deadlines
+        costs = self._costs
+        budget = self._budget
+
+        startReleased, startLingering = self._start
+        nextReleases = [index * periods[k]
+                        for k, index in enumerate(startReleased)]
+        released = list(startReleased)
+        heads = list(startReleased)
+        progress = [0] * nbTasks
+        debts = [0] * nbTasks
+        lingering = [list(jobs) for jobs in startLingering]
+        responseTimes = [None] * nbTasks
+
+        time = self._initState.time
+        running = -1
+        runStart = time
+        preemptionCount = 0
+        preemptionTime = 0
+
+        while True:
+            if running >= 0:
+                k = running
+                completion = runStart + debts[k] + wcets[k] - progress[k]
+                if completion == time:
+                    head = heads[k]
+                    release = head * periods[k]
+                    deadline = release + deadlines[k]
+                    if completion > deadline:
+                        logger.debug('Deadline miss of task %s job %s',
+                                     k, head)
+                        self._deadlineMissReached = True
+                        return
+                    responseTime = completion - release
+                    if (responseTimes[k] is None or
+                            responseTime > responseTimes[k]):
+                        responseTimes[k] = responseTime
+                    if completion < deadline:
+                        jobs = [(i, c) for i, c in lingering[k]
+                                if i * periods[k] + deadlines[k] > time]
+                        jobs.append((head, completion))
+                        lingering[k] = jobs
+                    heads[k] = head + 1
+                    progress[k] = 0
+                    debts[k] = 0
+                    running = -1
+
+            for k in taskRange:
+                if nextReleases[k] == time:
+                    released[k] += 1
+                    nextReleases[k] += periods[k]
+
+            best = self._topTask(time, heads, released)
+            if best < 0:
+                self._checkpoint = (time,
+                                    list(released),
+                                    [list(jobs) for jobs in lingering],
+                                    preemptionCount,
+                                    preemptionTime,
+                                    list(responseTimes))
+                if self._repetitionFinder is not None:
+                    self._cycle = self._recordIdleInstant(time, lingering)
+                    if self._cycle is not None:
+                        return
+            elif running < 0:
+                running = best
+                runStart = time
+            elif best != running:
+                k = running
+                executed = time - runStart
+                if executed >= debts[k]:
+                    progress[k] += executed - debts[k]
+                    previousDebt = 0
+                else:
+                    previousDebt = debts[k] - executed
+                debts[k] = costs[k]
+                preemptionCount += 1
+                preemptionTime += costs[k] - previousDebt
+                running = best
+                runStart = time
+
+            nextTime = min(nextReleases)
+            if running >= 0:
+                k = running
+                completion = runStart + debts[k] + wcets[k] - progress[k]
+                if completion < nextTime:
+                    nextTime = completion
+            if self._kind == _DP:
+                promotion = self._nextPromotion(time, heads, released, running)
+                if promotion is not None and promotion < nextTime:
+                    nextTime = promotion
+            if nextTime >= timeLimit:
+                return
+            if budget is not None and not budget.spend():
+                return
+            time = nextTime
+
+    def _recordIdleInstant(self, time, lingering):
+        """
+        At an idle instant, the schedule only depends on the offset of @p time
+        in the hyperperiod; the state also contains the completed jobs whose
+        deadline is not reached yet.
+        """
+        def lingeringJobs(k):
+            period = self._periods[k]
+            deadline = self._deadlines[k]
+            for index, completion in lingering[k]:
+                release = index * period
+                if release + deadline > time:
+                    yield release - time, completion - time
+
+        fingerprint = (time % self._hyperperiod,
+                       tuple(tuple(lingeringJobs(k))
+                             for k in range(len(lingering))))
+        return self._repetitionFinder.record(time, fingerprint)
+
+    def _topTask(self, time, heads, released):
+        kind = self._kind
+        if kind == _RM:
+            for k in self._rmOrder:
+                if released[k] > heads[k]:
+                    return k
+            return -1
+
+        best = -1
+        bestKey = None
+        periods = self._periods
+        for k in range(len(heads)):
+            head = heads[k]
+            if released[k] > head:
+                release = head * periods[k]
+                if kind == _EDF:
+                    key = (release + self._deadlines[k],
+                           release,
+                           self._uniqueIds[k])
+                else:
+                    key = self._dpPriority(k, time - release)
+                if bestKey is None or key < bestKey:
+                    best = k
+                    bestKey = key
+        return best
+
+    def _dpPriority(self, k, relativeTime):
+        promotion = self._promotions[k]
+        if promotion is None or relativeTime < promotion:
+            return self._lowPriorities[k]
+        else:
+            return self._highPriorities[k]
+
+    def _nextPromotion(self, time, heads, released, running):
+        """
+        The first promotion instant after @p time of a job that is ready and
+        not running (the reference Simulator only keeps promotion events for
+        these jobs).
+        """
+        result = None
+        periods = self._periods
+        promotions = self._promotions
+        for k in self._promotedTasks:
+            index = heads[k]
+            if k == running:
+                index += 1
+            if index < released[k]:
+                promotionTime = index * periods[k] + promotions[k]
+                if promotionTime <= time:
+                    index = (time - promotions[k]) // periods[k] + 1
+                    if index >= released[k]:
+                        continue
+                    promotionTime = index * periods[k] + promotions[k]
+                if result is None or promotionTime < result:
+                    result = promotionTime
+        return result
+
+    def _checkpointState(self):
+        time, released, lingering = self._checkpoint[:3]
+        jobs = []
+        events = []
+        for k, task in enumerate(self._tasks):
+            nextIndex = released[k]
+            jobs.append(JobState(task, nextIndex))
+            events.append(StateArrival(task.arrivalTime(nextIndex),
+                                       task,
+                                       nextIndex))
+            for index, completion in lingering[k]:
+                deadline = task.arrivalTime(index) + task.deadline
+                if deadline > time:
+                    jobs.append(JobState(task,
+                                         index,
+                                         task.wcet,
+                                         lastStart=completion))
+                    events.append(StateDeadline(deadline, task, index))
+        return SimulatorState(time,
+                              jobs,
+                              events,
+                              scheduler=self._initState.scheduler)
+
+
+class _FastSummary:
+    """
+    What the aggregators would have observed in the states skipped by the
+    FastSimulator, since its start state.
+    """
+
+    def __init__(self,
+                 tasks,
+                 wcets,
+                 startState,
+                 startReleased,
+                 time,
+                 released,
+                 lingering,
+                 preemptionCount,
+                 preemptionTime,
+                 responseTimes):
+        self.time = time
+        self.preemptionCount = preemptionCount
+        self.preemptionTime = preemptionTime
+
+        # The progress of the jobs of the start state was already observed,
+        # it is replaced by the progress in jobProgress.
+        startProgress = {(job.task, job.releaseIndex): job.progress
+                         for job in startState.jobs}
+        self.jobProgress = {}
+        retiredProgress = 0
+        for k, task in enumerate(tasks):
+            for index, _ in lingering[k]:
+                if task.arrivalTime(index) + task.deadline > time:
+                    self.jobProgress[(task, index)] = wcets[k]
+            self.jobProgress[(task, released[k])] = 0
+            retiredProgress += wcets[k] * (released[k] - startReleased[k])
+        for jobId, jobProgress in self.jobProgress.items():
+            retiredProgress += startProgress.get(jobId, 0) - jobProgress
+        self.retiredProgress = retiredProgress
+
+        self.longestResponseTimes = {task: responseTimes[k]
+                                     for k, task in enumerate(tasks)
+                                     if responseTimes[k] is not None}
@@ -20,6 +20,23 @@ class _HistoryMap:
         else:
             return self._all
 
+    def prefix(self, time):
+        """
+        A new map with the items of this one until @p time.
+        """
+        historyMap = type(self)()
+        for item in self._all:
+            if item.time <= time:
+                historyMap.addItem(item)
+        return historyMap
+
+    def merge(self, historyMap):
+        """
+        Add the items of @p historyMap to this map.
+        """
+        for item in historyMap._all:
+            self.addItem(item)
+
     def _addItem(self, item, **args):
         for key, argval in args.items():
             mapForKey = self._maps[key]
@@ -37,9 +54,12 @@ class DeadlineMissMap(_HistoryMap):
 
     def addState(self, state):
         for deadlineMiss in state.deadlineMisses:
-            self._addItem(deadlineMiss,
-                          time=deadlineMiss.time,
-                          task=deadlineMiss.task)
+            self.addItem(deadlineMiss)
+
+    def addItem(self, deadlineMiss):
+        self._addItem(deadlineMiss,
+                      time=deadlineMiss.time,
+                      task=deadlineMiss.task)
 
     def firstOccurrence(self, dmFilter):
         allMisses = set(self.lookup())
@@ -58,7 +78,10 @@ class PreemptionMap(_HistoryMap):
 
     def addState(self, state):
         for preemption in state.preemptions:
-            self._addItem(preemption,
-                          time=preemption.time,
-                          preemptedTask=preemption.preemptedTask,
-                          preemptingTask=preemption.preemptingTask)
+            self.addItem(preemption)
+
+    def addItem(self, preemption):
+        self._addItem(preemption,
+                      time=preemption.time,
+                      preemptedTask=preemption.preemptedTask,
+                      preemptingTask=preemption.preemptingTask)
@@ -1,16 +1,29 @@
 import logging
 
 from ..hist import JobState, Preemption
-from .events import Deadline, Arrival
+from .events import Deadline, Arrival, Completion
 
 
 logger = logging.getLogger(__name__)
 
 
 class JobManager:
+    """
+    The jobs of a simulation, by task and release index.
 
-    def __init__(self, jobStates):
+    The jobs retired by removeJob() are pooled by task and reused, with their
+    events, for the next releases of the task, so that the number of jobs
+    allocated does not grow with the length of the simulation.
+    Without @p recycle (e.g. when a tracer may still convert the cancelled
+    events of the retired jobs), they are left to the garbage collector.
+    """
+
+    def __init__(self, jobStates, recycle=True):
         self._jobs = {}
+        if recycle:
+            self._pools = {}
+        else:
+            self._pools = None
         for js in jobStates:
             job = Job(jobState=js)
             self._jobs[(job.task, job.releaseIndex)] = job
@@ -27,18 +40,58 @@ class JobManager:
             logger.exception('Job not found at deadline: %s\n'
                              'In set of jobs: %s', entry, keys)
             raise e
+        if self._pools is not None:
+            try:
+                self._pools[job.task].append(job)
+            except KeyError:
+                self._pools[job.task] = [job]
+
+    def findJob(self, task, releaseIndex):
+        """
+        The job of @p task with @p releaseIndex, None if it is not managed.
+        """
+        return self._jobs.get((task, releaseIndex))
 
     def getJob(self, task, releaseIndex):
         entry = (task, releaseIndex)
-        if entry in self._jobs:
-            job = self._jobs[entry]
+        try:
+            return self._jobs[entry]
+        except KeyError:
+            pass
+        pool = None
+        if self._pools is not None:
+            pool = self._pools.get(task)
+        if pool:
+            job = pool.pop()
+            job.reuse(releaseIndex)
         else:
             job = Job(task, releaseIndex)
-            self._jobs[entry] = job
+        self._jobs[entry] = job
         return job
 
 
 class Job:
+    """
+    A job of a task during a simulation.
+
+    Its release time and absolute deadline are computed once, when it is
+    released.
+    The job owns its Arrival and Deadline events and keeps its last executed
+    Completion, which are reused along with the job (see JobManager).
+    """
+
+    __slots__ = ('_task',
+                 '_releaseIndex',
+                 '_releaseTime',
+                 '_deadline',
+                 '_progress',
+                 '_preemptionDebt',
+                 '_lastStart',
+                 '_liveCompletion',
+                 '_livePromotion',
+                 '_arrivalEvent',
+                 '_deadlineEvent',
+                 '_spareCompletion')
 
     def __init__(self, task=None, releaseIndex=0, jobState=None):
         if jobState is not None:
@@ -54,6 +107,37 @@ class Job:
             self._progress = 0
             self._preemptionDebt = 0
             self._lastStart = None
+        self._releaseTime = self._task.arrivalTime(self._releaseIndex)
+        self._deadline = self._task.deadline + self._releaseTime
+        self._liveCompletion = None
+        self._livePromotion = None
+        self._arrivalEvent = None
+        self._deadlineEvent = None
+        self._spareCompletion = None
+
+    def reuse(self, releaseIndex):
+        """
+        Make this retired job the job of its task with @p releaseIndex.
+
+        The job must be completed and its events out of the event queue: its
+        last live completion, if any, was executed and becomes the spare
+        completion.
+        """
+        task = self._task
+        self._releaseIndex = releaseIndex
+        self._releaseTime = task.arrivalTime(releaseIndex)
+        self._deadline = task.deadline + self._releaseTime
+        self._progress = 0
+        self._preemptionDebt = 0
+        self._lastStart = None
+        if self._liveCompletion is not None:
+            self._spareCompletion = self._liveCompletion
+        self._liveCompletion = None
+        self._livePromotion = None
+        if self._arrivalEvent is not None:
+            self._arrivalEvent.reuse(self._releaseTime)
+        if self._deadlineEvent is not None:
+            self._deadlineEvent.reuse(self._deadline)
 
     def jobState(self):
         return JobState(self._task,
@@ -68,7 +152,7 @@ class Job:
 
     @property
     def releaseTime(self):
-        return self._task.arrivalTime(self._releaseIndex)
+        return self._releaseTime
 
     @property
     def releaseIndex(self):
@@ -76,7 +160,7 @@ class Job:
 
     @property
     def deadline(self):
-        return self._task.deadline + self.releaseTime
+        return self._deadline
 
     @property
     def wcet(self):
@@ -87,10 +171,33 @@ class Job:
         return self._task.uniqueId
 
     def arrivalEvent(self):
-        return Arrival(self.releaseTime, self)
+        if self._arrivalEvent is None:
+            self._arrivalEvent = Arrival(self._releaseTime, self)
+        return self._arrivalEvent
 
     def deadlineEvent(self):
-        return Deadline(self.deadline, self)
+        if self._deadlineEvent is None:
+            self._deadlineEvent = Deadline(self._deadline, self)
+        return self._deadlineEvent
+
+    def completionEvent(self, time):
+        """
+        A Completion of this job at @p time, the spare one if any.
+        """
+        completion = self._spareCompletion
+        if completion is None:
+            return Completion(time, self)
+        self._spareCompletion = None
+        completion.reuse(time)
+        return completion
+
+    def setSpareCompletion(self, completion):
+        """
+        Keep @p completion, which is out of the event queue, for the next
+        completionEvent() call.
+        """
+        if self._spareCompletion is None:
+            self._spareCompletion = completion
 
     def hasBeenStarted(self):
         return self._lastStart is not None
@@ -137,11 +244,30 @@ class Job:
                                 preemptingJob.releaseIndex,
                                 cost,
                                 previousDebt)
-        logger.debug('Preemption of %s, set debt to %s', self, cost)
         return preemption
 
+    def liveCompletion(self):
+        """
+        The Completion event that matches the current execution of the job,
+        None if the job is not running.
+        """
+        return self._liveCompletion
+
+    def setLiveCompletion(self, completion):
+        self._liveCompletion = completion
+
+    def livePromotion(self):
+        """
+        The pending Promotion event of the job, None if there is none.
+        """
+        return self._livePromotion
+
+    def setLivePromotion(self, promotion):
+        self._livePromotion = promotion
+
     def stop(self):
         self._lastStart = None
+        self._liveCompletion = None
 
     def start(self, time):
         self._lastStart = time
@@ -150,7 +276,7 @@ class Job:
         return ('Job({}, I {}, R {}, P {}, D {}'
                 ', L {})').format(self._task,
                                   self._releaseIndex,
-                                  self.releaseTime,
+                                  self._releaseTime,
                                   self._progress,
                                   self._preemptionDebt,
                                   self._lastStart)
@@ -0,0 +1,192 @@
+import logging
+
+from ..hist import DeadlineMiss
+from .fastsim import FastSimulator, _DP
+
+logger = logging.getLogger(__name__)
+
+
+class LockstepSimulator:
+    """
+    Array-backed simulation of a synchronous periodic taskset under several
+    scheduling policies at once, looking for the first deadline miss of each
+    schedule.
+
+    The releases are processed once for all the schedules; each schedule only
+    keeps the state of its pending jobs (as in FastSimulator) and makes its
+    own scheduling decisions, at the release instants and at its own event
+    instants (completions and promotions).
+    A schedule is simulated until the first deadline miss of a task matched
+    by the deadline miss filter; the other deadline misses do not stop it.
+    """
+
+    def __init__(self, taskset, states, dmFilter):
+        assert LockstepSimulator.supports(taskset, states)
+        self._tasks = list(taskset)
+        self._periods = [t.minimalInterArrivalTime for t in self._tasks]
+        missMatches = [dmFilter.match(t) for t in self._tasks]
+        self._schedules = [_LockstepSchedule(taskset, state, missMatches)
+                           for state in states]
+
+    @staticmethod
+    def supports(taskset, states):
+        """
+        Whether the FastSimulator supports @p taskset from each initial state
+        of @p states.
+        """
+        return all(FastSimulator.supports(taskset, state) and
+                   state.time == 0 and
+                   not state.jobs
+                   for state in states)
+
+    def firstDeadlineMisses(self, timeLimit):
+        """
+        The first matching deadline miss of each schedule before
+        @p timeLimit, None for the schedules without any.
+        """
+        nbTasks = len(self._periods)
+        return self._run(0, [0] * nbTasks, [0] * nbTasks, timeLimit)
+
+    def _run(self, time, nextReleases, released, timeLimit):
+        """
+        Simulate from @p time, before the releases of that instant, until
+        @p timeLimit.
+        """
+        periods = self._periods
+        taskRange = range(len(periods))
+        pending = [s for s in self._schedules if s.firstMiss is None]
+
+        while True:
+            releasing = False
+            for k in taskRange:
+                if nextReleases[k] == time:
+                    released[k] += 1
+                    nextReleases[k] += periods[k]
+                    releasing = True
+            for schedule in pending:
+                if releasing or schedule.nextEvent == time:
+                    schedule.step(time, released)
+            pending = [s for s in pending if s.firstMiss is None]
+            if not pending:
+                break
+            nextTime = min(nextReleases)
+            for schedule in pending:
+                nextEvent = schedule.nextEvent
+                if nextEvent is not None and nextEvent < nextTime:
+                    nextTime = nextEvent
+            if nextTime >= timeLimit:
+                for schedule in pending:
+                    schedule.checkLastDeadlines(timeLimit, released)
+                break
+            time = nextTime
+        logger.debug('Lockstep simulation stopped at %s', time)
+        return [s.firstMiss for s in self._schedules]
+
+
+class _LockstepSchedule(FastSimulator):
+    """
+    The pending jobs and scheduling decisions of one policy, driven by a
+    LockstepSimulator.
+    """
+
+    def __init__(self, taskset, state, missMatches):
+        super().__init__(taskset, state)
+        nbTasks = len(self._tasks)
+        self._missMatches = missMatches
+        self._heads = [0] * nbTasks
+        self._progress = [0] * nbTasks
+        self._debts = [0] * nbTasks
+        self._running = -1
+        self._runStart = 0
+        self.nextEvent = None
+        self.firstMiss = None
+
+    def step(self, time, released):
+        """
+        Process the events of this schedule at @p time, after the releases
+        of that instant.
+        """
+        heads = self._heads
+        progress = self._progress
+        debts = self._debts
+        k = self._running
+        completedTask = -1
+        if k >= 0:
+            completion = (self._runStart + debts[k] + self._wcets[k] -
+                          progress[k])
+            if completion == time:
+                heads[k] += 1
+                progress[k] = 0
+                debts[k] = 0
+                self._running = -1
+                completedTask = k
+
+        self._checkDeadlines(time, released, completedTask)
+        if self.firstMiss is not None:
+            return
+
+        best = self._topTask(time, heads, released)
+        running = self._running
+        if best < 0:
+            pass
+        elif running < 0:
+            self._running = best
+            self._runStart = time
+        elif best != running:
+            executed = time - self._runStart
+            if executed >= debts[running]:
+                progress[running] += executed - debts[running]
+            debts[running] = self._costs[running]
+            self._running = best
+            self._runStart = time
+        self.nextEvent = self._nextEvent(time, released)
+
+    def checkLastDeadlines(self, timeLimit, released):
+        """
+        Look for the deadline misses before @p timeLimit of the jobs still
+        pending after the last step.
+        """
+        # The deadlines are integers.
+        self._checkDeadlines(timeLimit - 1, released, -1)
+
+    def _checkDeadlines(self, time, released, completedTask):
+        """
+        As in FastSimulator, the schedule does not stop at the deadlines: a
+        deadline miss is found when the late job completes at @p time, or
+        when it is still pending at @p time.
+        The earliest of these misses is the first deadline miss.
+        """
+        periods = self._periods
+        deadlines = self._deadlines
+        heads = self._heads
+        misses = []
+        k = completedTask
+        if k >= 0 and self._missMatches[k]:
+            index = heads[k] - 1
+            deadlineTime = index * periods[k] + deadlines[k]
+            if deadlineTime < time:
+                misses.append((deadlineTime, k, index))
+        for k in range(len(heads)):
+            if self._missMatches[k] and heads[k] < released[k]:
+                deadlineTime = heads[k] * periods[k] + deadlines[k]
+                if deadlineTime <= time:
+                    misses.append((deadlineTime, k, heads[k]))
+        if misses:
+            _, k, index = min(misses)
+            self.firstMiss = DeadlineMiss(self._tasks[k], index)
+
+    def _nextEvent(self, time, released):
+        result = None
+        k = self._running
+        if k >= 0:
+            result = (self._runStart + self._debts[k] + self._wcets[k] -
+                      self._progress[k])
+        if self._kind == _DP:
+            promotion = self._nextPromotion(time,
+                                            self._heads,
+                                            released,
+                                            self._running)
+            if promotion is not None and (result is None or
+                                          promotion < result):
+                result = promotion
+        return result
@@ -2,9 +2,11 @@ import logging
 from collections import namedtuple
 from abc import ABC, abstractmethod
 from heapq import heappush, heapreplace, heappop, heapify
+from itertools import count
 
 from ..hist import (EDFSchedulerState,
                     RMSchedulerState,
+                    FixedPrioritySchedulerState,
                     DualPrioritySchedulerState)
 
 logger = logging.getLogger(__name__)
@@ -40,16 +42,27 @@ class SchedulerFactory:
     def _convertRM(jobManager, rmState):
         return RMScheduler(jobManager, rmState)
 
+    @staticmethod
+    def _convertFP(jobManager, fpState):
+        return FixedPriorityScheduler(jobManager=jobManager,
+                                      schedulerState=fpState)
+
     @staticmethod
     def _convertDP(jobManager, dpState):
-        return DualPriorityScheduler(jobManager=jobManager,
-                                     schedulerState=dpState)
+        if dpState.policy().promotedTasks():
+            return DualPriorityScheduler(jobManager=jobManager,
+                                         schedulerState=dpState)
+        else:
+            return StaticDualPriorityScheduler(jobManager=jobManager,
+                                               schedulerState=dpState)
 
     _conversionFunctions = {
         EDFSchedulerState: (
             lambda *x: SchedulerFactory._convertEDF(*x)),
         RMSchedulerState: (
             lambda *x: SchedulerFactory._convertRM(*x)),
+        FixedPrioritySchedulerState: (
+            lambda *x: SchedulerFactory._convertFP(*x)),
         DualPrioritySchedulerState: (
             lambda *x: SchedulerFactory._convertDP(*x))
     }
@@ -79,6 +92,18 @@ class AbstractScheduler(ABC):
         """
         return []
 
+    def promotionTime(self, job):
+        """
+        Returns the time at which the priority of @p job is raised, or None if
+        it never is.
+
+        The simulator reschedules at that time if @p job is still waiting.
+
+        :param job:
+        :return:
+        """
+        return None
+
     @abstractmethod
     def schedulerState(self):
         """
@@ -155,6 +180,14 @@ class AbstractScheduler(ABC):
         """
         pass
 
+    def nbReadyJobs(self):
+        """
+        The number of jobs waiting for the processor.
+
+        Subclasses should redefine this function with a cheaper count.
+        """
+        return len(self.schedulerState().readyEntries)
+
     def runningJob(self):
         if self._runningEntry is not None:
             _, job = self._runningEntry
@@ -197,11 +230,19 @@ class QueueBasedScheduler(AbstractScheduler):
         def genEntries():
             for (prio, task, index) in schedulerState.basicReadyEntries():
                 readyJob = jobManager.getJob(task, index)
-                yield prio, readyJob
+                yield self._restoredPriority(prio, readyJob), readyJob
 
         self._readyQueue = list(genEntries())
         heapify(self._readyQueue)
 
+    def _restoredPriority(self, basicPriority, job):
+        """
+        The priority of @p job in the ready queue built from a scheduler
+        state, whose basic entry has @p basicPriority.
+        """
+        del job
+        return basicPriority
+
     @abstractmethod
     def _computePriority(self, job):
         """
@@ -212,8 +253,10 @@ class QueueBasedScheduler(AbstractScheduler):
         """
         raise NotImplementedError
 
+    def nbReadyJobs(self):
+        return len(self._readyQueue)
+
     def addReadyJob(self, job):
-        logger.debug('Adding ready %s', job)
         priority = self._computePriority(job)
         entry = (priority, job)
         assert entry not in self._readyQueue
@@ -227,52 +270,46 @@ class QueueBasedScheduler(AbstractScheduler):
             if self._runningEntry is None:
                 self._runningEntry = priority, readyJob
                 heappop(self._readyQueue)
-                logger.debug(
-                    'Scheduling from idle at priority %s : %s',
-                    priority,
-                    readyJob)
                 result = ScheduleTransition(None, readyJob)
             else:
                 runningPriority, runningJob = self._runningEntry
                 if priority < runningPriority:
-                    logger.debug(
-                        'Preempting %s priority %s with %s priority %s',
-                        runningJob, runningPriority, readyJob, priority)
                     heapreplace(self._readyQueue, self._runningEntry)
                     _, runningJob = self._runningEntry
                     self._runningEntry = priority, readyJob
                     result = ScheduleTransition(runningJob, readyJob)
                 else:
-                    logger.debug('No schedule change: %s', runningJob)
-
                     result = ScheduleTransition(runningJob, runningJob)
         elif self._runningEntry is not None:
             runningPriority, runningJob = self._runningEntry
-            logger.debug('No schedule change: %s', runningJob)
             result = ScheduleTransition(runningJob, runningJob)
-        else:
-            logger.debug('Nothing to schedule')
-        logger.debug('Schedule done')
-        logger.debug('Ready queue: %s', self._readyQueue)
         return result
 
 
 class EDFScheduler(QueueBasedScheduler):
+    """
+    The priority of a job is its deadline and a tie-break, packed in a single
+    integer (see EDFSchedulerState.packPriority()).
+    The jobs with the same deadline are numbered in the order in which they
+    are added, the numbering restarts when no job has that deadline anymore.
+    """
 
     def __init__(self, jobManager=None, schedulerState=None):
         super().__init__()
-        self._collisionDicts = {}
+        # For each deadline of the ready and running jobs: the next tie-break
+        # and the number of jobs.
+        self._deadlineGroups = {}
 
         if schedulerState is not None:
             self._initFromState(schedulerState, jobManager)
 
     def _initFromState(self, schedulerState, jobManager):
         super()._initFromState(schedulerState, jobManager)
-        for priority, job in self._readyQueue:
-            self._addToCollisions(job, priority)
+        for priority, _ in self._readyQueue:
+            self._addToGroup(priority)
         if self._runningEntry is not None:
-            topPrio, runningJob = self._runningEntry
-            self._addToCollisions(runningJob, topPrio)
+            topPrio, _ = self._runningEntry
+            self._addToGroup(topPrio)
 
     def schedulerState(self):
         entries = [self._stateEntry(prio, j)
@@ -286,41 +323,36 @@ class EDFScheduler(QueueBasedScheduler):
 
     @staticmethod
     def _stateEntry(priority, job):
-        deadline, collision = priority
-        task = job.task
-        releaseIndex = job.releaseIndex
-        return deadline, collision, task, releaseIndex
+        deadline, collision = EDFSchedulerState.unpackPriority(priority)
+        return deadline, collision, job.task, job.releaseIndex
 
     def _onExecutionCompleted(self, priority, job):
-        deadline, _ = priority
-        collisionDict = self._collisionDicts[deadline]
-        del collisionDict[job]
-        if not collisionDict:
-            del self._collisionDicts[deadline]
+        deadline = priority // EDFSchedulerState.TIE_BREAKS
+        group = self._deadlineGroups[deadline]
+        group[1] -= 1
+        if group[1] == 0:
+            del self._deadlineGroups[deadline]
 
     def _computePriority(self, job):
         deadline = job.deadline
-        try:
-            collisionDict = self._collisionDicts[deadline]
-        except KeyError:
-            self._collisionDicts[deadline] = {job: 0}
-            index = 0
+        group = self._deadlineGroups.get(deadline)
+        if group is None:
+            self._deadlineGroups[deadline] = [1, 1]
+            collision = 0
+        else:
+            collision = group[0]
+            group[0] += 1
+            group[1] += 1
+        return deadline * EDFSchedulerState.TIE_BREAKS + collision
+
+    def _addToGroup(self, priority):
+        deadline, collision = EDFSchedulerState.unpackPriority(priority)
+        group = self._deadlineGroups.get(deadline)
+        if group is None:
+            self._deadlineGroups[deadline] = [collision + 1, 1]
         else:
-            try:
-                index = collisionDict[job]
-            except KeyError:
-                index = max(collisionDict.values()) + 1
-                collisionDict[job] = index
-        return deadline, index
-
-    def _addToCollisions(self, job, priority):
-        deadline, index = priority
-        try:
-            collisionDict = self._collisionDicts[deadline]
-        except KeyError:
-            collisionDict = {}
-            self._collisionDicts[deadline] = collisionDict
-        collisionDict[job] = index
+            group[0] = max(group[0], collision + 1)
+            group[1] += 1
 
     def __repr__(self):
         readyStr = ', '.join([str(e) for e in self._readyQueue])
@@ -358,65 +390,136 @@ class RMScheduler(QueueBasedScheduler):
                                                    readyStr)
 
 
-class DualPriorityScheduler(AbstractScheduler):
+class FixedPriorityScheduler(QueueBasedScheduler):
+    """
+    The scheduler of FixedPrioritySchedulingPolicy: the priority of a job is
+    the priority of its task, then its release index.
+    """
+
+    _STATE_CLASS = FixedPrioritySchedulerState
 
     def __init__(self, policy=None, jobManager=None, schedulerState=None):
         super().__init__()
 
-        self._promotedTasks = None
-        self._promotionsHeap = None
-
-        self._readyJobs = set()
         if schedulerState is not None:
             self._initFromState(schedulerState, jobManager)
         else:
             assert policy is not None
-            self._policy = policy
+            self._setPolicy(policy)
+
+    def _setPolicy(self, policy):
+        self._policy = policy
+        self._priorities = policy.index()
 
     def initializeSchedulerData(self, taskset):
-        def promoTasks():
-            priorityValues = []
-            for task in taskset:
-                priorityValues.append(self._policy.lowPriority(task))
-                if self._policy.hasPromotion(task):
-                    priorityValues.append(self._policy.highPriority(task))
-                    yield task
-            # Assert that there are no duplicate priority values
-            assert len(priorityValues) == len(set(priorityValues))
-
-        self._promotedTasks = list(promoTasks())
-        self._promotionsHeap = [(self._policy.promotion(t), 0, i, t)
-                                for i, t in enumerate(self._promotedTasks)]
-        heapify(self._promotionsHeap)
-
-    def _topPromo(self):
-        promo, _, _, _ = self._promotionsHeap[0]
-        return promo
-
-    def _nextPromo(self):
-        promo, release, index, task = self._promotionsHeap[0]
-        heappop(self._promotionsHeap)
-        newPromo = self._policy.promotion(task) + task.arrivalTime(release)
-        entry = newPromo, release + 1, index, task
-        heappush(self._promotionsHeap, entry)
-        return self._topPromo()
-
-    def _nextGlobalPromo(self):
-        promo = self._topPromo()
-        nextPromo = self._nextPromo()
-        while nextPromo == promo:
-            nextPromo = self._nextPromo()
-        return promo
+        priorityValues = [self._priorities.get(id(task)) for task in taskset]
+        assert None not in priorityValues
+        # Assert that there are no duplicate priority values
+        assert len(priorityValues) == len(set(priorityValues))
 
-    def nextScheduleTicks(self, time):
-        if self._promotionsHeap:
-            promo = self._nextGlobalPromo()
-            while promo <= time:
-                promo = self._nextGlobalPromo()
-            result = [promo]
+    def schedulerState(self):
+        entries = [(j.task, j.releaseIndex) for _, j in self._readyQueue]
+        if self._runningEntry is None:
+            runningEntry = None
         else:
-            result = []
-        return result
+            _, job = self._runningEntry
+            runningEntry = (job.task, job.releaseIndex)
+        return self._STATE_CLASS(self._policy, runningEntry, *entries)
+
+    def _initFromState(self, schedulerState, jobManager):
+        self._setPolicy(schedulerState.policy())
+        super()._initFromState(schedulerState, jobManager)
+        if self._runningEntry is not None:
+            _, job = self._runningEntry
+            self._runningEntry = self._computePriority(job), job
+
+    def _restoredPriority(self, basicPriority, job):
+        # The basic entries of a DualPrioritySchedulerState have no release
+        # index (see StaticDualPriorityScheduler), so the priorities are
+        # recomputed before the queue is heapified.
+        del basicPriority
+        return self._computePriority(job)
+
+    def _computePriority(self, job):
+        return self._priorities[id(job.task)], job.releaseIndex
+
+    def __repr__(self):
+        readyStr = ', '.join([str(e) for e in self._readyQueue])
+        return '{}({}, ready[{}])'.format(type(self).__name__,
+                                          self._runningEntry,
+                                          readyStr)
+
+
+class StaticDualPriorityScheduler(FixedPriorityScheduler):
+    """
+    The scheduler of a DualPrioritySchedulingPolicy without promotions, whose
+    jobs keep their low priority: it schedules like DualPriorityScheduler and
+    has the same states.
+    """
+
+    _STATE_CLASS = DualPrioritySchedulerState
+
+    def _setPolicy(self, policy):
+        self._policy = policy
+        index = policy.index()
+        self._priorities = {taskId: index.lowPriorities[taskIndex]
+                            for taskId, taskIndex
+                            in index.taskIndices.items()}
+
+
+class DualPriorityScheduler(AbstractScheduler):
+    """
+    The ready jobs are kept in two heaps: the low band holds the jobs that are
+    not promoted yet, by low priority, and the high band the promoted ones, by
+    high priority.
+    The ready jobs of the low band that have a promotion are also kept in a
+    heap by promotion time, and they migrate to the high band when the
+    schedule is computed at or after their promotion time.
+
+    The entry of a job that migrated stays in the low band until it reaches
+    the top: the entries that are not the current entry of their job are
+    dropped from there.
+
+    The priorities are read from the DualPriorityIndex of the policy.
+    """
+
+    def __init__(self, policy=None, jobManager=None, schedulerState=None):
+        super().__init__()
+
+        self._readyJobs = {}
+        self._lowBand = []
+        self._highBand = []
+        self._pendingPromotions = []
+        self._promotionCounter = count()
+        if schedulerState is not None:
+            self._initFromState(schedulerState, jobManager)
+        else:
+            assert policy is not None
+            self._setPolicy(policy)
+
+    def _setPolicy(self, policy):
+        self._policy = policy
+        index = policy.index()
+        self._taskIndices = index.taskIndices
+        self._lowPriorities = index.lowPriorities
+        self._highPriorities = index.highPriorities
+        self._taskPromotions = index.promotions
+
+    def initializeSchedulerData(self, taskset):
+        priorityValues = []
+        for task in taskset:
+            priorityValues.append(self._policy.lowPriority(task))
+            if self._policy.hasPromotion(task):
+                priorityValues.append(self._policy.highPriority(task))
+        # Assert that there are no duplicate priority values
+        assert len(priorityValues) == len(set(priorityValues))
+
+    def promotionTime(self, job):
+        promotion = self._taskPromotions[self._taskIndices[id(job.task)]]
+        if promotion is not None:
+            return job.releaseTime + promotion
+        else:
+            return None
 
     def schedulerState(self):
         entries = [(j.task, j.releaseIndex) for j in self._readyJobs]
@@ -431,23 +534,88 @@ class DualPriorityScheduler(AbstractScheduler):
 
     def _initFromState(self, schedulerState, jobManager):
         super()._initFromState(schedulerState, jobManager)
-        self._policy = schedulerState.policy()
+        self._setPolicy(schedulerState.policy())
+        # The jobs are put in the low band, the first schedule migrates the
+        # promoted ones.
+        for _, task, index in schedulerState.basicReadyEntries():
+            self.addReadyJob(jobManager.getJob(task, index))
+
+    def nbReadyJobs(self):
+        return len(self._readyJobs)
 
     def addReadyJob(self, job):
         assert job not in self._readyJobs
-        self._readyJobs.add(job)
+        taskIndex = self._taskIndices[id(job.task)]
+        entry = self._lowPriorities[taskIndex], job.releaseIndex, job
+        self._readyJobs[job] = entry
+        heappush(self._lowBand, entry)
+        promotion = self._taskPromotions[taskIndex]
+        if promotion is not None:
+            promotionTime = job.releaseTime + promotion
+            heappush(self._pendingPromotions,
+                     (promotionTime, next(self._promotionCounter), entry))
+
+    def _addPromotedJob(self, job):
+        taskIndex = self._taskIndices[id(job.task)]
+        entry = self._highPriorities[taskIndex], job.releaseIndex, job
+        self._readyJobs[job] = entry
+        heappush(self._highBand, entry)
+
+    def _readdJob(self, job, time):
+        """
+        Put the preempted @p job back in the band of its priority at @p time.
+        """
+        promotion = self._taskPromotions[self._taskIndices[id(job.task)]]
+        if promotion is not None and time - job.releaseTime >= promotion:
+            self._addPromotedJob(job)
+        else:
+            self.addReadyJob(job)
+
+    def _migratePromotedJobs(self, time):
+        promotions = self._pendingPromotions
+        readyJobs = self._readyJobs
+        while promotions and promotions[0][0] <= time:
+            _, _, entry = heappop(promotions)
+            job = entry[2]
+            if readyJobs.get(job) is entry:
+                self._addPromotedJob(job)
 
     def _jobPriority(self, job, time):
         relativeTime = time - job.releaseTime
         assert relativeTime >= 0
-        priority = self._policy.priorityAt(job.task, relativeTime)
-        return priority, job.releaseIndex
+        taskIndex = self._taskIndices[id(job.task)]
+        promotion = self._taskPromotions[taskIndex]
+        if promotion is None or relativeTime < promotion:
+            return self._lowPriorities[taskIndex], job.releaseIndex
+        else:
+            return self._highPriorities[taskIndex], job.releaseIndex
 
     def _topReadyJob(self, time):
-        prioritizedJobs = [(self._jobPriority(job, time), job)
-                           for job in self._readyJobs]
-        priority, topJob = min(prioritizedJobs)
-        return priority, topJob
+        """
+        Remove the ready job of highest priority at @p time from the ready
+        jobs.
+
+        :return:    Its priority and the job.
+        """
+        self._migratePromotedJobs(time)
+        readyJobs = self._readyJobs
+        lowBand = self._lowBand
+        while lowBand and readyJobs.get(lowBand[0][2]) is not lowBand[0]:
+            heappop(lowBand)
+        highBand = self._highBand
+        if not highBand or (lowBand and lowBand[0][:2] < highBand[0][:2]):
+            band = lowBand
+        else:
+            band = highBand
+        priority, releaseIndex, topJob = band[0]
+        return (priority, releaseIndex), topJob
+
+    def _removeTopReadyJob(self, job):
+        entry = self._readyJobs.pop(job)
+        if self._lowBand and self._lowBand[0] is entry:
+            heappop(self._lowBand)
+        else:
+            heappop(self._highBand)
 
     def schedule(self, time):
         result = ScheduleTransition(None, None)
@@ -455,28 +623,22 @@ class DualPriorityScheduler(AbstractScheduler):
             readyPriority, readyJob = self._topReadyJob(time)
             if self._runningEntry is None:
                 self._runningEntry = readyPriority, readyJob
-                self._readyJobs.remove(readyJob)
-                logger.debug('Scheduling %s from idle', readyJob)
+                self._removeTopReadyJob(readyJob)
                 result = ScheduleTransition(None, readyJob)
             else:
                 _, runningJob = self._runningEntry
                 runningPriority = self._jobPriority(runningJob, time)
                 if readyPriority < runningPriority:
                     self._runningEntry = readyPriority, readyJob
-                    self._readyJobs.remove(readyJob)
-                    self._readyJobs.add(runningJob)
-                    logger.debug('Preemption of %s by %s', runningJob, readyJob)
+                    self._removeTopReadyJob(readyJob)
+                    self._readdJob(runningJob, time)
                     result = ScheduleTransition(runningJob, readyJob)
                 else:
-                    logger.debug('No schedule change')
                     result = ScheduleTransition(runningJob, runningJob)
 
         elif self._runningEntry is not None:
             runningPriority, runningJob = self._runningEntry
-            logger.debug('No schedule change (no ready job)')
             result = ScheduleTransition(runningJob, runningJob)
-        else:
-            logger.debug('Nothing to schedule')
 
         return result
 
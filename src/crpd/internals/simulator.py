@@ -1,10 +1,20 @@
 import logging
+from abc import ABC, abstractmethod
 from heapq import heapify, heappop, heappush
-
-from .events import Completion, ScheduleTick, convertStateEvent
+from itertools import count
+
+from .cycles import RepetitionFinder
+from .events import (Completion,
+                     Deadline,
+                     Promotion,
+                     ScheduleTick,
+                     convertStateEvent)
 from .jobs import JobManager
-from .sched import SchedulerFactory
+from .sched import SchedulerFactory, ScheduleTransition
 from ..hist import SimulatorState, DeadlineMiss
+from ..model import FixedArrivalDistribution, OffsetArrivalDistribution
+from ..stats import SimulationPhase
+from ..trace import TraceKind
 
 
 logger = logging.getLogger(__name__)
@@ -18,51 +28,231 @@ class Simulator:
                  state,
                  trackHistory=True,
                  trackPreemptions=True,
-                 statAggregators=None):
+                 statAggregators=None,
+                 detectCycles=False,
+                 eventQueueClass=None,
+                 lazyDeadlines=False,
+                 checkpointInterval=None,
+                 snapshotInterval=None,
+                 snapshotHandler=None,
+                 counters=None,
+                 tracer=None,
+                 budget=None):
         self._taskset = taskset
         self._time = state.time
+        self._counters = counters
+        self._tracer = tracer
+        self._budget = budget
         self._historyManager = _HistoryManager(history,
                                                state,
                                                trackHistory,
                                                trackPreemptions,
-                                               statAggregators)
+                                               statAggregators,
+                                               checkpointInterval,
+                                               counters)
+        if eventQueueClass is None:
+            self._eventQueueClass = HeapEventQueue
+        else:
+            self._eventQueueClass = eventQueueClass
         self._eventQueue = None
         self._scheduler = None
         self._jobManager = None
         self._stopOnMiss = False
+        if detectCycles and _CycleDetector.supports(taskset):
+            self._cycleDetector = _CycleDetector(taskset)
+        else:
+            self._cycleDetector = None
+        self._cycle = None
+        self._lazyDeadlines = lazyDeadlines
+        self._snapshotInterval = snapshotInterval
+        self._snapshotHandler = snapshotHandler
+        if snapshotHandler is not None:
+            self._nextSnapshot = nextSnapshotTime(state.time, snapshotInterval)
+        if counters is not None and counters.timesPhases:
+            self._timePhases(counters)
+        if tracer is not None:
+            self._traceHistory(tracer)
+
+    def _timePhases(self, counters):
+        """
+        Replace the methods of the main phases of the simulation by timed
+        versions, so that the simulation is not slowed down when the phases
+        are not timed.
+        """
+        self._executeEvents = counters.timed(SimulationPhase.Events,
+                                             self._executeEvents)
+        self._doSchedule = counters.timed(SimulationPhase.Schedule,
+                                          self._doSchedule)
+        self._fastForward = counters.timed(SimulationPhase.FastForward,
+                                           self._fastForward)
+        self._nextState = counters.timed(SimulationPhase.History,
+                                         self._nextState)
+
+    def _traceHistory(self, tracer):
+        """
+        Replace the methods of the history manager that record the deadline
+        misses and preemptions by versions that also trace them.
+        The event queue and the scheduler are traced when they are created
+        (see _traceComponents()).
+        """
+        historyManager = self._historyManager
+        addDeadlineMiss = historyManager.addDeadlineMiss
+        addPreemption = historyManager.addPreemption
+
+        def tracedAddDeadlineMiss(job):
+            addDeadlineMiss(job)
+            tracer.record(TraceKind.DeadlineMiss,
+                          job.deadline,
+                          DeadlineMiss(job.task, job.releaseIndex))
+
+        def tracedAddPreemption(preemption):
+            addPreemption(preemption)
+            tracer.record(TraceKind.Preemption, preemption.time, preemption)
+
+        if tracer.traces(TraceKind.DeadlineMiss):
+            historyManager.addDeadlineMiss = tracedAddDeadlineMiss
+        if tracer.traces(TraceKind.Preemption):
+            historyManager.addPreemption = tracedAddPreemption
+
+    def _traceComponents(self, tracer):
+        """
+        Replace the methods of the event queue and of the scheduler by
+        versions that also trace the events and the scheduling decisions.
+        """
+        eventQueue = self._eventQueue
+        scheduler = self._scheduler
+        pop = eventQueue.pop
+        addEvent = eventQueue.addEvent
+        schedule = scheduler.schedule
+
+        def tracedPop():
+            event = eventQueue.top()
+            pop()
+            if event.ignore():
+                kind = TraceKind.IgnoredEvent
+            else:
+                kind = TraceKind.Event
+            if tracer.traces(kind):
+                tracer.record(kind, event.time, event.stateConverted())
+
+        def tracedAddEvent(event):
+            addEvent(event)
+            tracer.record(TraceKind.AddedEvent,
+                          self._time,
+                          event.stateConverted())
+
+        def tracedSchedule(time):
+            transition = schedule(time)
+            old, new = transition
+            if new is not None and new is not old:
+                if old is not None:
+                    old = old.jobState()
+                tracer.record(TraceKind.Schedule,
+                              time,
+                              ScheduleTransition(old, new.jobState()))
+            return transition
+
+        if (tracer.traces(TraceKind.Event) or
+                tracer.traces(TraceKind.IgnoredEvent)):
+            eventQueue.pop = tracedPop
+        if tracer.traces(TraceKind.AddedEvent):
+            eventQueue.addEvent = tracedAddEvent
+        if tracer.traces(TraceKind.Schedule):
+            scheduler.schedule = tracedSchedule
+
+    @property
+    def time(self):
+        return self._time
 
     def simulateTo(self, timeLimit, stopOnMiss=False):
+        """
+        Simulate until @p timeLimit (or until a deadline miss with
+        @p stopOnMiss).
+
+        Successive calls continue the simulation from the time reached by the
+        previous one.
+        """
+        for _ in self.steps(timeLimit, stopOnMiss):
+            pass
+
+    def steps(self, timeLimit, stopOnMiss=False):
+        """
+        Simulate as simulateTo(), yielding the time of each simulated instant
+        once it is simulated.
+
+        When the iteration is stopped early, the simulation stops at the last
+        yielded instant and its state is not added to the history.
+        When the budget of the simulator is exhausted, the simulation stops
+        at the last simulated instant.
+        """
         logger.debug('Simulating to %s', timeLimit)
         self._stopOnMiss = stopOnMiss
         if stopOnMiss:
             logger.debug('Stopping on deadline miss')
         continueSimu = False
+        outOfBudget = False
         if self._time < timeLimit:
-            self._initFromState()
+            if self._eventQueue is None:
+                self._initFromState()
             continueSimu = self._executeEvents(timeLimit)
         while continueSimu:
-            self._doSchedule()
-            self._nextState(force=False)
-            continueSimu = self._executeEvents(timeLimit)
-        self._simulationEpilogue(timeLimit)
+            if self._canFastForward():
+                self._fastForward(timeLimit)
+            else:
+                self._doSchedule()
+            cycleFound = self._cycleCheck()
+            self._nextState(force=cycleFound)
+            yield self._time
+            if cycleFound:
+                continueSimu = False
+            elif self._budget is not None and not self._budget.spend():
+                continueSimu = False
+                outOfBudget = True
+            else:
+                self._snapshotCheck()
+                continueSimu = self._executeEvents(timeLimit)
+        self._simulationEpilogue(timeLimit, outOfBudget)
 
     def arrival(self, job):
         self._scheduler.addReadyJob(job)
-        self._eventQueue.addDeadline(job)
+        self._addPromotionEvent(job)
+        if self._lazyDeadlines:
+            self._checkDeferredDeadline(job)
+        if not self._defersDeadline(job):
+            self._eventQueue.addDeadline(job)
         nextRelease = self._jobManager.getJob(job.task, job.releaseIndex + 1)
         self._eventQueue.addArrival(nextRelease)
 
+    def _defersDeadline(self, job):
+        """
+        With lazy deadlines, the deadline of a job that coincides with the
+        next release of its task is checked by the arrival of the next job
+        instead of a Deadline event.
+
+        Constrained deadlines (before the next release) keep their Deadline
+        event even when the job completes in time: the event also removes the
+        completed job from the states at its deadline, and a cancelled event
+        would stay in the queue until it is popped anyway.
+        """
+        return (self._lazyDeadlines and
+                job.task.arrivalTime(job.releaseIndex + 1) == job.deadline)
+
+    def _checkDeferredDeadline(self, job):
+        previousJob = self._jobManager.findJob(job.task, job.releaseIndex - 1)
+        if previousJob is not None and self._defersDeadline(previousJob):
+            self.deadline(previousJob)
+
     def deadline(self, job):
         if not job.isCompleted():
-            logger.debug('Deadline miss at time %s for job %s',
-                         job.deadline, job)
             self._historyManager.addDeadlineMiss(job)
         else:
-            self._jobManager.removeJob(job)
+            self._retireJob(job)
+
+    def promotion(self, job):
+        job.setLivePromotion(None)
 
     def completion(self, job):
         job.progressTo(self._time)
-        logger.debug('Job complete: %s', job)
         try:
             assert(job == self._scheduler.runningJob())
         except AssertionError as e:
@@ -71,41 +261,88 @@ class Simulator:
             raise e
         self._scheduler.executionCompleted()
         if job.deadline < self._time:
-            self._jobManager.removeJob(job)
+            self._retireJob(job)
+
+    def _retireJob(self, job):
+        self._historyManager.jobRetired(job)
+        self._jobManager.removeJob(job)
 
     def _preempt(self, preemptedJob, preemptingJob):
         preemptedJob.progressTo(self._time)
+        self._eventQueue.cancel(preemptedJob.liveCompletion())
         preemptedJob.stop()
+        self._addPromotionEvent(preemptedJob)
         preemption = preemptedJob.preemption(self._time, preemptingJob)
         self._execute(preemptingJob)
         self._historyManager.addPreemption(preemption)
+        if self._counters is not None:
+            self._counters.countPreemption()
 
     def _execute(self, job):
+        self._cancelPromotion(job)
         job.start(self._time)
         self._addCompletionEvent(job)
 
+    def _cancelPromotion(self, job):
+        promotion = job.livePromotion()
+        if promotion is not None:
+            self._eventQueue.cancel(promotion)
+            job.setLivePromotion(None)
+
+    def _addPromotionEvent(self, job):
+        """
+        Make sure that the schedule is recomputed when the priority of the
+        waiting @p job is raised.
+        """
+        promotionTime = self._scheduler.promotionTime(job)
+        if promotionTime is not None and promotionTime > self._time:
+            promotion = Promotion(promotionTime, job)
+            job.setLivePromotion(promotion)
+            self._eventQueue.addEvent(promotion)
+
     def _addCompletionEvent(self, job):
         completionTime = self._time + job.remainingExecWithDebt()
-        completion = Completion(completionTime, job)
+        completion = job.completionEvent(completionTime)
+        job.setLiveCompletion(completion)
         self._eventQueue.addEvent(completion)
 
     def _initFromState(self):
         jobStates = self._historyManager.currentJobStates()
-        self._jobManager = JobManager(jobStates)
+        self._jobManager = JobManager(jobStates,
+                                      recycle=self._tracer is None)
         eventStates = self._historyManager.currentEventStates()
         events = [convertStateEvent(self._jobManager, e) for e in eventStates]
-        self._eventQueue = _EventQueue(events)
+        events = [e for e in events
+                  if not (isinstance(e, Deadline) and
+                          self._defersDeadline(e.job))]
+        self._eventQueue = self._eventQueueClass(events)
+        self._eventQueue.counters = self._counters
+        for event in events:
+            if isinstance(event, Completion):
+                if event.isOutdated():
+                    self._eventQueue.cancel(event)
+                else:
+                    event.job.setLiveCompletion(event)
+            elif isinstance(event, Promotion):
+                event.job.setLivePromotion(event)
         schedulerState = self._historyManager.currentSchedulerState()
         self._scheduler = SchedulerFactory.fromState(schedulerState,
                                                      self._jobManager)
         self._scheduler.initializeSchedulerData(self._taskset)
+        if self._tracer is not None:
+            self._traceComponents(self._tracer)
         self.addNextScheduleTicks()
 
-    def _simulationEpilogue(self, timeLimit):
-        if not self._deadlineMissCheck():
+    def _simulationEpilogue(self, timeLimit, outOfBudget):
+        if self._cycle is not None:
+            logger.debug('Stopping due to %s', self._cycle)
+        elif not self._deadlineMissCheck():
             logger.debug('Stopping due to deadline miss(es) %s',
                          self._historyManager.currentDeadlineMisses())
             self._nextState(force=True)
+        elif outOfBudget:
+            logger.debug('Stopping at %s, budget exhausted', self._time)
+            self._nextState(force=True)
         elif self._time < timeLimit:
             self._refreshSimu(timeLimit)
         else:
@@ -119,7 +356,23 @@ class Simulator:
         self._time = time
         self._nextState(force=True)
 
+    def _cycleCheck(self):
+        if self._cycleDetector is not None:
+            self._cycle = self._cycleDetector.check(
+                self._time,
+                self._jobManager.jobs(),
+                self._scheduler.runningJob())
+            if self._cycle is not None:
+                self._historyManager.setCycle(self._cycle)
+                return True
+        return False
+
     def _nextState(self, force=False):
+        # The running job is not always rescheduled before a state is
+        # recorded (e.g. when stopping at a deadline miss).
+        runningJob = self._scheduler.runningJob()
+        if runningJob is not None:
+            runningJob.progressTo(self._time)
         jobs = self._jobManager.jobs()
         events = self._eventQueue.events()
         self._historyManager.nextState(self._time,
@@ -128,6 +381,21 @@ class Simulator:
                                        self._scheduler,
                                        forceAdd=force)
 
+    def _snapshotCheck(self):
+        """
+        Hand the current state to the snapshot handler once per snapshot
+        interval, without adding it to the history.
+        """
+        if self._snapshotHandler is None or self._time < self._nextSnapshot:
+            return
+        state = self._historyManager.snapshot(self._time,
+                                              self._jobManager.jobs(),
+                                              self._eventQueue.events(),
+                                              self._scheduler)
+        self._snapshotHandler(state)
+        self._nextSnapshot = nextSnapshotTime(self._time,
+                                              self._snapshotInterval)
+
     def _deadlineMissCheck(self):
         if self._stopOnMiss:
             return not self._historyManager.deadlineMissOccured()
@@ -135,7 +403,7 @@ class Simulator:
             return True
 
     def _executeEvents(self, timeLimit):
-        top = self._eventQueue.top()
+        top = self._eventQueue.effectiveTop()
         try:
             assert(top.time >= self._time)
         except AssertionError:
@@ -143,15 +411,18 @@ class Simulator:
             raise
         if top.time < timeLimit:
             self._time = top.time
-            logger.debug("Changed time to %d", top.time)
+            counters = self._counters
+            if counters is not None:
+                counters.sampleQueueSize(len(self._eventQueue))
             timeChanged = False
             while not timeChanged:
                 top = self._eventQueue.effectiveTop()
                 assert top.time >= self._time
                 if top.time == self._time:
-                    logger.debug("Executing event: %s", top)
                     self._eventQueue.pop()
                     top.execute(self)
+                    if counters is not None:
+                        counters.countEvent(top)
                 else:
                     timeChanged = True
             return self._deadlineMissCheck()
@@ -159,6 +430,8 @@ class Simulator:
             return False
 
     def _doSchedule(self):
+        if self._counters is not None:
+            self._counters.countSchedule(self._scheduler.nbReadyJobs())
         oldJob, newJob = self._scheduler.schedule(self._time)
         if newJob is not None:
             if oldJob is not None:
@@ -169,42 +442,152 @@ class Simulator:
             else:
                 self._execute(newJob)
 
+    def _canFastForward(self):
+        # Fast forwarding skips the completion events, which must be traced.
+        return (self._historyManager.isSilent() and
+                self._tracer is None and
+                self._scheduler.runningJob() is None)
+
+    def _fastForward(self, timeLimit):
+        """
+        Schedule from an idle processor without tracking the intermediate
+        states.
+
+        Nobody observes the intermediate states of a silent simulation, so the
+        jobs that complete before the next event are run to completion
+        directly, without any completion event, and the idle interval that
+        follows is skipped up to the next release.
+
+        :param timeLimit:   Events at or after this time are not processed.
+        """
+        counters = self._counters
+        if counters is not None:
+            counters.countSchedule(self._scheduler.nbReadyJobs())
+        job = self._scheduler.schedule(self._time).new
+        while job is not None:
+            self._cancelPromotion(job)
+            nextEventTime = self._eventQueue.effectiveTop().time
+            completionTime = self._time + job.remainingExecWithDebt()
+            if completionTime > nextEventTime or completionTime >= timeLimit:
+                self._execute(job)
+                return
+            job.start(self._time)
+            self._time = completionTime
+            self.completion(job)
+            if completionTime == nextEventTime:
+                return
+            if counters is not None:
+                counters.countSchedule(self._scheduler.nbReadyJobs())
+            job = self._scheduler.schedule(self._time).new
+        self._skipIdleEvents(timeLimit)
+
+    def _skipIdleEvents(self, timeLimit):
+        top = self._eventQueue.effectiveTop()
+        while (top.time < timeLimit and
+               (isinstance(top, ScheduleTick) or
+                (isinstance(top, Deadline) and top.job.isCompleted()))):
+            self._eventQueue.pop()
+            self._time = top.time
+            top.execute(self)
+            if self._counters is not None:
+                self._counters.countEvent(top)
+            top = self._eventQueue.effectiveTop()
+
     def addNextScheduleTicks(self):
         scheduleTicks = self._scheduler.nextScheduleTicks(self._time)
         for scheduleTick in scheduleTicks:
             self._eventQueue.addScheduleTick(scheduleTick)
 
 
-class _EventQueue:
+class EventQueue(ABC):
+    """
+    The pending events of a simulation, ordered by time and then by event
+    priority.
 
-    def __init__(self, events=None):
-        if events is None:
-            events = []
-        self._queue = [(e.time, e.priority, e) for e in events]
-        heapify(self._queue)
+    Extend this class to implement a new queue structure; the Simulator
+    creates its queue from the class given by its @p eventQueueClass
+    argument.
 
-    def effectiveTop(self):
-        top = self.top()
-        while top.ignore():
-            logger.debug("Event ignored: %s", top)
-            self.pop()
-            top = self.top()
-        return top
+    Cancelled events stay in the queue until they reach its top or until the
+    queue is compacted, which happens when they outnumber the live events.
+
+    The cancelled events removed from the top are counted in the
+    SimulationCounters set as @p counters, if any.
+    """
+
+    MIN_COMPACTION_SIZE = 64
 
+    def __init__(self):
+        self._nbDeadEvents = 0
+        self._nbCompactions = 0
+        self.counters = None
+
+    @abstractmethod
     def top(self):
-        _, _, event = self._queue[0]
-        return event
+        """
+        The first event of the queue, even if it must be ignored.
+        """
+        raise NotImplementedError
 
+    @abstractmethod
     def pop(self):
-        try:
-            heappop(self._queue)
-        except TypeError:
-            logger.exception('Queue content {}'.format(self._queue))
-            raise
+        """
+        Remove the first event of the queue.
+        """
+        raise NotImplementedError
 
+    @abstractmethod
     def events(self):
-        for _, _, e in self._queue:
-            yield e
+        """
+        All the events of the queue, in no particular order.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def addEvent(self, event):
+        raise NotImplementedError
+
+    @abstractmethod
+    def __len__(self):
+        """
+        The number of events in the queue, including the cancelled ones.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def _compact(self):
+        """
+        Remove all the cancelled events from the queue.
+        """
+        raise NotImplementedError
+
+    def nbDeadEvents(self):
+        return self._nbDeadEvents
+
+    def nbCompactions(self):
+        return self._nbCompactions
+
+    def cancel(self, event):
+        event.cancel()
+        self._nbDeadEvents += 1
+        if (self._nbDeadEvents >= self.MIN_COMPACTION_SIZE and
+                2 * self._nbDeadEvents > len(self)):
+            logger.debug('Compacting event queue (%s dead events out of %s)',
+                         self._nbDeadEvents, len(self))
+            self._compact()
+            self._nbDeadEvents = 0
+            self._nbCompactions += 1
+
+    def effectiveTop(self):
+        top = self.top()
+        while top.ignore():
+            self.pop()
+            self._nbDeadEvents -= 1
+            if self.counters is not None:
+                self.counters.countIgnoredEvent(top)
+            top.discarded()
+            top = self.top()
+        return top
 
     def addDeadline(self, job):
         self.addEvent(job.deadlineEvent())
@@ -215,11 +598,116 @@ class _EventQueue:
     def addScheduleTick(self, time):
         self.addEvent(ScheduleTick(time))
 
+
+class HeapEventQueue(EventQueue):
+    """
+    Binary heap of (time, priority, counter, event) entries.
+
+    The counter orders events with the same time and priority (such as a
+    cancelled event and its replacement) by insertion.
+    """
+
+    def __init__(self, events=None):
+        super().__init__()
+        if events is None:
+            events = []
+        self._counter = count()
+        self._queue = [(e.time, e.priority, next(self._counter), e)
+                       for e in events]
+        heapify(self._queue)
+
+    def __len__(self):
+        return len(self._queue)
+
+    def top(self):
+        return self._queue[0][3]
+
+    def pop(self):
+        heappop(self._queue)
+
+    def events(self):
+        for _, _, _, e in self._queue:
+            if not e.ignore():
+                yield e
+
     def addEvent(self, event):
-        logger.debug('Adding event %s', event)
-        entry = (event.time, event.priority, event)
+        entry = (event.time, event.priority, next(self._counter), event)
         heappush(self._queue, entry)
 
+    def _compact(self):
+        self._queue = [entry for entry in self._queue
+                       if not entry[3].ignore()]
+        heapify(self._queue)
+
+
+class _CycleDetector:
+    """
+    Detects the repetition of the state of a periodic schedule.
+
+    The state is fingerprinted relatively to the current time at idle
+    instants and at hyperperiod boundaries.
+    Two instants with the same fingerprint and the same offset in the
+    hyperperiod are followed by the same schedule; only one fingerprint is
+    kept to find them (see RepetitionFinder).
+    With offset tasks, the releases only depend on the offset in the
+    hyperperiod once every task has released its first job, so the states
+    are only recorded from the largest offset.
+    """
+
+    def __init__(self, taskset):
+        self._hyperperiod = taskset.hyperperiod
+        self._start = max((task.offset for task in taskset), default=0)
+        self._finder = RepetitionFinder()
+
+    @staticmethod
+    def supports(taskset):
+        periodic = FixedArrivalDistribution, OffsetArrivalDistribution
+        return all(type(task.arrivalDistribution) in periodic
+                   for task in taskset)
+
+    def check(self, time, jobs, runningJob):
+        """
+        Record the state at @p time.
+
+        :return:    A ScheduleCycle if the state repeats an earlier one,
+                    None otherwise.
+        """
+        if time < self._start:
+            return None
+        offset = time % self._hyperperiod
+        if runningJob is not None and offset != 0:
+            return None
+        fingerprint = (offset,
+                       frozenset(self._jobFingerprint(time, j) for j in jobs),
+                       self._runningFingerprint(time, runningJob))
+        return self._finder.record(time, fingerprint)
+
+    @staticmethod
+    def _jobFingerprint(time, job):
+        if job.hasBeenStarted():
+            lastStart = job.lastStart() - time
+        else:
+            lastStart = None
+        return (job.task,
+                job.releaseTime - time,
+                job.progress(),
+                job.preemptionDebt(),
+                lastStart)
+
+    @staticmethod
+    def _runningFingerprint(time, runningJob):
+        if runningJob is None:
+            return None
+        else:
+            return runningJob.task, runningJob.releaseTime - time
+
+
+def nextSnapshotTime(time, interval):
+    """
+    The first multiple of the snapshot @p interval after @p time.
+    """
+    return (time // interval + 1) * interval
+
 
 class _HistoryManager:
 
@@ -228,11 +716,15 @@ class _HistoryManager:
                  initialState,
                  trackHistory,
                  trackPreemptions,
-                 aggregators):
+                 aggregators,
+                 checkpointInterval=None,
+                 counters=None):
         self._history = history
+        self._counters = counters
         self._currentState = initialState
         self._trackHistory = trackHistory
         self._trackPreemptions = trackPreemptions
+        self._checkpointInterval = checkpointInterval
         self._currentDeadlineMisses = []
         self._currentPreemptions = []
         self._aggregators = aggregators
@@ -243,6 +735,15 @@ class _HistoryManager:
     def deadlineMissOccured(self):
         return len(self._currentDeadlineMisses) > 0
 
+    def setCycle(self, cycle):
+        self._history.setCycle(cycle)
+
+    def isSilent(self):
+        """
+        Whether the states between two forced states are never observed.
+        """
+        return not self._trackHistory and not self._aggregators
+
     def preemptionOccured(self):
         return len(self._currentPreemptions) > 0
 
@@ -263,7 +764,7 @@ class _HistoryManager:
         return self._currentState.scheduler
 
     def nextState(self, time, jobs, events, scheduler, forceAdd=False):
-        trackCond = self._trackingCondition()
+        trackCond = self._trackingCondition(time)
         if self._aggregators or forceAdd or trackCond:
             eventList = list(events)
         if forceAdd or trackCond:
@@ -278,6 +779,26 @@ class _HistoryManager:
         self._currentDeadlineMisses.clear()
         self._currentPreemptions.clear()
 
+    def jobRetired(self, job):
+        """
+        Signal to the aggregators that the completed @p job is removed from
+        the simulation, possibly before any state observes its completion.
+        """
+        if self._aggregators:
+            for aggregator in self._aggregators:
+                aggregator.jobRetired(job)
+
+    def snapshot(self, time, jobs, events, scheduler):
+        """
+        The state right after the last call to nextState().
+
+        It is the state added to the history at @p time if there is one, a
+        new state otherwise.
+        """
+        if self._currentState.time == time:
+            return self._currentState
+        return self._createState(time, jobs, events, scheduler)
+
     def _updateAggregators(self, time, jobs, events, scheduler):
         for aggregator in self._aggregators:
             aggregator.aggregate(time,
@@ -288,6 +809,8 @@ class _HistoryManager:
                                  self._currentPreemptions)
 
     def _createState(self, time, jobs, events, scheduler):
+        if self._counters is not None:
+            self._counters.countState()
         jobStates = [j.jobState() for j in jobs]
         events = [e.stateConverted() for e in events]
         schedulerState = scheduler.schedulerState()
@@ -299,7 +822,18 @@ class _HistoryManager:
                                scheduler=schedulerState)
         return state
 
-    def _trackingCondition(self):
+    def _trackingCondition(self, time):
         return (self._trackHistory or
                 self.deadlineMissOccured() or
-                (self._trackPreemptions and self.preemptionOccured()))
+                (self._trackPreemptions and self.preemptionOccured()) or
+                self._checkpointCondition(time))
+
+    def _checkpointCondition(self, time):
+        """
+        With a checkpoint interval, the first state of each interval is kept
+        so that any earlier time can be re-simulated from a close state.
+        """
+        if self._checkpointInterval is None:
+            return False
+        interval = self._checkpointInterval
+        return time // interval > self._currentState.time // interval
@@ -40,6 +40,30 @@ class Taskset(ValueEqual):
     def maxPeriod(self):
         return max(task.minimalInterArrivalTime for task in self._tasks)
 
+    @property
+    def maxOffset(self):
+        return max(task.offset for task in self._tasks)
+
+    @property
+    def feasibilityInterval(self):
+        """
+        The length of a prefix of the schedule of this periodic taskset with
+        constrained deadlines that misses a deadline whenever the schedule
+        does, under EDF or fixed priorities.
+
+        This is the hyperperiod H for synchronous tasksets and, more
+        generally, O + H when all the tasks share the same offset O.
+        With distinct offsets, the schedule only repeats from the largest
+        offset plus H, so this is the largest offset plus 2H (Leung and
+        Merrill).
+        Tasksets with a utilization above 1 miss deadlines anyway, but not
+        necessarily in that interval.
+        """
+        offsets = set(task.offset for task in self._tasks)
+        if len(offsets) <= 1:
+            return max(offsets, default=0) + self.hyperperiod
+        return max(offsets) + 2 * self.hyperperiod
+
     def laxEquality(self, other):
         otherTasks = set(other)
         for t1 in self:
@@ -134,6 +158,13 @@ class Task(ValueEqual):
     def preemptionCost(self):
         return self._preemptionCost
 
+    @property
+    def offset(self):
+        """
+        The release time of the first job.
+        """
+        return self._arrivalDistrib.arrivalTime(0)
+
     def arrivalTime(self, releaseIndex):
         return self._arrivalDistrib.arrivalTime(releaseIndex)
 
@@ -213,18 +244,6 @@ class LogPreemptionCost(ValueEqual):
         totalArea = baseArea - remArea - progressArea
         areaCost = int(math.floor(totalArea * self._timeRatio))
         finalDebt = self._fixedCost + areaCost
-        logger.debug('Calculating debt with base area %f from exec time %s',
-                     baseArea,
-                     job.wcet)
-        logger.debug('Remaining area %f from exec time %s', remArea, remWcet)
-        logger.debug('Progress area %f from exec time %s',
-                     progressArea,
-                     progress)
-        logger.debug('Debt is %s (floor of %s plus total area %f times %s)',
-                     finalDebt,
-                     self._fixedCost,
-                     totalArea,
-                     self._timeRatio)
         return finalDebt
 
     def _baseArea(self, job):
@@ -261,6 +280,33 @@ class FixedArrivalDistribution(ValueEqual):
         return "FixedArrivalDistribution({})".format(self._period)
 
 
+class OffsetArrivalDistribution(ValueEqual):
+    """
+    Periodic releases every @p period, the first one at @p offset.
+    """
+
+    def __init__(self, period, offset):
+        super().__init__()
+        assert offset >= 0
+        self._period = period
+        self._offset = offset
+
+    @property
+    def minimal(self):
+        return self._period
+
+    @property
+    def offset(self):
+        return self._offset
+
+    def arrivalTime(self, releaseIndex):
+        return self._offset + self._period * releaseIndex
+
+    def __repr__(self):
+        return "OffsetArrivalDistribution({}, {})".format(self._period,
+                                                          self._offset)
+
+
 class PoissonArrivalDistribution(ValueEqual):
 
     def __init__(self, minimal, lambdaFactor, seed=None):
@@ -289,14 +335,15 @@ class PoissonArrivalDistribution(ValueEqual):
     def arrivalTime(self, releaseIndex):
         if releaseIndex == 0:
             return 0
-        if releaseIndex not in self._arrivalMap:
-            previous = self.arrivalTime(releaseIndex - 1)
+        # The arrivals are sampled in order, so the map holds the releases
+        # 1 to len(self._arrivalMap).
+        arrivalMap = self._arrivalMap
+        while releaseIndex not in arrivalMap:
+            index = len(arrivalMap) + 1
+            previous = arrivalMap.get(index - 1, 0)
             sample = self._random.poisson(self._lambda) + self._minimal
-            arrival = sample + previous
-            self._arrivalMap[releaseIndex] = arrival
-        else:
-            arrival = self._arrivalMap[releaseIndex]
-        return arrival
+            arrivalMap[index] = sample + previous
+        return arrivalMap[releaseIndex]
 
     def __repr__(self):
         return "PoissonAD({}, {}, {})".format(self._minimal,
@@ -1,16 +1,31 @@
 from abc import ABC
+from collections import namedtuple
 from enum import Enum
 
 from .utils.eq import ValueEqual
 from .internals.sched import (EDFScheduler,
                               RMScheduler,
-                              DualPriorityScheduler)
+                              FixedPriorityScheduler,
+                              DualPriorityScheduler,
+                              StaticDualPriorityScheduler)
+
+
+"""
+The dual priorities of the tasks of a policy in flat tuples, indexed by the
+dense task indices of taskIndices (which maps id(task) to its index).
+The promotion of a task without promotion is None.
+"""
+DualPriorityIndex = namedtuple('DualPriorityIndex', ['taskIndices',
+                                                     'lowPriorities',
+                                                     'highPriorities',
+                                                     'promotions'])
 
 
 class SchedulerTag(Enum):
     EDF = EDFScheduler
     RM = RMScheduler
     DP = DualPriorityScheduler
+    FP = FixedPriorityScheduler
 
 
 class AbstractSchedulingPolicy(ABC, ValueEqual):
@@ -55,6 +70,45 @@ class RMSchedulingPolicy(AbstractSchedulingPolicy):
         return SchedulerTag.RM
 
 
+class FixedPrioritySchedulingPolicy(AbstractSchedulingPolicy):
+    """
+    Fixed priorities given as (task, priority) pairs, where lower values are
+    higher priorities (as for DualPrioritySchedulingPolicy).
+    """
+
+    def __init__(self, *taskPriorities):
+        super().__init__()
+        self._taskPriorities = frozenset(taskPriorities)
+
+    def __repr__(self):
+        return 'FixedPrioritySchedulingPolicy({})'.format(
+            self._taskPriorities)
+
+    def priority(self, task):
+        for t, priority in self._taskPriorities:
+            if t is task:
+                return priority
+        raise AssertionError('Task not found in fixed priority information.')
+
+    def index(self):
+        """
+        A new dict mapping id(task) to the priority of the task.
+        """
+        return {id(task): priority for task, priority in self._taskPriorities}
+
+    def createSchedulerInstance(self):
+        return FixedPriorityScheduler(policy=self)
+
+    def tag(self):
+        return SchedulerTag.FP
+
+    def tasks(self):
+        return {task for task, _ in self._taskPriorities}
+
+    def items(self):
+        return self._taskPriorities
+
+
 class DualPrioritySchedulingPolicy(AbstractSchedulingPolicy):
 
     def __init__(self, *taskPriorities):
@@ -92,8 +146,35 @@ class DualPrioritySchedulingPolicy(AbstractSchedulingPolicy):
     def promotion(self, task):
         return self.schedulerInfo(task).promotion
 
+    def index(self):
+        """
+        A new DualPriorityIndex of the tasks of this policy, built once by the
+        schedulers that use it so that evaluating a priority only reads a
+        couple of tuples.
+        """
+        taskIndices = {}
+        lowPriorities = []
+        highPriorities = []
+        promotions = []
+        for index, (task, info) in enumerate(self._taskPriorities):
+            taskIndices[id(task)] = index
+            lowPriorities.append(info.lowPriority)
+            highPriorities.append(info.highPriority)
+            promotions.append(info.promotion)
+        return DualPriorityIndex(taskIndices,
+                                 tuple(lowPriorities),
+                                 tuple(highPriorities),
+                                 tuple(promotions))
+
     def createSchedulerInstance(self):
-        return DualPriorityScheduler(policy=self)
+        """
+        Without promotions, the priorities are fixed and the policy gets the
+        heap-based scheduler of FixedPrioritySchedulingPolicy.
+        """
+        if self.promotedTasks():
+            return DualPriorityScheduler(policy=self)
+        else:
+            return StaticDualPriorityScheduler(policy=self)
 
     def tag(self):
         return SchedulerTag.DP
@@ -7,6 +7,7 @@ from enum import Enum
 from abc import ABC
 
 from .sim import SimulationRun
+from .stats import SimulationCounters
 from .utils.persistence import FileEnv
 from .utils.eq import ValueEqual
 
@@ -25,6 +26,7 @@ class InterruptibleRunner:
 
         self._setupFiles = FileEnv(rootPath=setupPath, manifest=True)
         self._resultFiles = FileEnv(rootPath=resultPath, manifest=False)
+        self._snapshotPath = resultPath + '/snapshots'
         self._setups = {setup: key for key, setup in self._setupFiles.items()}
         self._resultsManifest = _ResultsManifest(resultPath + '/manifest.txt')
         self._resultDict = dict(self._loadManifest())
@@ -60,16 +62,30 @@ class InterruptibleRunner:
             self._setupFiles.save(setup, setupKey)
             self._setups[setup] = setupKey
 
-    def run(self, nbProcesses):
+    def run(self, nbProcesses, snapshotInterval=None):
+        """
+        Run the setups that have no result yet.
+
+        With a @p snapshotInterval, the simulations save snapshots so that a
+        run interrupted in the middle of a long simulation resumes it instead
+        of starting it over.
+        """
         remSetups = set()
 
         for s in self.setups():
             if s not in self._resultDict.keys():
                 remSetups.add(s)
 
+        if snapshotInterval is None:
+            snapshots = None
+        else:
+            snapshots = SnapshotSettings(FileEnv(rootPath=self._snapshotPath),
+                                         snapshotInterval,
+                                         self._setups)
         runner = simulationRunner(remSetups,
                                   nbProcesses=nbProcesses,
-                                  saveToFile=self._resultFiles)
+                                  saveToFile=self._resultFiles,
+                                  snapshots=snapshots)
         runner.start()
         unsyncResults = 0
         while remSetups:
@@ -92,22 +108,49 @@ class InterruptibleRunner:
         if unsyncResults > 0:
             self._resultsManifest.save()
         runner.join()
+        if runner.countsOperations():
+            logger.info('Operations: %s', runner.counters())
 
 
 def simulationRunner(setups,
                      errorHandling=True,
                      multicore=True,
                      nbProcesses=4,
-                     saveToFile=None):
+                     saveToFile=None,
+                     snapshots=None):
     if multicore:
         return _MulticoreSimulationRunner(setups,
                                           errorHandling,
                                           saveToFile=saveToFile,
-                                          nbProcesses=nbProcesses)
+                                          nbProcesses=nbProcesses,
+                                          snapshots=snapshots)
     else:
         return _MonocoreSimulationRunner(setups,
                                          errorHandling=errorHandling,
-                                         saveToFile=saveToFile)
+                                         saveToFile=saveToFile,
+                                         snapshots=snapshots)
+
+
+class SnapshotSettings:
+    """
+    Where and how often the simulation runs save their snapshots (see
+    SimulationRun).
+
+    @p setupKeys maps each setup to the key of its snapshot in @p fileEnv.
+    """
+
+    def __init__(self, fileEnv, interval, setupKeys):
+        super().__init__()
+        self._fileEnv = fileEnv
+        self._interval = interval
+        self._setupKeys = dict(setupKeys)
+
+    def createRun(self, setup, errorHandling):
+        return SimulationRun(setup,
+                             errorHandling=errorHandling,
+                             snapshotEnv=self._fileEnv,
+                             snapshotKey=self._setupKeys[setup],
+                             snapshotInterval=self._interval)
 
 
 class _ResultsManifest:
@@ -140,6 +183,13 @@ class _ResultsManifest:
             pass
 
 
+def _createRun(setup, errorHandling, snapshots):
+    if snapshots is None:
+        return SimulationRun(setup, errorHandling=errorHandling)
+    else:
+        return snapshots.createRun(setup, errorHandling)
+
+
 def _saveResult(index, result, fileEnv):
     baseKey = 'simuResult#{:0>6}'.format(index)
     key = fileEnv.save(result, baseKey, timedKey=True)
@@ -148,12 +198,19 @@ def _saveResult(index, result, fileEnv):
 
 class _AbstractSimulationRunner(ABC):
 
-    def __init__(self, setups, errorHandling=True, saveToFile=None):
+    def __init__(self,
+                 setups,
+                 errorHandling=True,
+                 saveToFile=None,
+                 snapshots=None):
         self._setups = list(setups)
         self._remResults = len(self._setups)
         self._status = RunnerStatus.CREATED
         self._results = {}
+        self._counters = SimulationCounters()
+        self._countsOperations = False
         self._errorHandling = errorHandling
+        self._snapshots = snapshots
         if saveToFile is not None:
             self._fileEnv = saveToFile
             self._saveToFile = True
@@ -173,6 +230,26 @@ class _AbstractSimulationRunner(ABC):
     def gotAllResults(self):
         return self._remResults == 0
 
+    def countsOperations(self):
+        """
+        Whether a result received so far has SimulationCounters.
+        """
+        return self._countsOperations
+
+    def counters(self):
+        """
+        The SimulationCounters of all the results received so far, merged.
+        Only the setups that count the operations or time the phases of their
+        simulation contribute to them.
+        """
+        self._updateResults()
+        return self._counters
+
+    def _addCounters(self, counters):
+        if counters is not None:
+            self._counters.merge(counters)
+            self._countsOperations = True
+
     def join(self):
         self._joinResults()
         self._status = RunnerStatus.ENDED
@@ -210,11 +287,16 @@ class _AbstractSimulationRunner(ABC):
 
 class _MonocoreSimulationRunner(_AbstractSimulationRunner):
 
-    def __init__(self, setups, errorHandling, saveToFile=None):
-        super().__init__(setups, errorHandling, saveToFile)
+    def __init__(self,
+                 setups,
+                 errorHandling,
+                 saveToFile=None,
+                 snapshots=None):
+        super().__init__(setups, errorHandling, saveToFile, snapshots)
 
     def _setResult(self, index, result):
         setup = result.setup
+        self._addCounters(result.counters)
         if self._saveToFile:
             key = _saveResult(index, result, self._fileEnv)
             self._results[setup] = key
@@ -223,7 +305,7 @@ class _MonocoreSimulationRunner(_AbstractSimulationRunner):
 
     def _startSimulations(self):
         for i, setup in enumerate(self._setups):
-            run = SimulationRun(setup, errorHandling=self._errorHandling)
+            run = _createRun(setup, self._errorHandling, self._snapshots)
             result = run.result()
             self._setResult(i, result)
             self._remResults -= 1
@@ -237,8 +319,13 @@ class _MonocoreSimulationRunner(_AbstractSimulationRunner):
 
 class _MulticoreSimulationRunner(_AbstractSimulationRunner):
 
-    def __init__(self, setups, errorHandling, nbProcesses, saveToFile=None):
-        super().__init__(setups, errorHandling, saveToFile)
+    def __init__(self,
+                 setups,
+                 errorHandling,
+                 nbProcesses,
+                 saveToFile=None,
+                 snapshots=None):
+        super().__init__(setups, errorHandling, saveToFile, snapshots)
         self._nbProcesses = nbProcesses
         self._setupQueue = Queue()
         for i, setup in enumerate(self._setups):
@@ -266,21 +353,25 @@ class _MulticoreSimulationRunner(_AbstractSimulationRunner):
         if self._saveToFile:
             return _ProcessTarget(self._errorHandling,
                                   self._saveToFile,
-                                  fileEnv=self._fileEnv)
+                                  fileEnv=self._fileEnv,
+                                  snapshots=self._snapshots)
         else:
-            return _ProcessTarget(self._errorHandling, self._saveToFile)
+            return _ProcessTarget(self._errorHandling,
+                                  self._saveToFile,
+                                  snapshots=self._snapshots)
 
     def _updateResults(self):
         gotResults = False
         while self._remResults > 0:
             try:
-                setup, result = self._resultQueue.get_nowait()
+                setup, result, counters = self._resultQueue.get_nowait()
             except queue.Empty:
                 break
             else:
                 logger.debug('Added result for %s', setup)
                 logger.debug('Queue depth %d', self._resultQueue.qsize())
                 self._results[setup] = result
+                self._addCounters(counters)
                 self._remResults -= 1
                 gotResults = True
         if gotResults:
@@ -289,9 +380,10 @@ class _MulticoreSimulationRunner(_AbstractSimulationRunner):
     def _joinResults(self):
         logger.debug('Joining results')
         while self._remResults > 0:
-            setup, result = self._resultQueue.get()
+            setup, result, counters = self._resultQueue.get()
             logger.debug('Added result for %s', setup)
             self._results[setup] = result
+            self._addCounters(counters)
             self._remResults -= 1
         assert self._resultQueue.empty()
         logger.debug('Results joined')
@@ -301,10 +393,15 @@ class _MulticoreSimulationRunner(_AbstractSimulationRunner):
 
 class _ProcessTarget:
 
-    def __init__(self, errorHandling, saveToFile, fileEnv=None):
+    def __init__(self,
+                 errorHandling,
+                 saveToFile,
+                 fileEnv=None,
+                 snapshots=None):
         super().__init__()
         self._errorHandling = errorHandling
         self._saveToFile = saveToFile
+        self._snapshots = snapshots
         if saveToFile:
             assert fileEnv is not None
             self._fileEnv = fileEnv
@@ -314,13 +411,15 @@ class _ProcessTarget:
             availableWork = workSemaphore.acquire(timeout=0)
             if availableWork:
                 index, setup = setupQueue.get()
-                run = SimulationRun(setup, errorHandling=self._errorHandling)
+                run = _createRun(setup, self._errorHandling, self._snapshots)
                 result = run.result()
+                # The counters are sent along with the result, which is not
+                # sent back when it is saved to a file.
                 if self._saveToFile:
                     key = _saveResult(index, result, self._fileEnv)
-                    resultQueue.put((setup, key))
+                    resultQueue.put((setup, key, result.counters))
                 else:
-                    resultQueue.put((setup, result))
+                    resultQueue.put((setup, result, result.counters))
                 del result
             else:
                 break
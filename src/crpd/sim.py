@@ -1,33 +1,67 @@
 
 import logging
 from enum import Enum
+from multiprocessing import Pool
 
-from .policy import EDFSchedulingPolicy
+from .policy import (EDFSchedulingPolicy,
+                     DualPrioritySchedulingPolicy,
+                     FixedPrioritySchedulingPolicy,
+                     RMSchedulingPolicy)
 from .utils.eq import ValueEqual
 from .hist import (DeadlineMissFilter,
+                   DualPrioritySchedulerState,
+                   JobState,
                    SimulationHistory,
                    SimulatorState,
-                   StateArrival)
-from .internals.simulator import Simulator
+                   StateArrival,
+                   StateDeadline,
+                   StatePromotion)
+from .internals.simulator import Simulator, nextSnapshotTime
+from .internals.fastsim import FastSimulator
+from .internals.demand import IdleInstantFinder
+from .internals.lockstep import LockstepSimulator
+from .internals.batchsim import BatchSimulator
+from .internals.budget import SimulationBudget
 from .internals.sched import (DualPriorityScheduler,
                               EDFScheduler,
                               RMScheduler,
                               SchedulerFactory)
 from .internals.errors import SimulationError
 from .utils.persistence import FileEnv
-from .stats import StatAggregator
+from .stats import SimulationCounters, SimulationPhase, StatAggregator
+from .trace import SimulationTracer, TraceKind
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_TIME_LIMIT = 10**100
 
+_STREAM_TRACE_KINDS = (TraceKind.Event,
+                       TraceKind.Schedule,
+                       TraceKind.Preemption,
+                       TraceKind.DeadlineMiss)
+
 
 class SimulationSetup(ValueEqual):
     """
     A complete representation of the parameters of a simulation, including
     taskset, time limit and scheduling algorithm.
+
+    With @p time set to 'auto', the time limit is a sufficient horizon for
+    the scheduling policy (see simulationHorizon()), computed when it is
+    first needed; with release offsets, that horizon is the feasibility
+    interval of the taskset.
     """
 
+    # The parameters that were added after setups were first saved.
+    _DEFAULT_STATE = {'_detectCycles': False,
+                      '_lazyDeadlines': False,
+                      '_checkpointInterval': None,
+                      '_countOperations': False,
+                      '_timePhases': False,
+                      '_timeBudget': None,
+                      '_instantBudget': None,
+                      '_horizon': None}
+
     def __init__(self,
                  taskset,
                  time=1000,
@@ -35,18 +69,34 @@ class SimulationSetup(ValueEqual):
                  deadlineMissFilter=False,
                  trackHistory=False,
                  trackPreemptions=False,
-                 aggregatorTags=None):
+                 aggregatorTags=None,
+                 detectCycles=False,
+                 lazyDeadlines=False,
+                 checkpointInterval=None,
+                 countOperations=False,
+                 timePhases=False,
+                 timeBudget=None,
+                 instantBudget=None):
         super().__init__()
         self._taskset = taskset
-        self._time = time
         self._trackHistory = trackHistory
         self._trackPreemptions = trackPreemptions
+        self._detectCycles = detectCycles
+        self._lazyDeadlines = lazyDeadlines
+        self._checkpointInterval = checkpointInterval
+        self._countOperations = countOperations
+        self._timePhases = timePhases
+        self._timeBudget = timeBudget
+        self._instantBudget = instantBudget
 
         if schedulingPolicy is None:
             self._schedulingPolicy = EDFSchedulingPolicy()
         else:
             self._schedulingPolicy = schedulingPolicy
 
+        self._time = time
+        self._horizon = None
+
         if deadlineMissFilter is False:
             self._deadlineMissFilter = DeadlineMissFilter(False)
         elif deadlineMissFilter is True:
@@ -65,7 +115,12 @@ class SimulationSetup(ValueEqual):
 
     @property
     def time(self):
-        return self._time
+        if self._time != 'auto':
+            return self._time
+        if self._horizon is None:
+            self._horizon = simulationHorizon(self._taskset,
+                                              self._schedulingPolicy)
+        return self._horizon
 
     @property
     def deadlineMissFilter(self):
@@ -83,15 +138,63 @@ class SimulationSetup(ValueEqual):
     def schedulingPolicy(self):
         return self._schedulingPolicy
 
+    @property
+    def detectCycles(self):
+        return self._detectCycles
+
+    @property
+    def lazyDeadlines(self):
+        return self._lazyDeadlines
+
+    @property
+    def checkpointInterval(self):
+        return self._checkpointInterval
+
     @property
     def aggregatorTags(self):
         return self._aggregatorTags
 
+    @property
+    def countOperations(self):
+        return self._countOperations
+
+    @property
+    def timePhases(self):
+        return self._timePhases
+
+    @property
+    def timeBudget(self):
+        """
+        The wall clock time allowed to the run of the simulation, in seconds
+        (None for no limit).
+        """
+        return self._timeBudget
+
+    @property
+    def instantBudget(self):
+        """
+        The number of scheduling instants the run of the simulation may
+        simulate (None for no limit).
+        """
+        return self._instantBudget
+
+    def hasBudget(self):
+        return self._timeBudget is not None or self._instantBudget is not None
+
+    def _nonValueFields(self):
+        return ('_horizon',)
+
+    def __setstate__(self, state):
+        super().__setstate__(dict(SimulationSetup._DEFAULT_STATE, **state))
+
     def __repr__(self):
         formatStr = ('SimulationSetup({}, time={}, trackHistory={}, '
                      'trackPreemptions={}, '
                      'deadlineMissFilter={}, schedulingPolicy={}, '
-                     'aggregatorTags=[{}])')
+                     'aggregatorTags=[{}], detectCycles={}, '
+                     'lazyDeadlines={}, checkpointInterval={}, '
+                     'countOperations={}, timePhases={}, timeBudget={}, '
+                     'instantBudget={})')
         aggregatorStr = ', '.join('AggregatorTag.' + ag.name
                                   for ag in self._aggregatorTags)
         return formatStr.format(self._taskset,
@@ -100,23 +203,134 @@ class SimulationSetup(ValueEqual):
                                 self._trackPreemptions,
                                 self._deadlineMissFilter,
                                 self._schedulingPolicy,
-                                aggregatorStr)
+                                aggregatorStr,
+                                self._detectCycles,
+                                self._lazyDeadlines,
+                                self._checkpointInterval,
+                                self._countOperations,
+                                self._timePhases,
+                                self._timeBudget,
+                                self._instantBudget)
+
+
+def simulationHorizon(taskset, schedulingPolicy=None):
+    """
+    A time limit that is sufficient to know whether @p taskset misses
+    deadlines under @p schedulingPolicy (EDF by default): if the schedule
+    misses a deadline, it misses one before that time.
+    Under fixed priorities, every task that ever misses a deadline misses one
+    before that time.
+
+    For synchronous periodic tasksets with constrained deadlines and without
+    preemption costs, under EDF or fixed priorities (RM, explicit fixed
+    priorities, or dual priority without promotions), this is the length of
+    the synchronous busy period
+    (see IdleInstantFinder).
+    Preemption costs break that argument, since a job can be preempted later
+    on while it was not in the synchronous busy period.
+    Otherwise (e.g. dual priority with promotions, or tasks with release
+    offsets), and whenever it is shorter, the feasibility interval of the
+    taskset is used (see Taskset.feasibilityInterval).
+    """
+    if schedulingPolicy is None:
+        schedulingPolicy = EDFSchedulingPolicy()
+    interval = taskset.feasibilityInterval
+    if not _hasBusyPeriodHorizon(taskset, schedulingPolicy):
+        return interval
+    busyPeriod = IdleInstantFinder(taskset, schedulingPolicy).busyPeriod
+    if busyPeriod is None or busyPeriod > interval:
+        return interval
+    logger.debug('Busy period horizon %s (feasibility interval %s)',
+                 busyPeriod,
+                 interval)
+    return busyPeriod
+
+
+def _hasBusyPeriodHorizon(taskset, schedulingPolicy):
+    if isinstance(schedulingPolicy, DualPrioritySchedulingPolicy):
+        if schedulingPolicy.promotedTasks():
+            return False
+    elif not isinstance(schedulingPolicy, (EDFSchedulingPolicy,
+                                           RMSchedulingPolicy,
+                                           FixedPrioritySchedulingPolicy)):
+        return False
+    return (IdleInstantFinder.supports(taskset) and
+            all(t.deadline <= t.minimalInterArrivalTime and
+                t.preemptionCost.cost(None) == 0
+                for t in taskset))
+
+
+class SimulationSnapshot(ValueEqual):
+    """
+    What is needed to resume a simulation run: the state reached, the history
+    until that state and the aggregators.
+    """
+
+    def __init__(self, setup, state, history, aggregators):
+        super().__init__()
+        self._setup = setup
+        self._state = state
+        self._history = history
+        self._aggregators = tuple(aggregators)
+
+    @property
+    def setup(self):
+        return self._setup
+
+    @property
+    def state(self):
+        return self._state
+
+    @property
+    def history(self):
+        return self._history
+
+    @property
+    def aggregators(self):
+        return self._aggregators
 
 
 class SimulationRun(ValueEqual):
     """
     Encapsulates the definition and execution of a simulation run.
+
+    With a @p snapshotEnv (a FileEnv), a SimulationSnapshot is saved under
+    @p snapshotKey about every @p snapshotInterval time units of simulation,
+    and a run of the same setup resumes from that snapshot instead of
+    starting over; the snapshot is removed once the run is complete.
+    The history of a resumed run also contains the state it resumed from,
+    and with cycle detection a resumed run may detect a later cycle.
+
+    When the setup counts the operations or times the phases of the
+    simulation, the SimulationCounters are available on the result.
+
+    When the setup has a budget, the simulation stops once the budget is
+    exhausted and the result is inconclusive after the time reached (see
+    SimulationResult.inconclusiveAfter); its aggregators account for the
+    schedule until then.
     """
 
-    def __init__(self, setup, errorHandling=True):
+    def __init__(self,
+                 setup,
+                 errorHandling=True,
+                 snapshotEnv=None,
+                 snapshotKey=None,
+                 snapshotInterval=None):
         super().__init__()
         self._setup = setup
         self._aggregators = self._createAggregators()
+        self._counters = None
+        if setup.countOperations or setup.timePhases:
+            self._counters = SimulationCounters(timePhases=setup.timePhases)
         self._sim = None
+        self._budget = None
         self._result = None
         self._errorHandling = errorHandling
         if errorHandling:
             self._logsEnv = FileEnv('errorLogs')
+        self._snapshotEnv = snapshotEnv
+        self._snapshotKey = snapshotKey
+        self._snapshotInterval = snapshotInterval
 
     @property
     def setup(self):
@@ -138,25 +352,28 @@ class SimulationRun(ValueEqual):
     def result(self):
         if self._result is None:
             self.execute()
-            self._result = SimulationResult(self._setup,
-                                            self._sim.history.frozen(),
-                                            self._aggregators)
+            self._result = SimulationResult(
+                self._setup,
+                self._sim.history.frozen(),
+                self._aggregators,
+                self._counters,
+                inconclusiveAfter=self._inconclusiveAfter())
         return self._result
 
     def execute(self):
         if self._sim is None:
             try:
-                self._sim = Simulation(
-                    self._setup.taskset,
-                    self._setup.schedulingPolicy,
-                    trackHistory=self._setup.trackHistory,
-                    trackPreemptions=self._setup.trackPreemptions,
-                    aggregators=self._aggregators)
+                self._sim = self._createSimulation()
                 dmFilter = self._setup.deadlineMissFilter
                 if dmFilter.isActive():
                     self._sim.firstDeadlineMiss(dmFilter, self._setup.time)
                 else:
                     self._sim.getState(self._setup.time)
+                inconclusiveAfter = self._inconclusiveAfter()
+                if inconclusiveAfter is not None:
+                    logger.warning('Budget exhausted at time %s for %s',
+                                   inconclusiveAfter,
+                                   self._setup)
             except AssertionError as e:
                 if self._errorHandling:
                     simuError = SimulationError('Assertion failed: ' + str(e),
@@ -179,25 +396,115 @@ class SimulationRun(ValueEqual):
                     simuError.saveToFile()
                 else:
                     raise
+            self._removeSnapshot()
+
+    def _inconclusiveAfter(self):
+        """
+        The time reached by the simulation if it ran out of budget, None
+        otherwise.
+        """
+        if self._budget is None or not self._budget.exhausted():
+            return None
+        return self._sim.history.getLastState(self._setup.time).time
+
+    def _createSimulation(self):
+        setup = self._setup
+        if setup.hasBudget():
+            self._budget = SimulationBudget(seconds=setup.timeBudget,
+                                            instants=setup.instantBudget)
+        history = None
+        snapshotHandler = None
+        if self._snapshotEnv is not None:
+            snapshotHandler = self._saveSnapshot
+            snapshot = self._loadSnapshot()
+            if snapshot is not None:
+                logger.info('Resuming %s from time %s',
+                            self._snapshotKey,
+                            snapshot.state.time)
+                # The states refer to the tasks and policy of the setup saved
+                # with them, which are looked up by identity.
+                setup = snapshot.setup
+                self._aggregators = list(snapshot.aggregators)
+                history = snapshot.history
+                history.addState(snapshot.state)
+        return Simulation(setup.taskset,
+                          setup.schedulingPolicy,
+                          trackHistory=setup.trackHistory,
+                          trackPreemptions=setup.trackPreemptions,
+                          aggregators=self._aggregators,
+                          detectCycles=setup.detectCycles,
+                          lazyDeadlines=setup.lazyDeadlines,
+                          checkpointInterval=setup.checkpointInterval,
+                          snapshotInterval=self._snapshotInterval,
+                          snapshotHandler=snapshotHandler,
+                          history=history,
+                          counters=self._counters,
+                          budget=self._budget)
+
+    def _loadSnapshot(self):
+        try:
+            snapshot = self._snapshotEnv.load(self._snapshotKey)
+        except FileNotFoundError:
+            return None
+        if snapshot.setup != self._setup:
+            logger.warning('Ignoring snapshot %s of another setup',
+                           self._snapshotKey)
+            return None
+        return snapshot
+
+    def _saveSnapshot(self, state):
+        history = self._sim.history.prefix(state.time)
+        snapshot = SimulationSnapshot(self._setup,
+                                      state,
+                                      history,
+                                      self._aggregators)
+        self._snapshotEnv.save(snapshot, self._snapshotKey)
+        logger.debug('Saved snapshot %s at time %s',
+                     self._snapshotKey,
+                     state.time)
+
+    def _removeSnapshot(self):
+        if self._snapshotEnv is not None:
+            try:
+                self._snapshotEnv.remove(self._snapshotKey)
+            except FileNotFoundError:
+                pass
 
     def _createAggregators(self):
         return [StatAggregator.createInstance(tag)
                 for tag in self._setup.aggregatorTags]
 
     def _nonValueFields(self):
-        return '_sim', '_aggregators', '_result'
+        return ('_sim',
+                '_aggregators',
+                '_budget',
+                '_counters',
+                '_result',
+                '_snapshotEnv',
+                '_snapshotKey',
+                '_snapshotInterval')
 
 
 class SimulationResult(ValueEqual):
     """
     The result of a simulation run.
+
+    The @p counters of the run, if any, are not part of the value of the
+    result: they depend on the simulators used.
     """
 
-    def __init__(self, setup, history, aggregators):
+    def __init__(self,
+                 setup,
+                 history,
+                 aggregators,
+                 counters=None,
+                 inconclusiveAfter=None):
         super().__init__()
         self._setup = setup
         self._history = history.frozen()
         self._aggregateStats = tuple(self._createStats(aggregators))
+        self._counters = counters
+        self._inconclusiveAfter = inconclusiveAfter
 
     @property
     def time(self):
@@ -211,6 +518,23 @@ class SimulationResult(ValueEqual):
     def history(self):
         return self._history
 
+    @property
+    def counters(self):
+        """
+        The SimulationCounters of the run, None unless the setup counts the
+        operations or times the phases of the simulation.
+        """
+        return self._counters
+
+    @property
+    def inconclusiveAfter(self):
+        """
+        None if the simulation reached the time limit of the setup (or its
+        first deadline miss); otherwise the time reached when the budget of
+        the setup ran out, after which the result says nothing.
+        """
+        return self._inconclusiveAfter
+
     def aggregateStat(self, key):
         for k, v in self._aggregateStats:
             if key == k:
@@ -223,6 +547,9 @@ class SimulationResult(ValueEqual):
         for aggregator in aggregators:
             yield aggregator.key(), aggregator.result()
 
+    def _nonValueFields(self):
+        return ('_counters',)
+
 
 class Simulation:
     """
@@ -231,6 +558,48 @@ class Simulation:
     Use the getState() function to obtain the state of the simulation at the
     desired time.
     The state is lazily constructed.
+
+    When neither the history nor the preemptions are tracked, simulations of
+    periodic tasksets with fixed preemption costs are run by the FastSimulator
+    kernel as far as possible (unless @p fastKernel is False).
+
+    With @p detectCycles, simulations of periodic tasksets (possibly with
+    offsets) stop at the first repetition of the schedule (see
+    SimulationHistory.cycle()), so the state returned by getState() may be
+    earlier than the requested time.
+
+    With @p lazyDeadlines, no Deadline event is created for a job whose
+    deadline coincides with the next release of its task (e.g. periodic tasks
+    with implicit deadlines): the deadline is checked when the next job
+    arrives, so the states do not contain these deadline events.
+    Deadline misses are reported at the same times as without this option.
+    Constrained deadlines (before the next release) are out of the scope of
+    this option and keep their Deadline event.
+
+    The simulator that reached the latest state is kept alive, so a query
+    later than that state continues the simulation instead of rebuilding it
+    from the history; only queries that go backwards rebuild a simulator.
+
+    With a @p checkpointInterval, the first state of every interval of that
+    length is kept in the history even when the history is not tracked, so a
+    query that goes backwards re-simulates at most about one interval.
+    The fast kernel is not used in that case.
+
+    With a @p snapshotInterval, @p snapshotHandler is called with a state of
+    the simulation about once per interval of that length; a new Simulation
+    given a @p history ending with that state resumes the simulation from it
+    (see SimulationRun).
+    The snapshots are not added to the history.
+
+    The operations of the simulators are counted in @p counters, a
+    SimulationCounters, if any.
+
+    With a @p tracer (a SimulationTracer), the simulators trace the events,
+    scheduling decisions, preemptions and deadline misses of the simulation;
+    neither the fast kernel nor fast forwarding is used in that case.
+
+    With a @p budget (a SimulationBudget), the simulation stops early once the
+    budget is exhausted: the states returned are then earlier than requested.
     """
 
     def __init__(self,
@@ -238,18 +607,43 @@ class Simulation:
                  schedulingPolicy=None,
                  trackHistory=True,
                  trackPreemptions=True,
-                 aggregators=None):
+                 aggregators=None,
+                 fastKernel=True,
+                 detectCycles=False,
+                 eventQueueClass=None,
+                 lazyDeadlines=False,
+                 checkpointInterval=None,
+                 snapshotInterval=None,
+                 snapshotHandler=None,
+                 history=None,
+                 counters=None,
+                 tracer=None,
+                 budget=None):
         self._taskset = taskset
         self._trackHistory = trackHistory
         self._trackPreemptions = trackPreemptions
-        self._history = SimulationHistory()
+        self._fastKernel = fastKernel
+        self._detectCycles = detectCycles
+        self._eventQueueClass = eventQueueClass
+        self._lazyDeadlines = lazyDeadlines
+        self._checkpointInterval = checkpointInterval
+        self._snapshotInterval = snapshotInterval
+        self._snapshotHandler = snapshotHandler
+        self._counters = counters
+        self._tracer = tracer
+        self._budget = budget
+        self._liveSimulator = None
 
         if schedulingPolicy is None:
             self._schedulingPolicy = EDFSchedulingPolicy()
         else:
             self._schedulingPolicy = schedulingPolicy
 
-        self._createInitialState()
+        if history is None:
+            self._history = SimulationHistory()
+            self._createInitialState()
+        else:
+            self._history = history
 
         if aggregators is None:
             self._aggregators = tuple()
@@ -263,16 +657,45 @@ class Simulation:
             dmFilter = DeadlineMissFilter(False)
 
         historyDeadlineMiss = self._history.firstDeadlineMiss(dmFilter)
-        if historyDeadlineMiss is None:
-            state = self._history.getLastState(timeLimit)
-            newState = self._buildAndRunSimu(state, timeLimit, True)
-            return newState
-        else:
+        if historyDeadlineMiss is not None:
             return historyDeadlineMiss
+        state = self._history.getLastState(timeLimit)
+        if state.time < timeLimit and self._history.cycle() is None:
+            state = self._buildAndRunSimu(state, timeLimit, True)
+        return state
+
+    def iterEvents(self, until=DEFAULT_TIME_LIMIT):
+        """
+        Simulate the schedule from the first state of this simulation until
+        @p until, yielding its TraceRecords (see TraceKind) as the simulation
+        advances: the events executed, the jobs started or resumed, the
+        preemptions and the deadline misses.
+
+        Nothing is stored: the records of an instant are yielded once that
+        instant is simulated, and the simulation stops when the iteration
+        stops.
+        The history of this simulation is left untouched and its aggregators
+        are not fed.
+        """
+        tracer = SimulationTracer(kinds=_STREAM_TRACE_KINDS)
+        initState = self._history.firstState()
+        history = SimulationHistory()
+        history.addState(initState)
+        simulator = Simulator(self._taskset,
+                              history,
+                              initState,
+                              trackHistory=False,
+                              trackPreemptions=False,
+                              eventQueueClass=self._eventQueueClass,
+                              lazyDeadlines=self._lazyDeadlines,
+                              tracer=tracer)
+        for _ in simulator.steps(until):
+            yield from tracer.takeRecords()
+        yield from tracer.takeRecords()
 
     def getState(self, time):
         lastState = self._history.getLastState(time)
-        if lastState.time < time:
+        if lastState.time < time and self._history.cycle() is None:
             newState = self._buildAndRunSimu(lastState, time, False)
             return newState
         else:
@@ -298,22 +721,491 @@ class Simulation:
         self.getState(timeLimit)
         return len(self.deadlineMisses(timeLimit)) == 0
 
+    def fork(self, time, schedulingPolicy=None):
+        """
+        A new simulation that shares the schedule of this one until @p time
+        and continues it with @p schedulingPolicy (the same policy by
+        default).
+
+        The history of the fork starts with the states of this simulation
+        until @p time; these states are shared, not copied.
+        Only dual priority policies can be replaced, and the new policy must
+        give the same schedule as the current one until @p time included
+        (e.g. a promotion is changed but no waiting job is promoted
+        differently until then).
+        The aggregators of this simulation are not carried over.
+        """
+        state = self.getState(time)
+        if schedulingPolicy is None:
+            schedulingPolicy = self._schedulingPolicy
+        elif schedulingPolicy != self._schedulingPolicy:
+            state = self._stateWithPolicy(state, schedulingPolicy)
+        history = self._history.prefix(state.time)
+        history.addState(state)
+        return Simulation(self._taskset,
+                          schedulingPolicy,
+                          trackHistory=self._trackHistory,
+                          trackPreemptions=self._trackPreemptions,
+                          fastKernel=self._fastKernel,
+                          detectCycles=self._detectCycles,
+                          eventQueueClass=self._eventQueueClass,
+                          lazyDeadlines=self._lazyDeadlines,
+                          checkpointInterval=self._checkpointInterval,
+                          history=history)
+
+    @staticmethod
+    def _stateWithPolicy(state, policy):
+        schedulerState = state.scheduler
+        if not (isinstance(schedulerState, DualPrioritySchedulerState) and
+                isinstance(policy, DualPrioritySchedulingPolicy)):
+            logger.error('Cannot fork a simulation with %s using %s',
+                         schedulerState, policy)
+            raise ValueError
+        # The promotions of the waiting jobs follow the new policy.
+        jobStates = {(j.task, j.releaseIndex): j for j in state.jobs}
+        events = [e for e in state.events if type(e) is not StatePromotion]
+        for _, task, index in schedulerState.basicReadyEntries():
+            if policy.hasPromotion(task):
+                releaseTime = jobStates[task, index].releaseTime
+                promotionTime = releaseTime + policy.promotion(task)
+                if promotionTime >= state.time:
+                    events.append(StatePromotion(promotionTime, task, index))
+        return SimulatorState(state.time,
+                              state.jobs,
+                              events,
+                              state.deadlineMisses,
+                              preemptions=state.preemptions,
+                              scheduler=schedulerState.withPolicy(policy))
+
     def _buildAndRunSimu(self, initState, time, stopOnMiss):
+        simulator = self._liveSimulator
+        if simulator is not None and simulator.time == initState.time:
+            logger.debug('Continuing the simulation from %s', initState.time)
+            simulator.simulateTo(time, stopOnMiss=stopOnMiss)
+            return self._history.getLastState(time)
+        # Replaying a part of the simulation that was already simulated must
+        # not feed the aggregators a second time nor add checkpoints or
+        # snapshots.
+        replay = simulator is not None and initState.time < simulator.time
+        aggregators = None if replay else self._aggregators
+        checkpointInterval = None if replay else self._checkpointInterval
+        snapshotHandler = None if replay else self._snapshotHandler
+        if self._useFastKernel(initState):
+            initState = self._runFastKernel(initState,
+                                            time,
+                                            aggregators,
+                                            snapshotHandler)
+            if self._history.cycle() is not None:
+                return initState
+            if self._budget is not None and self._budget.exhausted():
+                self._history.addState(initState)
+                return initState
         simulator = Simulator(self._taskset,
                               self._history,
                               initState,
                               trackHistory=self._trackHistory,
                               trackPreemptions=self._trackPreemptions,
-                              statAggregators=self._aggregators)
+                              statAggregators=aggregators,
+                              detectCycles=self._detectCycles,
+                              eventQueueClass=self._eventQueueClass,
+                              lazyDeadlines=self._lazyDeadlines,
+                              checkpointInterval=checkpointInterval,
+                              snapshotInterval=self._snapshotInterval,
+                              snapshotHandler=snapshotHandler,
+                              counters=self._counters,
+                              tracer=self._tracer,
+                              budget=self._budget)
+        if not replay:
+            self._liveSimulator = simulator
         simulator.simulateTo(time, stopOnMiss=stopOnMiss)
         newState = self._history.getLastState(time)
         return newState
 
+    def _runFastKernel(self, initState, time, aggregators, snapshotHandler):
+        """
+        Run the FastSimulator from @p initState towards @p time, one snapshot
+        interval after the other when there is a @p snapshotHandler.
+
+        :return:    The idle state where the kernel stopped.
+        """
+        fastSimulator = FastSimulator(self._taskset,
+                                      initState,
+                                      statAggregators=aggregators,
+                                      detectCycles=self._detectCycles,
+                                      budget=self._budget)
+        simulateTo = fastSimulator.simulateTo
+        counters = self._counters
+        if counters is not None:
+            counters.countKernelRun()
+            if counters.timesPhases:
+                simulateTo = counters.timed(SimulationPhase.FastKernel,
+                                            simulateTo)
+        limit = initState.time
+        while True:
+            if snapshotHandler is None:
+                limit = time
+            else:
+                limit = min(time,
+                            nextSnapshotTime(limit, self._snapshotInterval))
+            state = simulateTo(limit)
+            if fastSimulator.cycle() is not None:
+                self._history.addState(state)
+                self._history.setCycle(fastSimulator.cycle())
+                return state
+            if (limit == time or
+                    fastSimulator.deadlineMissReached() or
+                    self._budget is not None and self._budget.exhausted()):
+                return state
+            # Without any idle instant in the interval, the next call
+            # simulates the same busy period again with a later limit.
+            if state is not initState:
+                snapshotHandler(state)
+                initState = state
+
+    def _useFastKernel(self, initState):
+        return (self._fastKernel and
+                self._checkpointInterval is None and
+                self._tracer is None and
+                not self._trackHistory and
+                not self._trackPreemptions and
+                FastSimulator.supports(self._taskset,
+                                       initState,
+                                       self._aggregators))
+
     def _createInitialState(self):
-        arrivals = [StateArrival(0, task, 0) for task in self._taskset]
-        scheduler = SchedulerFactory.fromPolicy(self._schedulingPolicy)
-        initState = SimulatorState(0,
-                                   [],
-                                   arrivals,
-                                   scheduler=scheduler.schedulerState())
+        initState = _initialState(self._taskset, self._schedulingPolicy)
         self._history.addState(initState)
+
+
+class SegmentedSimulation:
+    """
+    Simulation of a synchronous periodic taskset split into segments that are
+    simulated in parallel by a pool of @p nbProcesses processes.
+
+    The segments start at idle instants found from the processor demand (see
+    IdleInstantFinder): the schedule after such an instant only depends on
+    the time, so the segments are independent.
+    The deadline misses, the preemptions (with @p trackPreemptions) and the
+    @p aggregators of the segments are merged.
+    The history only contains the states kept by the segments; in these
+    states, the jobs completed in a previous segment have no last start time.
+
+    When the taskset is not supported or there is no idle instant to split
+    the simulation, it is simulated in a single segment.
+    """
+
+    def __init__(self,
+                 taskset,
+                 schedulingPolicy=None,
+                 trackPreemptions=False,
+                 aggregators=None,
+                 lazyDeadlines=False,
+                 nbProcesses=4,
+                 nbSegments=None):
+        self._taskset = taskset
+        self._trackPreemptions = trackPreemptions
+        self._lazyDeadlines = lazyDeadlines
+        self._nbProcesses = nbProcesses
+        if nbSegments is None:
+            self._nbSegments = nbProcesses
+        else:
+            self._nbSegments = nbSegments
+        self._history = SimulationHistory()
+
+        if schedulingPolicy is None:
+            self._schedulingPolicy = EDFSchedulingPolicy()
+        else:
+            self._schedulingPolicy = schedulingPolicy
+
+        if aggregators is None:
+            self._aggregators = tuple()
+        else:
+            self._aggregators = tuple(aggregators)
+
+    @property
+    def history(self):
+        return self._history
+
+    def simulateTo(self, time):
+        """
+        Simulate the taskset until @p time.
+
+        :return:    The state at @p time, as returned by
+                    Simulation.getState().
+        """
+        startTimes = [0] + self._splitTimes(time)
+        endTimes = startTimes[1:] + [time]
+        logger.info('Simulating %s segments starting at %s',
+                    len(startTimes),
+                    startTimes)
+        tags = [aggregator.key() for aggregator in self._aggregators]
+        segments = [(self._taskset,
+                     self._schedulingPolicy,
+                     self._segmentState(start),
+                     end,
+                     self._trackPreemptions,
+                     tags,
+                     self._lazyDeadlines)
+                    for start, end in zip(startTimes, endTimes)]
+        if self._nbProcesses > 1 and len(segments) > 1:
+            with Pool(self._nbProcesses) as pool:
+                results = pool.map(_simulateSegment, segments)
+        else:
+            results = [_simulateSegment(segment) for segment in segments]
+        for history, aggregators in results:
+            self._history.merge(history)
+            for aggregator, segmentAggregator in zip(self._aggregators,
+                                                     aggregators):
+                aggregator.merge(segmentAggregator)
+        return self._history.getLastState(time)
+
+    def deadlineMisses(self, timeLimit, **args):
+        return self._history.deadlineMisses(timeLimit, **args)
+
+    def preemptions(self, timeLimit, **args):
+        return self._history.preemptions(timeLimit, **args)
+
+    def _splitTimes(self, time):
+        """
+        The idle instants that split [0, @p time) into about
+        self._nbSegments segments of the same length.
+        """
+        if not IdleInstantFinder.supports(self._taskset):
+            return []
+        finder = IdleInstantFinder(self._taskset, self._schedulingPolicy)
+        if finder.busyPeriod is None:
+            return []
+        result = []
+        for index in range(1, self._nbSegments):
+            target = max(time * index // self._nbSegments, 1)
+            if result and target <= result[-1]:
+                continue
+            idleInstant = finder.idleInstantAfter(target)
+            if idleInstant >= time:
+                break
+            if not result or idleInstant > result[-1]:
+                result.append(idleInstant)
+        return result
+
+    def _segmentState(self, time):
+        """
+        The state at the idle instant @p time, before the releases of that
+        instant.
+
+        The completed jobs whose deadline is after @p time are still in the
+        state.
+        """
+        jobs = []
+        events = []
+        for task in self._taskset:
+            period = task.minimalInterArrivalTime
+            nextIndex = (time + period - 1) // period
+            events.append(StateArrival(task.arrivalTime(nextIndex),
+                                       task,
+                                       nextIndex))
+            index = nextIndex - 1
+            while (index >= 0 and
+                   task.arrivalTime(index) + task.deadline > time):
+                jobs.append(JobState(task, index, task.wcet))
+                events.append(StateDeadline(task.arrivalTime(index) +
+                                            task.deadline,
+                                            task,
+                                            index))
+                index -= 1
+        scheduler = SchedulerFactory.fromPolicy(self._schedulingPolicy)
+        return SimulatorState(time,
+                              jobs,
+                              events,
+                              scheduler=scheduler.schedulerState())
+
+
+class MultiPolicySimulation:
+    """
+    Simulation of one taskset under several scheduling policies, to compare
+    their schedulability.
+
+    Synchronous periodic tasksets with fixed preemption costs are simulated
+    in lockstep by a single LockstepSimulator, which processes the releases
+    once for all the policies; the other tasksets are simulated by one
+    Simulation per policy.
+    """
+
+    def __init__(self, taskset, schedulingPolicies):
+        self._taskset = taskset
+        self._schedulingPolicies = tuple(schedulingPolicies)
+
+    @property
+    def taskset(self):
+        return self._taskset
+
+    @property
+    def schedulingPolicies(self):
+        return self._schedulingPolicies
+
+    def firstDeadlineMisses(self, timeLimit, dmFilter=True):
+        """
+        The first deadline miss before @p timeLimit of a task matched by
+        @p dmFilter, for each scheduling policy (in the same order).
+
+        :return:    A list with one of the earliest deadline misses of each
+                    policy, or None for the policies without any.
+        """
+        if dmFilter is True:
+            dmFilter = DeadlineMissFilter(True)
+        elif dmFilter is False:
+            dmFilter = DeadlineMissFilter(False)
+
+        states = [_initialState(self._taskset, policy)
+                  for policy in self._schedulingPolicies]
+        if LockstepSimulator.supports(self._taskset, states):
+            simulator = LockstepSimulator(self._taskset, states, dmFilter)
+            return simulator.firstDeadlineMisses(timeLimit)
+        return [self._firstDeadlineMiss(policy, timeLimit, dmFilter)
+                for policy in self._schedulingPolicies]
+
+    def _firstDeadlineMiss(self, schedulingPolicy, timeLimit, dmFilter):
+        simulation = Simulation(self._taskset,
+                                schedulingPolicy,
+                                trackHistory=False,
+                                trackPreemptions=False)
+        if all(dmFilter.match(task) for task in self._taskset):
+            # Stopping at any deadline miss is enough.
+            simulation.firstDeadlineMiss(True, timeLimit)
+        else:
+            simulation.getState(timeLimit)
+        return simulation.history.firstDeadlineMiss(dmFilter)
+
+
+def _simulateSegment(segment):
+    (taskset,
+     schedulingPolicy,
+     state,
+     time,
+     trackPreemptions,
+     aggregatorTags,
+     lazyDeadlines) = segment
+    aggregators = [StatAggregator.createInstance(tag)
+                   for tag in aggregatorTags]
+    history = SimulationHistory()
+    history.addState(state)
+    simulation = Simulation(taskset,
+                            schedulingPolicy,
+                            trackHistory=False,
+                            trackPreemptions=trackPreemptions,
+                            aggregators=aggregators,
+                            lazyDeadlines=lazyDeadlines,
+                            history=history)
+    simulation.getState(time)
+    return simulation.history, aggregators
+
+
+class BatchSimulation:
+    """
+    Simulation of many tasksets, each with its own scheduling policy, to find
+    which ones miss a deadline.
+
+    The synchronous periodic tasksets with fixed preemption costs are
+    simulated together by a vectorised BatchSimulator, except the ones whose
+    simulation is much longer than the others (see
+    BatchSimulator.batchSize()); the other tasksets are simulated one by
+    one, by a pool of @p nbProcesses processes.
+    """
+
+    def __init__(self, tasksets, schedulingPolicies=None, nbProcesses=1):
+        self._tasksets = tuple(tasksets)
+        self._nbProcesses = nbProcesses
+        if schedulingPolicies is None:
+            self._schedulingPolicies = tuple(EDFSchedulingPolicy()
+                                             for _ in self._tasksets)
+        else:
+            self._schedulingPolicies = tuple(schedulingPolicies)
+        if len(self._schedulingPolicies) != len(self._tasksets):
+            logger.error('%s scheduling policies for %s tasksets',
+                         len(self._schedulingPolicies),
+                         len(self._tasksets))
+            raise ValueError('There must be one scheduling policy per '
+                             'taskset')
+
+    @property
+    def tasksets(self):
+        return self._tasksets
+
+    @property
+    def schedulingPolicies(self):
+        return self._schedulingPolicies
+
+    def firstDeadlineMisses(self, timeLimits):
+        """
+        The first deadline miss of each taskset before its time limit.
+
+        :param timeLimits:  A time limit for every taskset (in the same
+                            order) or a single time limit for all of them.
+        :return:    A list with one of the earliest deadline misses of each
+                    taskset, or None for the tasksets without any.
+        """
+        if isinstance(timeLimits, int):
+            timeLimits = [timeLimits] * len(self._tasksets)
+        else:
+            timeLimits = list(timeLimits)
+
+        results = [None] * len(self._tasksets)
+        supported = []
+        for index, (taskset, policy) in enumerate(
+                zip(self._tasksets, self._schedulingPolicies)):
+            if BatchSimulator.supports(taskset,
+                                       _initialState(taskset, policy)):
+                supported.append(index)
+        supported.sort(key=lambda i: BatchSimulator.workload(
+            self._tasksets[i], timeLimits[i]))
+        batchSize = BatchSimulator.batchSize(
+            BatchSimulator.workload(self._tasksets[i], timeLimits[i])
+            for i in supported)
+        batch = supported[:batchSize]
+        logger.info('Simulating %s tasksets in a batch, %s separately',
+                    len(batch),
+                    len(self._tasksets) - len(batch))
+
+        inBatch = set(batch)
+        separate = [index for index in range(len(self._tasksets))
+                    if index not in inBatch]
+        systems = [(self._tasksets[i],
+                    self._schedulingPolicies[i],
+                    timeLimits[i])
+                   for i in separate]
+        if self._nbProcesses != 1 and len(systems) > 1:
+            with Pool(self._nbProcesses) as pool:
+                misses = pool.map(_firstDeadlineMiss, systems)
+        else:
+            misses = [_firstDeadlineMiss(system) for system in systems]
+        for index, deadlineMiss in zip(separate, misses):
+            results[index] = deadlineMiss
+        if batch:
+            simulator = BatchSimulator(
+                [self._tasksets[i] for i in batch],
+                [_initialState(self._tasksets[i],
+                               self._schedulingPolicies[i])
+                 for i in batch])
+            misses = simulator.firstDeadlineMisses([timeLimits[i]
+                                                    for i in batch])
+            for index, deadlineMiss in zip(batch, misses):
+                results[index] = deadlineMiss
+        return results
+
+
+def _firstDeadlineMiss(system):
+    taskset, schedulingPolicy, timeLimit = system
+    simulation = Simulation(taskset,
+                            schedulingPolicy,
+                            trackHistory=False,
+                            trackPreemptions=False)
+    simulation.firstDeadlineMiss(True, timeLimit)
+    return simulation.history.firstDeadlineMiss()
+
+
+def _initialState(taskset, schedulingPolicy):
+    arrivals = [StateArrival(task.offset, task, 0) for task in taskset]
+    scheduler = SchedulerFactory.fromPolicy(schedulingPolicy)
+    return SimulatorState(0,
+                          [],
+                          arrivals,
+                          scheduler=scheduler.schedulerState())
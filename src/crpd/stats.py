@@ -1,7 +1,9 @@
 
 import logging
 from abc import ABC
+from collections import Counter
 from enum import Enum
+from time import perf_counter
 
 from .internals.events import Completion
 from .utils.eq import ValueEqual
@@ -33,6 +35,28 @@ class StatAggregator(ABC):
                   preemptions):
         raise NotImplementedError
 
+    def jobRetired(self, job):
+        """
+        Called when the completed @p job is removed from the simulation; the
+        last state that contained it may not show its completion.
+        """
+        pass
+
+    def mergeSummary(self, summary):
+        """
+        Account for a range of states that were simulated without being
+        created, as described by @p summary (see FastSimulator).
+        """
+        raise NotImplementedError
+
+    def merge(self, other):
+        """
+        Account for the states observed by @p other, an aggregator of the
+        same kind that observed another part of the simulation (see
+        SegmentedSimulation).
+        """
+        raise NotImplementedError
+
     def key(self):
         raise NotImplementedError
 
@@ -67,6 +91,20 @@ class LongestResponseTimeAggregator(StatAggregator):
                 if responseTime > currentMax:
                     self._longestResponseTimes[task] = responseTime
 
+    def mergeSummary(self, summary):
+        assert self.status == _AggregatorStatus.Active
+        for task, responseTime in summary.longestResponseTimes.items():
+            currentMax = self._longestResponseTimes.get(task, 0)
+            if responseTime > currentMax:
+                self._longestResponseTimes[task] = responseTime
+
+    def merge(self, other):
+        assert self.status == _AggregatorStatus.Active
+        for task, responseTime in other._longestResponseTimes.items():
+            if (task not in self._longestResponseTimes or
+                    responseTime > self._longestResponseTimes[task]):
+                self._longestResponseTimes[task] = responseTime
+
     def key(self):
         return AggregatorTag.LongestResponseTime
 
@@ -95,6 +133,14 @@ class PreemptionCountAggregator(StatAggregator):
         assert self.status == _AggregatorStatus.Active
         self._nbPreemptions += len(preemptions)
 
+    def mergeSummary(self, summary):
+        assert self.status == _AggregatorStatus.Active
+        self._nbPreemptions += summary.preemptionCount
+
+    def merge(self, other):
+        assert self.status == _AggregatorStatus.Active
+        self._nbPreemptions += other._nbPreemptions
+
     def key(self):
         return AggregatorTag.PreemptionCount
 
@@ -123,6 +169,14 @@ class PreemptionTimeAggregator(StatAggregator):
         for preemption in preemptions:
             self._preemptionTime += preemption.addedDebt
 
+    def mergeSummary(self, summary):
+        assert self.status == _AggregatorStatus.Active
+        self._preemptionTime += summary.preemptionTime
+
+    def merge(self, other):
+        assert self.status == _AggregatorStatus.Active
+        self._preemptionTime += other._preemptionTime
+
     def key(self):
         return AggregatorTag.PreemptionTime
 
@@ -139,6 +193,7 @@ class ExecutionTimeAggregator(StatAggregator):
     def __init__(self):
         super().__init__()
         self._jobProgress = {}
+        self._retiredProgress = 0
 
     def aggregate(self,
                   time,
@@ -157,16 +212,35 @@ class ExecutionTimeAggregator(StatAggregator):
             jobId = job.task, job.releaseIndex
             self._jobProgress[jobId] = job.progress()
 
+    def jobRetired(self, job):
+        self._jobProgress[(job.task, job.releaseIndex)] = job.progress()
+
+    def mergeSummary(self, summary):
+        assert self.status == _AggregatorStatus.Active
+        self._retiredProgress += summary.retiredProgress
+        self._jobProgress.update(summary.jobProgress)
+
+    def merge(self, other):
+        assert self.status == _AggregatorStatus.Active
+        # Completed jobs can be observed by both aggregators, with the same
+        # progress: the jobs carried over to the next segment have not
+        # reached their deadline at the end of the previous one, so they are
+        # counted by job rather than in the retired progress of either.
+        self._retiredProgress += other._retiredProgress
+        self._jobProgress.update(other._jobProgress)
+
     def key(self):
         return AggregatorTag.ExecutionTime
 
     def result(self):
         self.status = _AggregatorStatus.Inactive
-        return sum(self._jobProgress.values())
+        return self._totalProgress()
+
+    def _totalProgress(self):
+        return self._retiredProgress + sum(self._jobProgress.values())
 
     def __repr__(self):
-        return 'ExecutionTimeAggregator({})'.format(
-            sum(self._jobProgress.values()))
+        return 'ExecutionTimeAggregator({})'.format(self._totalProgress())
 
 
 class AggregatorTag(Enum):
@@ -212,3 +286,163 @@ class SimulationStatistics(ValueEqual):
     def nbOfPreemptions(self):
         preemptions = self._result.history.preemptions(timeLimit=self.time)
         return len(preemptions)
+
+
+class SimulationPhase(Enum):
+    Events = 0
+    Schedule = 1
+    FastForward = 2
+    History = 3
+    FastKernel = 4
+
+
+class SimulationCounters:
+    """
+    Counts the operations of the simulators of a simulation: events executed
+    and ignored (by event type), calls to the scheduler, preemptions, states
+    created, runs of the FastSimulator kernel and the largest sizes of the
+    event queue and of the set of ready jobs.
+
+    With @p timePhases, the time spent in each SimulationPhase is measured
+    too.
+    Counters of different simulations can be merged, as the simulation
+    runners do.
+    """
+
+    def __init__(self, timePhases=False):
+        super().__init__()
+        self._timePhases = timePhases
+        self._events = Counter()
+        self._ignoredEvents = Counter()
+        self._scheduleCalls = 0
+        self._preemptions = 0
+        self._states = 0
+        self._kernelRuns = 0
+        self._peakQueueSize = 0
+        self._peakReadyJobs = 0
+        self._phaseTimes = Counter()
+
+    @property
+    def timesPhases(self):
+        return self._timePhases
+
+    @property
+    def events(self):
+        """
+        The number of executed events of each type, by type name.
+        """
+        return dict(self._events)
+
+    @property
+    def ignoredEvents(self):
+        """
+        The number of cancelled events removed from the event queue, by type
+        name.
+        """
+        return dict(self._ignoredEvents)
+
+    @property
+    def ignoredCompletions(self):
+        return self._ignoredEvents['Completion']
+
+    @property
+    def scheduleCalls(self):
+        return self._scheduleCalls
+
+    @property
+    def preemptions(self):
+        return self._preemptions
+
+    @property
+    def states(self):
+        return self._states
+
+    @property
+    def kernelRuns(self):
+        return self._kernelRuns
+
+    @property
+    def peakQueueSize(self):
+        return self._peakQueueSize
+
+    @property
+    def peakReadyJobs(self):
+        return self._peakReadyJobs
+
+    @property
+    def phaseTimes(self):
+        """
+        The time spent in each SimulationPhase, in seconds (empty without
+        phase timing).
+        """
+        return dict(self._phaseTimes)
+
+    def countEvent(self, event):
+        self._events[type(event).__name__] += 1
+
+    def countIgnoredEvent(self, event):
+        self._ignoredEvents[type(event).__name__] += 1
+
+    def countSchedule(self, nbReadyJobs):
+        self._scheduleCalls += 1
+        if nbReadyJobs > self._peakReadyJobs:
+            self._peakReadyJobs = nbReadyJobs
+
+    def countPreemption(self):
+        self._preemptions += 1
+
+    def countState(self):
+        self._states += 1
+
+    def countKernelRun(self):
+        self._kernelRuns += 1
+
+    def sampleQueueSize(self, size):
+        if size > self._peakQueueSize:
+            self._peakQueueSize = size
+
+    def timed(self, phase, function):
+        """
+        Wrap @p function so that the time spent in its calls is added to
+        @p phase.
+        """
+        phaseTimes = self._phaseTimes
+
+        def timedFunction(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                phaseTimes[phase] += perf_counter() - start
+
+        return timedFunction
+
+    def merge(self, other):
+        """
+        Add the counters of @p other, from another simulation.
+        """
+        self._events.update(other._events)
+        self._ignoredEvents.update(other._ignoredEvents)
+        self._scheduleCalls += other._scheduleCalls
+        self._preemptions += other._preemptions
+        self._states += other._states
+        self._kernelRuns += other._kernelRuns
+        self._peakQueueSize = max(self._peakQueueSize, other._peakQueueSize)
+        self._peakReadyJobs = max(self._peakReadyJobs, other._peakReadyJobs)
+        self._phaseTimes.update(other._phaseTimes)
+
+    def __repr__(self):
+        formatStr = ('SimulationCounters(events={}, ignoredEvents={}, '
+                     'scheduleCalls={}, preemptions={}, states={}, '
+                     'kernelRuns={}, peakQueueSize={}, peakReadyJobs={}, '
+                     'phaseTimes={})')
+        return formatStr.format(self.events,
+                                self.ignoredEvents,
+                                self._scheduleCalls,
+                                self._preemptions,
+                                self._states,
+                                self._kernelRuns,
+                                self._peakQueueSize,
+                                self._peakReadyJobs,
+                                {phase.name: seconds for phase, seconds
+                                 in self._phaseTimes.items()})
@@ -0,0 +1,113 @@
+
+import logging
+from enum import Enum
+
+from .utils.eq import ValueEqual
+
+logger = logging.getLogger(__name__)
+
+
+class TraceKind(Enum):
+    """
+    The kinds of TraceRecord and the type of their subject.
+
+    Event:          An event popped from the event queue to be executed (a
+                    state event, e.g. StateArrival).
+    IgnoredEvent:   A cancelled event removed from the event queue (a state
+                    event).
+    AddedEvent:     An event added to the event queue (a state event).
+    Schedule:       A job starts or resumes its execution, preempting the
+                    running job if any (a ScheduleTransition of JobState,
+                    whose old job may be None).
+    Preemption:     A preemption and the debt it adds (a Preemption).
+    DeadlineMiss:   A deadline miss (a DeadlineMiss).
+    """
+    Event = 0
+    IgnoredEvent = 1
+    AddedEvent = 2
+    Schedule = 3
+    Preemption = 4
+    DeadlineMiss = 5
+
+
+class TraceRecord(ValueEqual):
+    """
+    What happened in a simulator at @p time, described by @p subject (see
+    TraceKind).
+    """
+
+    def __init__(self, kind, time, subject):
+        super().__init__()
+        self._kind = kind
+        self._time = time
+        self._subject = subject
+
+    @property
+    def kind(self):
+        return self._kind
+
+    @property
+    def time(self):
+        return self._time
+
+    @property
+    def subject(self):
+        return self._subject
+
+    def __repr__(self):
+        return 'TraceRecord(TraceKind.{}, {}, {})'.format(self._kind.name,
+                                                         self._time,
+                                                         self._subject)
+
+
+class SimulationTracer:
+    """
+    Receives the TraceRecords of the simulators it is given to (see
+    Simulation) and keeps them in order.
+
+    The simulators only produce records when they have a tracer: the traced
+    operations are replaced when the simulator is built, so the simulations
+    without tracer do not pay for the tracing.
+    Only the records of the TraceKinds in @p kinds (all by default) are
+    produced.
+    Redefine record() to handle the records otherwise.
+    """
+
+    def __init__(self, kinds=None):
+        super().__init__()
+        self._records = []
+        if kinds is None:
+            self._kinds = frozenset(TraceKind)
+        else:
+            self._kinds = frozenset(kinds)
+
+    @property
+    def records(self):
+        return tuple(self._records)
+
+    def traces(self, kind):
+        return kind in self._kinds
+
+    def takeRecords(self):
+        """
+        The records received since the last call, which are removed from the
+        tracer.
+        """
+        records = self._records
+        self._records = []
+        return records
+
+    def recordsOf(self, kind):
+        return [r for r in self._records if r.kind == kind]
+
+    def record(self, kind, time, subject):
+        self._records.append(TraceRecord(kind, time, subject))
+
+
+class LoggingTracer(SimulationTracer):
+    """
+    Logs the records at the DEBUG level instead of keeping them.
+    """
+
+    def record(self, kind, time, subject):
+        logger.debug('%s', TraceRecord(kind, time, subject))
@@ -44,6 +44,12 @@ class FileEnv:
             item = pickle.load(file)
         return item
 
+    def remove(self, key):
+        os.remove(self._filePath(key))
+        if self._manifest is not None:
+            self._manifest.remove(key)
+            self._manifest.flush()
+
     def keys(self):
         if self._manifest is None:
             raise NotImplementedError
@@ -112,6 +118,10 @@ class _FileManifest(ValueEqual):
         self._keySet.add(key)
         self._unsyncKeys.add(key)
 
+    def remove(self, key):
+        self._keySet.discard(key)
+        self._unsyncKeys.discard(key)
+
     def update(self):
         with open(self._filePath, 'a') as file:
             for fileKey in self._unsyncKeys:
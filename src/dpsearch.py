@@ -25,7 +25,7 @@ import logging
 import itertools
 
 from crpd.gen import TasksetGenerator, RandomValue, PeriodGenerator
-from crpd.sim import SimulationSetup, SimulationRun
+from crpd.sim import BatchSimulation, simulationHorizon
 from dualpriority.policies import (rmLaxityPromotions,
                                    fpRMResponseTimes,
                                    genLpViableTasks,
@@ -58,44 +58,43 @@ def genTasksets(nbTasksets, seed, periodInterval, nbTasks, uRange):
 
 def execFunction(taskset, lpvPrep):
     policy = rmLaxityPromotions(taskset, lpvPrep=lpvPrep)
-    if len(policy.promotedTasks()) > 0:
-        setup = SimulationSetup(taskset,
-                                taskset.hyperperiod,
-                                schedulingPolicy=policy,
-                                trackHistory=False,
-                                trackPreemptions=False)
-        result = SimulationRun(setup).result()
-        history = result.history
-    else:
-        history = True
-    return history, policy, taskset
+    return policy, taskset
 
 
 def multicoreLoop(tasksets, nbProcesses, disablePrep):
     failures = set()
     with ProcessPoolExecutor(max_workers=nbProcesses) as executor:
-        for result in executor.map(execFunction,
-                                   tasksets,
-                                   itertools.repeat(not disablePrep)):
-            history, policy, taskset = result
-            logging.info(taskset)
-            logging.info('Hyperperiod: {}'.format(taskset.hyperperiod))
-            logging.info('Utilization: {}'.format(taskset.utilization))
-            logging.info('Result policy: %s', policy)
-            if history is True:
-                logging.info('All LPV')
-            elif history.hasDeadlineMiss():
-                failures.add(taskset)
-                logging.warning('Deadline miss %s',
-                                history.firstDeadlineMiss())
-                logging.warning('For system %s', taskset)
-                logging.warning('With policy %s', policy)
-            else:
-                logging.info('OK')
-            if len(failures) > 0:
-                logging.info('Current number of failures: %d', len(failures))
-            else:
-                logging.info('No failures')
+        results = list(executor.map(execFunction,
+                                    tasksets,
+                                    itertools.repeat(not disablePrep)))
+    # The systems with promotions are simulated over a sufficient horizon
+    # (their hyperperiod), together when their horizons are close enough.
+    simulated = [index for index, (policy, _) in enumerate(results)
+                 if len(policy.promotedTasks()) > 0]
+    simulation = BatchSimulation([results[i][1] for i in simulated],
+                                 [results[i][0] for i in simulated],
+                                 nbProcesses=nbProcesses)
+    deadlineMisses = simulation.firstDeadlineMisses(
+        [simulationHorizon(results[i][1], results[i][0]) for i in simulated])
+    verdicts = dict(zip(simulated, deadlineMisses))
+    for index, (policy, taskset) in enumerate(results):
+        logging.info(taskset)
+        logging.info('Hyperperiod: {}'.format(taskset.hyperperiod))
+        logging.info('Utilization: {}'.format(taskset.utilization))
+        logging.info('Result policy: %s', policy)
+        if index not in verdicts:
+            logging.info('All LPV')
+        elif verdicts[index] is not None:
+            failures.add(taskset)
+            logging.warning('Deadline miss %s', verdicts[index])
+            logging.warning('For system %s', taskset)
+            logging.warning('With policy %s', policy)
+        else:
+            logging.info('OK')
+        if len(failures) > 0:
+            logging.info('Current number of failures: %d', len(failures))
+        else:
+            logging.info('No failures')
     return failures
 
 
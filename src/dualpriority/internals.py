@@ -33,7 +33,7 @@ def getHistory(taskset, policy, *stopTask):
     dmFilter = DeadlineMissFilter(False, *stopTask)
 
     setup = SimulationSetup(taskset,
-                            time=taskset.hyperperiod,
+                            time='auto',
                             deadlineMissFilter=dmFilter,
                             trackHistory=False,
                             trackPreemptions=False,
@@ -70,7 +70,7 @@ def baseRMRMPolicy(taskset):
 
 def findFirstDeadlineMiss(taskset, policy):
     setup = SimulationSetup(taskset,
-                            time=taskset.hyperperiod,
+                            time='auto',
                             schedulingPolicy=policy,
                             deadlineMissFilter=True,
                             trackHistory=False,
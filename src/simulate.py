@@ -89,7 +89,7 @@ def genSetups(file):
 def execFunction(setup):
     taskset, policy = setup
     setup = SimulationSetup(taskset,
-                            taskset.hyperperiod,
+                            'auto',
                             schedulingPolicy=policy,
                             trackHistory=False,
                             trackPreemptions=False)
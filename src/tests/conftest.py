@@ -5,3 +5,18 @@ def pytest_addoption(parser):
     parser.addoption("--runperf",
                      action="store_true",
                      help="run performance tests")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers",
+                            "perf: mark a test as a performance test (only "
+                            "run with --runperf)")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--runperf"):
+        return
+    skipPerf = pytest.mark.skip(reason="need --runperf option to run")
+    for item in items:
+        if "perf" in item.keywords:
+            item.add_marker(skipPerf)
@@ -1,14 +1,17 @@
 
+import logging
+import time
+
 import pytest
 
 from crpd.model import LogPreemptionCost
-from crpd.gen import TasksetGenerator, RandomValue
-from crpd.stats import AggregatorTag, SimulationStatistics
-from crpd.sim import SimulationSetup, SimulationRun
+from crpd.gen import TasksetGenerator, RandomValue, PeriodGenerator
+from crpd.stats import (AggregatorTag,
+                        SimulationStatistics,
+                        SimulationCounters)
+from crpd.sim import SimulationSetup, SimulationRun, Simulation
 
-perf = pytest.mark.skipif(
-    not pytest.config.getoption("--runperf"),
-    reason="need --runperf option to run")
+perf = pytest.mark.perf
 
 
 def genSetups(nbTasksets, aggregators):
@@ -58,3 +61,39 @@ def test_simulationWithoutAggregators():
     for setup in genSetups(50, aggregators):
         run = SimulationRun(setup)
         run.execute()
+
+
+@perf
+def test_eventQueues():
+    preemptionCost = RandomValue(
+        generator=lambda: LogPreemptionCost(3, 0.1))
+    # TasksetGenerator takes its periods from a PeriodGenerator: with the
+    # same period for all the tasks, 100 tasks cannot be generated.
+    periodGenerator = PeriodGenerator(
+        randomValue=RandomValue(logRange=(10, 1000)))
+    for nbTasks in (3, 10, 30, 100):
+        gen = TasksetGenerator(seed=1337,
+                               scale=100,
+                               nbTasks=RandomValue(value=nbTasks),
+                               periodGenerator=periodGenerator,
+                               preemptionCost=preemptionCost,
+                               utilization=RandomValue(floatrange=(0.6, 0.9)))
+        taskset = gen()
+        # The fast kernel does not go through the event queue.
+        counters = SimulationCounters()
+        sim = Simulation(taskset,
+                         trackHistory=False,
+                         trackPreemptions=False,
+                         fastKernel=False,
+                         counters=counters)
+        start = time.perf_counter()
+        sim.getState(1000000)
+        duration = time.perf_counter() - start
+        nbEvents = (sum(counters.events.values()) +
+                    sum(counters.ignoredEvents.values()))
+        assert nbEvents > 0
+        logging.info('%s tasks: %.3fs, %s events, %.2fus/event',
+                     nbTasks,
+                     duration,
+                     nbEvents,
+                     duration / nbEvents * 1e6)
@@ -1,18 +1,37 @@
 
 import logging
+import pickle
+import pytest
 
 from crpd.model import (Taskset, Task, FixedArrivalDistribution,
                         PoissonArrivalDistribution, FixedPreemptionCost,
-                        LogPreemptionCost)
+                        LogPreemptionCost, OffsetArrivalDistribution)
 from crpd.policy import (RMSchedulingPolicy,
                          EDFSchedulingPolicy,
-                         DualPrioritySchedulingPolicy)
-from crpd.sim import Simulation, SimulationSetup
-from crpd.stats import AggregatorTag
+                         FixedPrioritySchedulingPolicy,
+                         DualPrioritySchedulingPolicy,
+                         DualPriorityTaskInfo)
+from crpd.sim import (Simulation, SimulationSetup, SegmentedSimulation,
+                      MultiPolicySimulation, BatchSimulation,
+                      simulationHorizon)
+from crpd.stats import AggregatorTag, StatAggregator, SimulationPhase
 from crpd.hist import (SimulatorState, JobState, StateCompletion,
                        StateArrival, StateDeadline, EDFSchedulerState,
-                       DeadlineMiss, Preemption, RMSchedulerState)
-from crpd.runner import SimulationRun
+                       DeadlineMiss, Preemption, RMSchedulerState,
+                       StatePromotion, DeadlineMissFilter,
+                       DualPrioritySchedulerState,
+                       FixedPrioritySchedulerState,
+                       ScheduleCycle)
+from crpd.runner import SimulationRun, simulationRunner
+from crpd.trace import SimulationTracer, TraceKind
+from crpd.internals.simulator import HeapEventQueue
+from crpd.internals.events import Completion
+from crpd.internals.jobs import Job, JobManager
+from crpd.internals.sched import (DualPriorityScheduler, EDFScheduler,
+                                  StaticDualPriorityScheduler)
+from crpd.internals.batchsim import BatchSimulator
+from crpd.internals.cycles import RepetitionFinder
+from crpd.utils.persistence import FileEnv
 
 
 def test_simuError2():
@@ -126,11 +145,9 @@ def test_noTracking():
                                JobState(t1, 13)],
                               [StateCompletion(25, t1, 12),
                                StateDeadline(40, t2, 1),
-                               StateCompletion(31, t2, 1),
                                StateArrival(26, t1, 13),
                                StateDeadline(26, t1, 12),
-                               StateArrival(40, t2, 2),
-                               StateCompletion(32, t2, 1)],
+                               StateArrival(40, t2, 2)],
                               scheduler=RMSchedulerState((t1, 12), (t2, 1)))
     assert state == expected
 
@@ -153,11 +170,9 @@ def test_rmMultiple():
                                JobState(t1, 13)],
                               [StateCompletion(25, t1, 12),
                                StateDeadline(40, t2, 1),
-                               StateCompletion(31, t2, 1),
                                StateArrival(26, t1, 13),
                                StateDeadline(26, t1, 12),
-                               StateArrival(40, t2, 2),
-                               StateCompletion(32, t2, 1)],
+                               StateArrival(40, t2, 2)],
                               scheduler=RMSchedulerState((t1, 12), (t2, 1)))
     assert(state == expected)
 
@@ -268,7 +283,7 @@ def test_simulateToDeadlineMiss():
     expected = SimulatorState(50,
                               [JobState(t2, 16),
                                JobState(t1, 2),
-                               JobState(t1, 0, 16, lastStart=48),
+                               JobState(t1, 0, 18, lastStart=50),
                                JobState(t1, 1),
                                JobState(t2, 17)],
                               [StateArrival(100, t1, 2),
@@ -345,8 +360,7 @@ def test_preemptionInState():
                       StateDeadline(50, longTask, 0),
                       StateArrival(50, longTask, 1),
                       StateArrival(18, shortTask, 2),
-                      StateCompletion(10, shortTask, 1),
-                      StateCompletion(21, longTask, 0)]
+                      StateCompletion(10, shortTask, 1)]
     expectedPreemptions = [Preemption(9, longTask, 0, shortTask, 1)]
     expectedScheduler = EDFSchedulerState((18, shortTask, 1), (50, longTask, 0))
     expected = SimulatorState(preemptTime,
@@ -398,7 +412,6 @@ def test_simuLogPreemptionCostTwoTasks():
     expectedEvents1 = [StateDeadline(50, longTask, 0),
                        StateDeadline(18, shortTask, 1),
                        StateCompletion(10, shortTask, 1),
-                       StateCompletion(21, longTask, 0),
                        StateArrival(18, shortTask, 2),
                        StateArrival(50, longTask, 1)]
     expectedScheduler1 = EDFSchedulerState((18, shortTask, 1),
@@ -451,7 +464,6 @@ def test_simuPreemptionCostTwoTasks():
     expectedEvents1 = [StateDeadline(50, longTask, 0),
                        StateDeadline(18, shortTask, 1),
                        StateCompletion(10, shortTask, 1),
-                       StateCompletion(21, longTask, 0),
                        StateArrival(18, shortTask, 2),
                        StateArrival(50, longTask, 1)]
     expectedScheduler1 = EDFSchedulerState((18, shortTask, 1),
@@ -787,3 +799,915 @@ def test_simuAndResumeLong():
 
     assert(sim.noDeadlineMiss(time2))
     assert(expected113 == state113)
+
+
+def _runWithKernel(taskset, policy, time, fastKernel):
+    tags = [AggregatorTag.PreemptionTime,
+            AggregatorTag.PreemptionCount,
+            AggregatorTag.ExecutionTime,
+            AggregatorTag.LongestResponseTime]
+    aggregators = [StatAggregator.createInstance(tag) for tag in tags]
+    sim = Simulation(taskset,
+                     policy,
+                     trackHistory=False,
+                     trackPreemptions=False,
+                     aggregators=aggregators,
+                     fastKernel=fastKernel)
+    state = sim.getState(time)
+    return state, [aggregator.result() for aggregator in aggregators]
+
+
+def test_fastKernelRM():
+    a = Task(3, 9, FixedArrivalDistribution(9), FixedPreemptionCost(1),
+             displayName='a')
+    b = Task(12, 18, FixedArrivalDistribution(27), displayName='b')
+    taskset = Taskset(a, b)
+    for time in (18, 45, 53, 200):
+        reference = _runWithKernel(taskset, RMSchedulingPolicy(), time, False)
+        fast = _runWithKernel(taskset, RMSchedulingPolicy(), time, True)
+        assert fast == reference
+
+
+def test_fastKernelEDF():
+    t1 = Task(1, 5, FixedArrivalDistribution(5), FixedPreemptionCost(1),
+              displayName='t1')
+    t2 = Task(2, 7, FixedArrivalDistribution(8), FixedPreemptionCost(2),
+              displayName='t2')
+    t3 = Task(4, 20, FixedArrivalDistribution(20), displayName='t3')
+    taskset = Taskset(t1, t2, t3)
+    reference = _runWithKernel(taskset, EDFSchedulingPolicy(), 337, False)
+    fast = _runWithKernel(taskset, EDFSchedulingPolicy(), 337, True)
+    assert fast == reference
+
+
+def test_fastKernelDualPriority():
+    t1 = Task(3, 8, FixedArrivalDistribution(8), displayName='t1')
+    t2 = Task(4, 12, FixedArrivalDistribution(12), displayName='t2')
+    t3 = Task(5, 24, FixedArrivalDistribution(24), displayName='t3')
+    taskset = Taskset(t1, t2, t3)
+    policy = DualPrioritySchedulingPolicy(
+          (t1, DualPriorityTaskInfo(3, 5, -3)),
+          (t2, DualPriorityTaskInfo(2, 8, -2)),
+          (t3, DualPriorityTaskInfo(1)))
+    reference = _runWithKernel(taskset, policy, 300, False)
+    fast = _runWithKernel(taskset, policy, 300, True)
+    assert fast == reference
+
+
+def test_fastKernelDeadlineMiss():
+    t1 = Task(5, 10, FixedArrivalDistribution(10), FixedPreemptionCost(1),
+              displayName='t1')
+    t2 = Task(6, 12, FixedArrivalDistribution(12), FixedPreemptionCost(1),
+              displayName='t2')
+    taskset = Taskset(t1, t2)
+    results = []
+    for fastKernel in (False, True):
+        sim = Simulation(taskset,
+                         RMSchedulingPolicy(),
+                         trackHistory=False,
+                         trackPreemptions=False,
+                         fastKernel=fastKernel)
+        results.append(sim.firstDeadlineMiss(timeLimit=500))
+    assert results[0] is not None
+    assert results[0] == results[1]
+
+
+def test_idleFastForward():
+    t1 = Task(2, 97, PoissonArrivalDistribution(97, 5, seed=1),
+              displayName='t1')
+    t2 = Task(3, 131, FixedArrivalDistribution(131), LogPreemptionCost(1, 0.1),
+              displayName='t2')
+    t3 = Task(5, 1009, FixedArrivalDistribution(1009), displayName='t3')
+    taskset = Taskset(t1, t2, t3)
+    endTime = 20000
+    states = []
+    for trackHistory in (True, False):
+        sim = Simulation(taskset,
+                         EDFSchedulingPolicy(),
+                         trackHistory=trackHistory,
+                         trackPreemptions=False,
+                         fastKernel=False)
+        states.append(sim.getState(endTime))
+    assert states[0] == states[1]
+
+
+def test_cycleDetection():
+    t1 = Task(2, 5, FixedArrivalDistribution(5), FixedPreemptionCost(1),
+              displayName='t1')
+    t2 = Task(3, 7, FixedArrivalDistribution(7), FixedPreemptionCost(1),
+              displayName='t2')
+    taskset = Taskset(t1, t2)
+    for fastKernel in (True, False):
+        sim = Simulation(taskset,
+                         EDFSchedulingPolicy(),
+                         trackHistory=False,
+                         trackPreemptions=False,
+                         fastKernel=fastKernel,
+                         detectCycles=True)
+        state = sim.getState(100000)
+        cycle = sim.history.cycle()
+        assert cycle is not None
+        assert cycle.length == taskset.hyperperiod
+        assert state.time == cycle.end
+        assert sim.noDeadlineMiss(100000)
+
+
+def test_cycleDetectionWithOffsets():
+    # The schedule of t1 alone repeats every 4 until t2 starts at 30, after
+    # the first hyperperiod.
+    t1 = Task(2, 4, OffsetArrivalDistribution(4, 0), FixedPreemptionCost(1),
+              displayName='t1')
+    t2 = Task(3, 6, OffsetArrivalDistribution(6, 30), FixedPreemptionCost(1),
+              displayName='t2')
+    taskset = Taskset(t1, t2)
+    sim = Simulation(taskset,
+                     EDFSchedulingPolicy(),
+                     trackPreemptions=False,
+                     detectCycles=True)
+    state = sim.getState(100000)
+    cycle = sim.history.cycle()
+    assert cycle is not None
+    assert cycle.start >= 30
+    assert cycle.length % taskset.hyperperiod == 0
+    assert state.time == cycle.end
+    assert sim.noDeadlineMiss(100000)
+
+    t3 = Task(3, 4, OffsetArrivalDistribution(4, 30), displayName='t3')
+    overloaded = Taskset(t1, t3)
+    sim = Simulation(overloaded,
+                     EDFSchedulingPolicy(),
+                     trackPreemptions=False,
+                     detectCycles=True)
+    sim.getState(100)
+    assert not sim.noDeadlineMiss(100)
+
+
+def test_cycleDetectionSetup():
+    t1 = Task(2, 5, FixedArrivalDistribution(5), LogPreemptionCost(1, 0.1),
+              displayName='t1')
+    t2 = Task(3, 7, FixedArrivalDistribution(7), FixedPreemptionCost(1),
+              displayName='t2')
+    t3 = Task(1, 20, FixedArrivalDistribution(20), displayName='t3')
+    taskset = Taskset(t1, t2, t3)
+    setup = SimulationSetup(taskset,
+                            time=100 * taskset.hyperperiod,
+                            schedulingPolicy=RMSchedulingPolicy(),
+                            deadlineMissFilter=True,
+                            detectCycles=True)
+    history = SimulationRun(setup).result().history
+    assert history.cycle() is not None
+    assert history.lastTime() == history.cycle().end
+    assert not history.hasDeadlineMiss()
+    assert history.lastTime() < 100 * taskset.hyperperiod
+
+
+def test_repetitionFinder():
+    # The fingerprints 0..9 then 10, 11, 12 forever, one instant every 3
+    # time units: the finder keeps one fingerprint but finds the period.
+    finder = RepetitionFinder()
+    cycle = None
+    step = 0
+    while cycle is None and step < 100:
+        if step < 10:
+            fingerprint = step
+        else:
+            fingerprint = 10 + (step - 10) % 3
+        cycle = finder.record(3 * step, fingerprint)
+        step += 1
+    assert cycle is not None
+    assert cycle.length == 9
+    assert cycle.start >= 30
+    assert cycle.end < 2 * (30 + 9)
+    # A resumed simulation records its first instant again.
+    finder = RepetitionFinder()
+    assert finder.record(0, 'a') is None
+    assert finder.record(0, 'a') is None
+    assert finder.record(5, 'a') == ScheduleCycle(0, 5)
+
+
+def test_cancelledCompletions():
+    task = Task(1, 1000, FixedArrivalDistribution(1000), displayName='t')
+    queue = HeapEventQueue()
+    completions = [Completion(i, Job(task, i)) for i in range(200)]
+    for completion in completions:
+        queue.addEvent(completion)
+    for completion in completions[:150]:
+        queue.cancel(completion)
+    assert queue.nbCompactions() == 1
+    assert queue.nbDeadEvents() < len(queue) / 2
+    assert len(list(queue.events())) == 50
+    assert queue.effectiveTop() is completions[150]
+    assert queue.nbDeadEvents() == 0
+
+
+def test_lazyDeadlines():
+    t1 = Task(2, 5, FixedArrivalDistribution(5), FixedPreemptionCost(1),
+              displayName='t1')
+    t2 = Task(3, 8, FixedArrivalDistribution(10), displayName='t2')
+    t3 = Task(4, 20, FixedArrivalDistribution(20), displayName='t3')
+    taskset = Taskset(t1, t2, t3)
+    endTime = 95
+    sim = Simulation(taskset, RMSchedulingPolicy())
+    lazySim = Simulation(taskset, RMSchedulingPolicy(), lazyDeadlines=True)
+    state = sim.getState(endTime)
+    lazyState = lazySim.getState(endTime)
+    assert state.time == lazyState.time
+    assert frozenset(state.jobs) == frozenset(lazyState.jobs)
+    deadlineTasks = set(e.task for e in lazyState.events
+                        if isinstance(e, StateDeadline))
+    assert deadlineTasks == {t2}
+    assert sim.deadlineMisses(endTime) == lazySim.deadlineMisses(endTime)
+
+    t4 = Task(5, 6, FixedArrivalDistribution(6), displayName='t4')
+    overloaded = Taskset(t1, t4)
+    sim = Simulation(overloaded, EDFSchedulingPolicy(), trackHistory=False)
+    lazySim = Simulation(overloaded,
+                         EDFSchedulingPolicy(),
+                         trackHistory=False,
+                         lazyDeadlines=True)
+    miss = sim.firstDeadlineMiss(timeLimit=endTime)
+    lazyMiss = lazySim.firstDeadlineMiss(timeLimit=endTime)
+    assert miss.time == lazyMiss.time
+    assert miss.deadlineMisses == lazyMiss.deadlineMisses
+    assert miss.deadlineMisses
+
+
+def test_promotionEvents():
+    t1 = Task(3, 8, FixedArrivalDistribution(8), displayName='t1')
+    t2 = Task(4, 12, FixedArrivalDistribution(12), displayName='t2')
+    t3 = Task(5, 24, FixedArrivalDistribution(24), displayName='t3')
+    taskset = Taskset(t1, t2, t3)
+    policy = DualPrioritySchedulingPolicy(
+          (t1, DualPriorityTaskInfo(3, 5, -3)),
+          (t2, DualPriorityTaskInfo(2, 8, -2)),
+          (t3, DualPriorityTaskInfo(1)))
+    sim = Simulation(taskset, policy, fastKernel=False)
+    sim.getState(240)
+    history = sim.history.frozen()
+    nbPromotions = 0
+    for time in history.stateTimes():
+        state = history[time]
+        waitingJobs = set(state.scheduler.readyEntries)
+        for event in state.events:
+            if isinstance(event, StatePromotion):
+                assert (event.task, event.releaseIndex) in waitingJobs
+                nbPromotions += 1
+    assert nbPromotions > 0
+    assert not history.hasDeadlineMiss()
+
+
+def test_successiveQueries():
+    t1 = Task(12, 51, FixedArrivalDistribution(51), LogPreemptionCost(1, 0.1),
+              displayName='t1')
+    t2 = Task(1, 1, FixedArrivalDistribution(3), displayName='t2')
+    taskset = Taskset(t1, t2)
+    policy = DualPrioritySchedulingPolicy((t1, DualPriorityTaskInfo(2)),
+                                          (t2, DualPriorityTaskInfo(1, 0, -1)))
+    stepped = Simulation(taskset,
+                         policy,
+                         trackHistory=False,
+                         trackPreemptions=False)
+    for time in (47, 277, 368, 529):
+        oneShot = Simulation(taskset,
+                             policy,
+                             trackHistory=False,
+                             trackPreemptions=False)
+        assert stepped.getState(time) == oneShot.getState(time)
+    assert stepped.noDeadlineMiss(529)
+    # Without a deadline miss, the state at the time limit is returned
+    # whether the history already reaches it or not.
+    state = stepped.firstDeadlineMiss(timeLimit=700)
+    assert state.time == 700
+    assert stepped.firstDeadlineMiss(timeLimit=700) == state
+    assert stepped.firstDeadlineMiss(timeLimit=529) == stepped.getState(529)
+
+
+def test_checkpoints():
+    t1 = Task(4, 16, FixedArrivalDistribution(18), displayName='t1')
+    t2 = Task(5, 32, preemptionCost=FixedPreemptionCost(2), displayName='t2')
+    taskset = Taskset(t1, t2)
+    policy = DualPrioritySchedulingPolicy((t1, DualPriorityTaskInfo(1, 12, -2)),
+                                          (t2, DualPriorityTaskInfo(2, 31, -1)))
+    simulation = Simulation(taskset,
+                            policy,
+                            trackHistory=False,
+                            trackPreemptions=False,
+                            checkpointInterval=41)
+    simulation.getState(777)
+    stateTimes = simulation.history.frozen().stateTimes()
+    nbMisses = len(simulation.deadlineMisses(777))
+    assert len(stateTimes) <= 777 // 41 + nbMisses + 2
+    assert {time // 41 for time in stateTimes} == set(range(777 // 41 + 1))
+    # A state kept at a checkpoint comes after the events of its instant, as
+    # in a tracked history.
+    queryTimes = set(range(1, 777, 7)) - set(stateTimes)
+    for time in sorted(queryTimes, reverse=True):
+        oneShot = Simulation(taskset,
+                             policy,
+                             trackHistory=False,
+                             trackPreemptions=False)
+        assert simulation.getState(time) == oneShot.getState(time)
+
+
+def test_fork():
+    t1 = Task(4, 16, FixedArrivalDistribution(18), displayName='t1')
+    t2 = Task(5, 32, preemptionCost=FixedPreemptionCost(2), displayName='t2')
+    taskset = Taskset(t1, t2)
+    policy = DualPrioritySchedulingPolicy((t1, DualPriorityTaskInfo(1, 12, -2)),
+                                          (t2, DualPriorityTaskInfo(2, 31, -1)))
+    # Both policies give the same schedule until time 37.
+    newPolicy = policy.withUpdate((t2, DualPriorityTaskInfo(2, 5, -1)))
+    simulation = Simulation(taskset, policy)
+    simulation.getState(100)
+    fork = simulation.fork(36, newPolicy)
+    assert fork.history[18] is simulation.history[18]
+    expected = Simulation(taskset, newPolicy)
+    assert fork.getState(777) == expected.getState(777)
+    assert fork.preemptions(777) == expected.preemptions(777)
+    assert simulation.getState(777) == Simulation(taskset, policy).getState(777)
+
+
+class _InterruptedRun(Exception):
+    pass
+
+
+class _InterruptingEnv(FileEnv):
+
+    def __init__(self, rootPath, nbSaves):
+        super().__init__(rootPath)
+        self.nbSaves = nbSaves
+
+    def save(self, item, key, timedKey=False):
+        super().save(item, key, timedKey)
+        self.nbSaves -= 1
+        if self.nbSaves == 0:
+            raise _InterruptedRun
+
+
+def test_snapshots(tmpdir):
+    t1 = Task(3, 10, FixedArrivalDistribution(10),
+              FixedPreemptionCost(1), displayName='t1')
+    t2 = Task(7, 35, FixedArrivalDistribution(35),
+              FixedPreemptionCost(1), displayName='t2')
+    t3 = Task(20, 97, PoissonArrivalDistribution(97, 5, seed=2),
+              LogPreemptionCost(1, 0.1), displayName='t3')
+    setups = [SimulationSetup(Taskset(t1, t2, Task(20, 97)),
+                              time=5000,
+                              schedulingPolicy=RMSchedulingPolicy(),
+                              aggregatorTags=list(AggregatorTag)),
+              SimulationSetup(Taskset(t1, t2, t3),
+                              time=5000,
+                              aggregatorTags=list(AggregatorTag))]
+    for index, setup in enumerate(setups):
+        key = 'snapshot{}'.format(index)
+        expected = SimulationRun(setup, errorHandling=False)
+        interrupted = SimulationRun(setup,
+                                    errorHandling=False,
+                                    snapshotEnv=_InterruptingEnv(str(tmpdir),
+                                                                 3),
+                                    snapshotKey=key,
+                                    snapshotInterval=1000)
+        with pytest.raises(_InterruptedRun):
+            interrupted.result()
+        env = FileEnv(str(tmpdir))
+        assert env.load(key).state.time >= 2000
+        resumed = SimulationRun(setup,
+                                errorHandling=False,
+                                snapshotEnv=env,
+                                snapshotKey=key,
+                                snapshotInterval=1000)
+        for tag in AggregatorTag:
+            assert (resumed.result().aggregateStat(tag) ==
+                    expected.result().aggregateStat(tag))
+        assert resumed.getState(5000) == expected.getState(5000)
+        with pytest.raises(FileNotFoundError):
+            env.load(key)
+
+
+def test_segmentedSimulation():
+    t1 = Task(3, 10, FixedArrivalDistribution(10),
+              FixedPreemptionCost(1), displayName='t1')
+    t2 = Task(7, 35, FixedArrivalDistribution(35),
+              FixedPreemptionCost(1), displayName='t2')
+    t3 = Task(20, 90, FixedArrivalDistribution(97),
+              FixedPreemptionCost(2), displayName='t3')
+    taskset = Taskset(t1, t2, t3)
+    policy = DualPrioritySchedulingPolicy((t1, DualPriorityTaskInfo(1)),
+                                          (t2, DualPriorityTaskInfo(3, 20, -1)),
+                                          (t3, DualPriorityTaskInfo(2)))
+    aggregators = [StatAggregator.createInstance(tag)
+                   for tag in AggregatorTag]
+    simulation = Simulation(taskset,
+                            policy,
+                            trackHistory=False,
+                            trackPreemptions=True,
+                            aggregators=aggregators)
+    simulation.getState(20000)
+    segmentedAggregators = [StatAggregator.createInstance(tag)
+                            for tag in AggregatorTag]
+    segmented = SegmentedSimulation(taskset,
+                                    policy,
+                                    trackPreemptions=True,
+                                    aggregators=segmentedAggregators,
+                                    nbProcesses=2,
+                                    nbSegments=4)
+    segmented.simulateTo(20000)
+    assert len(segmented.history.frozen().stateTimes()) > 4
+    assert (segmented.preemptions(20000) ==
+            simulation.preemptions(20000))
+    assert (segmented.deadlineMisses(20000) ==
+            simulation.deadlineMisses(20000))
+    for aggregator, segmentedAggregator in zip(aggregators,
+                                               segmentedAggregators):
+        assert segmentedAggregator.result() == aggregator.result()
+
+
+def test_segmentedExecutionTime():
+    # The jobs of t2 and t3 complete before their deadline, which is after
+    # their next release: the jobs completed before a split instant are
+    # carried over to the next segment. All the jobs complete, the execution
+    # time is the whole demand.
+    t1 = Task(4, 4, FixedArrivalDistribution(10),
+              FixedPreemptionCost(0), displayName='t1')
+    t2 = Task(2, 34, FixedArrivalDistribution(12),
+              FixedPreemptionCost(0), displayName='t2')
+    t3 = Task(2, 20, FixedArrivalDistribution(8),
+              FixedPreemptionCost(0), displayName='t3')
+    taskset = Taskset(t1, t2, t3)
+    for nbSegments in [1, 2, 4, 7]:
+        aggregator = StatAggregator.createInstance(AggregatorTag.ExecutionTime)
+        segmented = SegmentedSimulation(taskset,
+                                        aggregators=[aggregator],
+                                        nbProcesses=1,
+                                        nbSegments=nbSegments)
+        segmented.simulateTo(360)
+        assert not segmented.deadlineMisses(360)
+        assert aggregator.result() == 294
+
+
+def test_multiPolicySimulation():
+    t1 = Task(2, 5, FixedArrivalDistribution(5),
+              FixedPreemptionCost(1), displayName='t1')
+    t2 = Task(4, 9, FixedArrivalDistribution(9),
+              FixedPreemptionCost(1), displayName='t2')
+    t3 = Task(3, 14, FixedArrivalDistribution(14),
+              FixedPreemptionCost(1), displayName='t3')
+    taskset = Taskset(t1, t2, t3)
+    policies = [RMSchedulingPolicy(),
+                EDFSchedulingPolicy(),
+                DualPrioritySchedulingPolicy(
+                    (t1, DualPriorityTaskInfo(3, 1, -3)),
+                    (t2, DualPriorityTaskInfo(2, 4, -2)),
+                    (t3, DualPriorityTaskInfo(1, 10, -1)))]
+    dmFilters = [True,
+                 DeadlineMissFilter(False, t1),
+                 DeadlineMissFilter(False, t2, t3)]
+    for dmFilter in dmFilters:
+        simulation = MultiPolicySimulation(taskset, policies)
+        deadlineMisses = simulation.firstDeadlineMisses(500, dmFilter)
+        assert len(deadlineMisses) == len(policies)
+        for policy, deadlineMiss in zip(policies, deadlineMisses):
+            reference = Simulation(taskset,
+                                   policy,
+                                   trackHistory=False,
+                                   trackPreemptions=False)
+            reference.getState(500)
+            expected = reference.history.firstDeadlineMiss(dmFilter)
+            if expected is None:
+                assert deadlineMiss is None
+            else:
+                assert deadlineMiss.time == expected.time
+
+
+def test_batchSimulation():
+    tasksets = []
+    policies = []
+    for index in range(120):
+        t1 = Task(2 + index % 3, 8, FixedArrivalDistribution(8),
+                  FixedPreemptionCost(index % 2))
+        t2 = Task(3 + index % 5, 12 + index % 7,
+                  FixedArrivalDistribution(12 + index % 7),
+                  FixedPreemptionCost(1))
+        t3 = Task(2 + index % 4, 15, FixedArrivalDistribution(20),
+                  FixedPreemptionCost(0))
+        tasksets.append(Taskset(t1, t2, t3))
+        if index % 3 == 0:
+            policies.append(RMSchedulingPolicy())
+        elif index % 3 == 1:
+            policies.append(EDFSchedulingPolicy())
+        else:
+            policies.append(DualPrioritySchedulingPolicy(
+                (t1, DualPriorityTaskInfo(3, 5, -3)),
+                (t2, DualPriorityTaskInfo(2, 6 + index % 5, -2)),
+                (t3, DualPriorityTaskInfo(1))))
+    timeLimits = [200 + 10 * (index % 5) for index in range(120)]
+    workloads = [BatchSimulator.workload(taskset, timeLimit)
+                 for taskset, timeLimit in zip(tasksets, timeLimits)]
+    assert BatchSimulator.batchSize(workloads) == len(tasksets)
+
+    simulation = BatchSimulation(tasksets, policies)
+    deadlineMisses = simulation.firstDeadlineMisses(timeLimits)
+    assert any(d is None for d in deadlineMisses)
+    assert any(d is not None for d in deadlineMisses)
+    for taskset, policy, timeLimit, deadlineMiss in zip(tasksets,
+                                                        policies,
+                                                        timeLimits,
+                                                        deadlineMisses):
+        reference = Simulation(taskset,
+                               policy,
+                               trackHistory=False,
+                               trackPreemptions=False)
+        reference.firstDeadlineMiss(True, timeLimit)
+        expected = reference.history.firstDeadlineMiss()
+        if expected is None:
+            assert deadlineMiss is None
+        else:
+            assert deadlineMiss.time == expected.time
+
+
+def test_simulationCounters():
+    t1 = Task(2, 5, FixedArrivalDistribution(5), FixedPreemptionCost(1))
+    t2 = Task(4, 9, FixedArrivalDistribution(9), FixedPreemptionCost(1))
+    taskset = Taskset(t1, t2)
+    setup = SimulationSetup(taskset, time=100, trackHistory=True)
+    countedSetup = SimulationSetup(taskset,
+                                   time=100,
+                                   trackHistory=True,
+                                   countOperations=True,
+                                   timePhases=True)
+    fastSetup = SimulationSetup(taskset, time=100, countOperations=True)
+
+    result = SimulationRun(setup).result()
+    countedResult = SimulationRun(countedSetup).result()
+    assert result.counters is None
+    assert countedResult.history == result.history
+    assert countedResult == SimulationRun(countedSetup).result()
+    counters = countedResult.counters
+    assert counters.events['Arrival'] == 20 + 12
+    assert counters.events['Completion'] > 0
+    assert counters.scheduleCalls > 0
+    assert counters.preemptions == len(result.history.preemptions(100))
+    assert counters.states > 0
+    assert counters.kernelRuns == 0
+    assert counters.peakQueueSize > 0
+    assert counters.peakReadyJobs == 2
+    assert SimulationPhase.Events in counters.phaseTimes
+
+    runner = simulationRunner([countedSetup, fastSetup], multicore=False)
+    runner.start()
+    runner.join()
+    assert runner.countsOperations()
+    merged = runner.counters()
+    assert merged.kernelRuns == 1
+    assert merged.events['Arrival'] >= counters.events['Arrival']
+    assert merged.preemptions >= counters.preemptions
+
+
+def test_simulationTracing():
+    t1 = Task(2, 5, FixedArrivalDistribution(5), FixedPreemptionCost(1))
+    t2 = Task(4, 9, FixedArrivalDistribution(9), FixedPreemptionCost(1))
+    t3 = Task(3, 10, FixedArrivalDistribution(10), FixedPreemptionCost(1))
+    taskset = Taskset(t1, t2, t3)
+    tracer = SimulationTracer()
+    simulation = Simulation(taskset,
+                            RMSchedulingPolicy(),
+                            trackHistory=False,
+                            trackPreemptions=True,
+                            tracer=tracer)
+    reference = Simulation(taskset,
+                           RMSchedulingPolicy(),
+                           trackHistory=False,
+                           trackPreemptions=True)
+    assert simulation.getState(50) == reference.getState(50)
+    arrivals = [r.subject for r in tracer.recordsOf(TraceKind.Event)
+                if isinstance(r.subject, StateArrival)]
+    assert len(arrivals) == 10 + 6 + 5
+    assert StateArrival(9, t2, 1) in arrivals
+    preemptions = [r.subject for r in tracer.recordsOf(TraceKind.Preemption)]
+    assert len(preemptions) == len(reference.preemptions(50))
+    assert set(preemptions) == set(reference.preemptions(50))
+    deadlineMisses = [r.subject
+                      for r in tracer.recordsOf(TraceKind.DeadlineMiss)]
+    assert deadlineMisses
+    assert set(deadlineMisses) == set(reference.deadlineMisses(50))
+    first = tracer.recordsOf(TraceKind.Schedule)[0]
+    assert first.time == 0
+    assert first.subject.old is None
+    assert first.subject.new.task is t1
+    times = [r.time for r in tracer.recordsOf(TraceKind.Event)]
+    assert times == sorted(times)
+
+
+def test_iterEvents():
+    t1 = Task(2, 5, FixedArrivalDistribution(5), FixedPreemptionCost(1))
+    t2 = Task(4, 9, FixedArrivalDistribution(9), FixedPreemptionCost(1))
+    t3 = Task(3, 10, FixedArrivalDistribution(10), FixedPreemptionCost(1))
+    taskset = Taskset(t1, t2, t3)
+    tracer = SimulationTracer(kinds=[TraceKind.Event,
+                                     TraceKind.Schedule,
+                                     TraceKind.Preemption,
+                                     TraceKind.DeadlineMiss])
+    reference = Simulation(taskset,
+                           RMSchedulingPolicy(),
+                           trackHistory=False,
+                           trackPreemptions=False,
+                           tracer=tracer)
+    reference.getState(60)
+    simulation = Simulation(taskset,
+                            RMSchedulingPolicy(),
+                            trackHistory=False,
+                            trackPreemptions=False)
+
+    records = list(simulation.iterEvents(until=60))
+    assert records == list(tracer.records)
+    assert any(r.kind == TraceKind.DeadlineMiss for r in records)
+    assert simulation.history.getLastState(60).time == 0
+
+    events = simulation.iterEvents()
+    for record in events:
+        if record.kind == TraceKind.Preemption:
+            break
+    events.close()
+    assert record == tracer.recordsOf(TraceKind.Preemption)[0]
+
+
+def test_simulationBudget():
+    t1 = Task(2, 5, FixedArrivalDistribution(5), FixedPreemptionCost(1))
+    t2 = Task(3, 11, FixedArrivalDistribution(11), FixedPreemptionCost(1))
+    taskset = Taskset(t1, t2)
+    tags = [AggregatorTag.PreemptionCount]
+    for trackHistory in [False, True]:
+        setup = SimulationSetup(taskset,
+                                time=10000,
+                                trackHistory=trackHistory,
+                                aggregatorTags=tags,
+                                instantBudget=100)
+        result = SimulationRun(setup, errorHandling=False).result()
+        reached = result.inconclusiveAfter
+        assert reached is not None
+        assert 0 < reached < 1000
+        assert result.history.lastState().time == reached
+
+        reference = Simulation(taskset,
+                               trackHistory=False,
+                               trackPreemptions=True)
+        nbPreemptions = len(reference.preemptions(reached))
+        assert (result.aggregateStat(AggregatorTag.PreemptionCount) ==
+                nbPreemptions)
+
+    setup = SimulationSetup(taskset, time=10**7, timeBudget=0)
+    assert SimulationRun(setup).result().inconclusiveAfter < 10**7
+    setup = SimulationSetup(taskset, time=1000, instantBudget=10**6)
+    assert SimulationRun(setup).result().inconclusiveAfter is None
+
+
+def test_simulationHorizon():
+    t1 = Task(1, 4, FixedArrivalDistribution(5))
+    t2 = Task(3, 11, FixedArrivalDistribution(11))
+    t3 = Task(3, 17, FixedArrivalDistribution(17))
+    taskset = Taskset(t1, t2, t3)
+    assert taskset.hyperperiod == 935
+    # 1 + 3 + 3 = 7, then 2 + 3 + 3 = 8, fixed point.
+    assert simulationHorizon(taskset, RMSchedulingPolicy()) == 8
+    assert simulationHorizon(taskset) == 8
+    rmPolicy = DualPrioritySchedulingPolicy(
+        (t1, DualPriorityTaskInfo(3)),
+        (t2, DualPriorityTaskInfo(2)),
+        (t3, DualPriorityTaskInfo(1)))
+    assert simulationHorizon(taskset, rmPolicy) == 8
+    dpPolicy = DualPrioritySchedulingPolicy(
+        (t1, DualPriorityTaskInfo(3)),
+        (t2, DualPriorityTaskInfo(2, 4, -2)),
+        (t3, DualPriorityTaskInfo(1)))
+    assert simulationHorizon(taskset, dpPolicy) == 935
+    setup = SimulationSetup(taskset, time='auto')
+    assert setup.time == 8
+
+    costly = Task(3, 11, FixedArrivalDistribution(11), FixedPreemptionCost(1))
+    assert simulationHorizon(Taskset(t1, costly, t3)) == 935
+    lateDeadline = Task(3, 20, FixedArrivalDistribution(17))
+    assert simulationHorizon(Taskset(t1, t2, lateDeadline)) == 935
+
+
+def test_releaseOffsets():
+    t1 = Task(2, 2, OffsetArrivalDistribution(4, 1))
+    t2 = Task(2, 3, OffsetArrivalDistribution(4, 0))
+    taskset = Taskset(t1, t2)
+    assert t1.offset == 1
+    assert t1.arrivalTime(2) == 9
+    assert taskset.maxOffset == 1
+    assert taskset.feasibilityInterval == 1 + 2 * 4
+    assert SimulationSetup(taskset).time == 1000
+    setup = SimulationSetup(taskset, time='auto', trackHistory=True)
+    assert setup.time == 9
+    result = SimulationRun(setup).result()
+    deadlineMiss = result.history.firstDeadlineMiss()
+    assert deadlineMiss == DeadlineMiss(t1, 0)
+    assert deadlineMiss.time == 3
+
+    shifted = Task(2, 2, OffsetArrivalDistribution(4, 2))
+    setup = SimulationSetup(Taskset(shifted, t2),
+                            time='auto',
+                            trackHistory=True)
+    assert setup.time == 10
+    assert not SimulationRun(setup).result().history.hasDeadlineMiss()
+
+    # A common offset only shifts the synchronous schedule.
+    t3 = Task(1, 5, OffsetArrivalDistribution(5, 3))
+    t4 = Task(1, 3, OffsetArrivalDistribution(3, 3))
+    assert Taskset(t3, t4).feasibilityInterval == 3 + 15
+    synchronous = Taskset(Task(1, 5), Task(1, 3))
+    assert synchronous.feasibilityInterval == synchronous.hyperperiod
+    assert SimulationSetup(synchronous).time == 1000
+
+
+def test_jobRecycling():
+    task = Task(2, 4, FixedArrivalDistribution(5), displayName='t')
+    jobManager = JobManager([])
+    job = jobManager.getJob(task, 0)
+    arrival = job.arrivalEvent()
+    deadline = job.deadlineEvent()
+    assert (job.releaseTime, job.deadline) == (0, 4)
+    job.start(0)
+    completion = job.completionEvent(2)
+    job.setLiveCompletion(completion)
+    job.progressTo(2)
+    assert job.isCompleted()
+    jobManager.removeJob(job)
+
+    nextJob = jobManager.getJob(task, 3)
+    assert nextJob is job
+    assert (job.releaseIndex, job.releaseTime, job.deadline) == (3, 15, 19)
+    assert job.progress() == 0 and not job.hasBeenStarted()
+    assert job.arrivalEvent() is arrival and arrival.time == 15
+    assert job.deadlineEvent() is deadline and deadline.time == 19
+    assert job.completionEvent(17) is completion and completion.time == 17
+    assert job.completionEvent(17) is not completion
+    assert jobManager.getJob(task, 4) is not job
+
+    noRecycling = JobManager([], recycle=False)
+    job = noRecycling.getJob(task, 0)
+    noRecycling.removeJob(job)
+    assert noRecycling.getJob(task, 1) is not job
+
+
+def test_dualPriorityBands():
+    tasks = [Task(1, 20, FixedArrivalDistribution(20), displayName=str(i))
+             for i in range(6)]
+    infos = [DualPriorityTaskInfo(1),
+             DualPriorityTaskInfo(2, 3, -1),
+             DualPriorityTaskInfo(3, 0, -4),
+             DualPriorityTaskInfo(4, 5, -3),
+             DualPriorityTaskInfo(5, 2, -2),
+             DualPriorityTaskInfo(6)]
+    policy = DualPrioritySchedulingPolicy(*zip(tasks, infos))
+    jobManager = JobManager([])
+    scheduler = DualPriorityScheduler(policy)
+    scheduler.initializeSchedulerData(Taskset(*tasks))
+    ready = set()
+    for task in tasks:
+        job = jobManager.getJob(task, 0)
+        scheduler.addReadyJob(job)
+        ready.add(job)
+    order = []
+    for time in (0, 1, 3, 5, 6, 7):
+        expected = min(ready,
+                       key=lambda j: policy.priorityAt(j.task, time))
+        _, job = scheduler.schedule(time)
+        assert job is expected
+        order.append(str(job.task))
+        scheduler.executionCompleted()
+        ready.remove(job)
+        assert scheduler.nbReadyJobs() == len(ready)
+    assert order == ['2', '0', '4', '3', '1', '5']
+
+
+def test_dualPriorityIndex():
+    t1 = Task(1, 10, FixedArrivalDistribution(10))
+    t2 = Task(2, 20, FixedArrivalDistribution(20))
+    policy = DualPrioritySchedulingPolicy((t1, DualPriorityTaskInfo(2)),
+                                          (t2, DualPriorityTaskInfo(1, 5, -1)))
+    index = policy.index()
+    k1 = index.taskIndices[id(t1)]
+    k2 = index.taskIndices[id(t2)]
+    assert {k1, k2} == {0, 1}
+    assert (index.lowPriorities[k1], index.promotions[k1]) == (2, None)
+    assert (index.lowPriorities[k2],
+            index.promotions[k2],
+            index.highPriorities[k2]) == (1, 5, -1)
+    for task in (t1, t2):
+        for relativeTime in range(8):
+            taskIndex = index.taskIndices[id(task)]
+            promotion = index.promotions[taskIndex]
+            if promotion is None or relativeTime < promotion:
+                priority = index.lowPriorities[taskIndex]
+            else:
+                priority = index.highPriorities[taskIndex]
+            assert priority == policy.priorityAt(task, relativeTime)
+
+
+def test_edfPackedPriorities():
+    t1 = Task(1, 10, FixedArrivalDistribution(10))
+    t2 = Task(1, 10, FixedArrivalDistribution(10))
+    t3 = Task(1, 20, FixedArrivalDistribution(20))
+    state = EDFSchedulerState((10, 0, t1, 0), (10, 1, t2, 0), (20, t3, 0))
+    priority, task, index = state.basicRunningEntry()
+    assert EDFSchedulerState.unpackPriority(priority) == (10, 0)
+    assert (task, index) == (t1, 0)
+
+    jobManager = JobManager([])
+    scheduler = EDFScheduler(jobManager, state)
+    assert scheduler.schedulerState() == state
+    t4 = Task(1, 10, FixedArrivalDistribution(10))
+    scheduler.addReadyJob(jobManager.getJob(t4, 0))
+    assert (10, 2, t4, 0) in scheduler.schedulerState().readyEntries
+    order = []
+    for time in range(3):
+        scheduler.executionCompleted()
+        order.append(scheduler.schedule(time).new.task)
+    assert order == [t2, t4, t3]
+    # No job has the deadline 20 anymore, the numbering restarts.
+    scheduler.executionCompleted()
+    scheduler.addReadyJob(jobManager.getJob(t1, 1))
+    scheduler.addReadyJob(jobManager.getJob(t2, 1))
+    entries = scheduler.schedulerState().readyEntries
+    assert set(entries) == {(20, 0, t1, 1), (20, 1, t2, 1)}
+
+
+def test_fixedPriorityPolicy():
+    t1 = Task(2, 5, FixedArrivalDistribution(5), FixedPreemptionCost(1))
+    t2 = Task(3, 12, FixedArrivalDistribution(12), FixedPreemptionCost(1))
+    t3 = Task(4, 30, FixedArrivalDistribution(30))
+    taskset = Taskset(t1, t2, t3)
+    fpPolicy = FixedPrioritySchedulingPolicy((t1, 1), (t2, 3), (t3, 2))
+    dpPolicy = DualPrioritySchedulingPolicy((t1, DualPriorityTaskInfo(1)),
+                                            (t2, DualPriorityTaskInfo(3)),
+                                            (t3, DualPriorityTaskInfo(2)))
+    assert isinstance(dpPolicy.createSchedulerInstance(),
+                      StaticDualPriorityScheduler)
+
+    fpSimu = Simulation(taskset, fpPolicy, fastKernel=False)
+    dpSimu = Simulation(taskset, dpPolicy, fastKernel=False)
+    for time in (7, 23, 60):
+        fpState = fpSimu.getState(time)
+        dpState = dpSimu.getState(time)
+        assert type(fpState.scheduler) is FixedPrioritySchedulerState
+        assert type(dpState.scheduler) is DualPrioritySchedulerState
+        assert fpState.jobs == dpState.jobs
+        assert (fpState.scheduler.runningEntry ==
+                dpState.scheduler.runningEntry)
+        assert (set(fpState.scheduler.readyEntries) ==
+                set(dpState.scheduler.readyEntries))
+    assert fpSimu.preemptions(60) == dpSimu.preemptions(60)
+
+    fastSimu = Simulation(taskset, fpPolicy, trackHistory=False)
+    assert fastSimu.getState(60).jobs == fpSimu.getState(60).jobs
+
+
+def test_fixedPriorityRestoredBacklog():
+    # Overloaded: several jobs of t2 are ready at once when the scheduler is
+    # built back from a state.
+    t1 = Task(3, 4, FixedArrivalDistribution(4))
+    t2 = Task(3, 6, FixedArrivalDistribution(6))
+    taskset = Taskset(t1, t2)
+    policies = (FixedPrioritySchedulingPolicy((t1, 1), (t2, 2)),
+                DualPrioritySchedulingPolicy((t1, DualPriorityTaskInfo(1)),
+                                             (t2, DualPriorityTaskInfo(2))))
+    for policy in policies:
+        reference = Simulation(taskset, policy, fastKernel=False)
+        expected = reference.getState(40)
+        assert len(expected.scheduler.readyEntries) > 1
+        fork = Simulation(taskset, policy,
+                          trackHistory=False,
+                          fastKernel=False).fork(30)
+        assert fork.getState(40) == expected
+        assert fork.getState(60) == reference.getState(60)
+
+
+def test_setupDefaults():
+    t1 = Task(2, 2, OffsetArrivalDistribution(4, 1))
+    t2 = Task(2, 3, OffsetArrivalDistribution(4, 0))
+    taskset = Taskset(t1, t2)
+    setup = SimulationSetup(taskset)
+    assert setup.time == 1000
+    autoSetup = SimulationSetup(taskset, time='auto')
+    assert autoSetup == SimulationSetup(taskset, time='auto')
+    assert autoSetup.time == taskset.feasibilityInterval
+    # The horizon computed on demand is not part of the value.
+    assert autoSetup == SimulationSetup(taskset, time='auto')
+    assert autoSetup != SimulationSetup(taskset,
+                                        time=taskset.feasibilityInterval)
+
+    # The setups saved before the later parameters were added.
+    state = setup.__getstate__()
+    for key in ('_detectCycles', '_lazyDeadlines', '_checkpointInterval',
+                '_countOperations', '_timePhases', '_timeBudget',
+                '_instantBudget', '_horizon'):
+        del state[key]
+    oldSetup = SimulationSetup.__new__(SimulationSetup)
+    oldSetup.__setstate__(state)
+    assert oldSetup == setup
+    assert oldSetup.time == 1000
+    assert not oldSetup.detectCycles
+    assert not oldSetup.hasBudget()
+    assert pickle.loads(pickle.dumps(autoSetup)) == autoSetup
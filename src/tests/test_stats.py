@@ -1,6 +1,7 @@
 
 from crpd.model import (Task, Taskset, FixedArrivalDistribution,
                         LogPreemptionCost, FixedPreemptionCost)
+from crpd.policy import DualPrioritySchedulingPolicy, DualPriorityTaskInfo
 from crpd.sim import SimulationSetup, SimulationRun
 from crpd.stats import SimulationStatistics, AggregatorTag
 
@@ -136,3 +137,77 @@ def test_logPreemptionsTotals():
 
     assert nbPreemptions == expectedNbPreemptions
     assert preemptionCost == expectedPreemptionCost
+
+
+def test_executionTimeAtDeadlineMiss():
+    shortTask = Task(3,
+                     10,
+                     FixedArrivalDistribution(10),
+                     LogPreemptionCost(1, 0.1),
+                     displayName='short')
+    longTask = Task(12,
+                    14,
+                    FixedArrivalDistribution(14),
+                    LogPreemptionCost(1, 0.1),
+                    displayName='long')
+    policy = DualPrioritySchedulingPolicy(
+        (shortTask, DualPriorityTaskInfo(1)),
+        (longTask, DualPriorityTaskInfo(2, 1, -2)))
+    taskset = Taskset(shortTask, longTask)
+
+    # The long job is promoted at 1, preempts the short one and runs until
+    # the deadline miss of the short job at 10: the short job executed 1 and
+    # the long one 9, although no event occurs between 1 and 10.
+    setup = SimulationSetup(taskset,
+                            time=300,
+                            schedulingPolicy=policy,
+                            deadlineMissFilter=True,
+                            aggregatorTags=[AggregatorTag.ExecutionTime])
+    result = SimulationRun(setup).result()
+    assert result.aggregateStat(AggregatorTag.ExecutionTime) == 10
+
+    setup = SimulationSetup(taskset,
+                            time=300,
+                            schedulingPolicy=policy,
+                            deadlineMissFilter=True,
+                            trackHistory=True)
+    result = SimulationRun(setup).result()
+    assert result.history.lastTime() == 10
+    assert SimulationStatistics(result).totalExecutionTime() == 10
+
+
+def test_executionTimeWithoutDeadlineMiss():
+    # Some jobs of t1 complete at their deadline, where they are removed
+    # before any state shows their completion.
+    t1 = Task(3, 7, FixedArrivalDistribution(7), FixedPreemptionCost(3))
+    t2 = Task(1, 5, FixedArrivalDistribution(5), FixedPreemptionCost(1))
+    taskset = Taskset(t1, t2)
+    setup = SimulationSetup(taskset,
+                            time=100,
+                            trackHistory=True,
+                            aggregatorTags=[AggregatorTag.ExecutionTime])
+    result = SimulationRun(setup).result()
+    assert not result.history.hasDeadlineMiss()
+    assert result.aggregateStat(AggregatorTag.ExecutionTime) == 64
+    assert SimulationStatistics(result).totalExecutionTime() == 64
+
+
+def test_executionTimeWithPromotions():
+    t1 = Task(3, 5, FixedArrivalDistribution(5), FixedPreemptionCost(1))
+    t2 = Task(3, 10, FixedArrivalDistribution(10), FixedPreemptionCost(1))
+    policy = DualPrioritySchedulingPolicy(
+        (t1, DualPriorityTaskInfo(2)),
+        (t2, DualPriorityTaskInfo(3, 4, 1)))
+    taskset = Taskset(t1, t2)
+
+    # Each job of t2 is promoted above t1 while it runs; all the jobs
+    # complete, so the execution time is the whole demand.
+    setup = SimulationSetup(taskset,
+                            time=100,
+                            schedulingPolicy=policy,
+                            trackHistory=True,
+                            aggregatorTags=[AggregatorTag.ExecutionTime])
+    result = SimulationRun(setup).result()
+    assert not result.history.hasDeadlineMiss()
+    assert result.aggregateStat(AggregatorTag.ExecutionTime) == 90
+    assert SimulationStatistics(result).totalExecutionTime() == 90